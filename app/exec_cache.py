@@ -0,0 +1,184 @@
+"""
+Content-addressed cache of sandbox execution results.
+
+A run is identified by the language, the entry file, the content of every
+file in the project and the digest of the runner image. Identical runs (a
+re-submitted project, an LLM answer that didn't change anything, attempts
+that converge on the same candidate) are answered from here instead of
+going through a container.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import OrderedDict
+
+
+def tree_digest(root: str, skip=("upload.zip",)) -> str:
+    """Hash of every file path and its content under root."""
+    h = hashlib.sha256()
+    for dirpath, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if name in skip:
+                continue
+            path = os.path.join(dirpath, name)
+            h.update(os.path.relpath(path, root).encode())
+            h.update(b"\0")
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 16), b""):
+                    h.update(chunk)
+            h.update(b"\0")
+    return h.hexdigest()
+
+
+def execution_key(language: str, entry_file: str, files_digest: str, image_digest: str) -> str:
+    raw = "\0".join([language, entry_file, files_digest, image_digest])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+_image_digests = {}
+_image_digests_lock = threading.Lock()
+
+
+def image_digest(image: str, max_age: float = 60.0) -> str | None:
+    """
+    Id of the local runner image, re-read at most every max_age seconds so a
+    rebuilt image invalidates old results. None if docker can't tell us.
+    """
+    now = time.monotonic()
+    with _image_digests_lock:
+        cached = _image_digests.get(image)
+        if cached and now - cached[1] < max_age:
+            return cached[0]
+
+    try:
+        proc = subprocess.run(
+            ["docker", "image", "inspect", "--format", "{{.Id}}", image],
+            capture_output=True,
+            text=True
+        )
+    except OSError:
+        return None
+    digest = proc.stdout.strip() if proc.returncode == 0 else None
+
+    with _image_digests_lock:
+        _image_digests[image] = (digest, now)
+    return digest
+
+
+class ExecutionCache:
+    """LRU + TTL map of execution key -> (returncode, stdout, stderr)."""
+
+    def __init__(self, max_entries: int = 256, ttl: float = 3600.0, disk_dir: str | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, workdir: str) -> "ExecutionCache":
+        disk_dir = None
+        if os.getenv("EXEC_CACHE_DISK", "0") == "1":
+            disk_dir = os.path.join(workdir, ".exec_cache")
+        return cls(
+            max_entries=int(os.getenv("EXEC_CACHE_SIZE", "256")),
+            ttl=float(os.getenv("EXEC_CACHE_TTL", "3600")),
+            disk_dir=disk_dir,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        result = self._disk_get(key, now)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, result, now)
+        return result
+
+    def put(self, key: str, result) -> None:
+        result = tuple(result)
+        now = time.time()
+        with self._lock:
+            self._remember(key, result, now)
+        self._disk_put(key, result, now)
+
+    def _remember(self, key: str, result: tuple, stored_at: float) -> None:
+        # Called with self._lock held
+        self._entries[key] = (stored_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key: str, now: float):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if now - data["stored_at"] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return tuple(data["result"])
+
+    def _disk_put(self, key: str, result: tuple, stored_at: float) -> None:
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"stored_at": stored_at, "result": list(result)}, f)
+        os.replace(tmp, path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "disk": bool(self.disk_dir),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
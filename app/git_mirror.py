@@ -0,0 +1,180 @@
+"""
+Cached, shallow GitHub clones for /github-clone.
+
+Each repository URL gets one bare, depth-1 mirror that is brought up to
+date with an incremental fetch (at most every `refresh` seconds) instead of
+a fresh clone per request. Files are materialised per commit by streaming
+`git archive`, keeping only the requested filename globs (e.g. only the
+language's sources), into a checkout directory that is reused by every
+request for the same URL and commit.
+"""
+import fnmatch
+import hashlib
+import os
+import shutil
+import subprocess
+import tarfile
+import threading
+import time
+from contextlib import contextmanager
+
+import git
+
+
+def _strip_credentials(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return f"{scheme}{sep}{rest.split('@', 1)[-1]}" if sep else url
+
+
+class RepoMirrors:
+    def __init__(self, cache_dir: str, refresh: float = 60.0, max_checkouts: int = 16):
+        self.cache_dir = cache_dir
+        self.refresh = refresh
+        self.max_checkouts = max_checkouts
+        self._locks = {}  # key -> [lock, holders and waiters]
+        self._locks_guard = threading.Lock()
+        self._last_fetch = {}  # mirror key -> monotonic time
+        self.clones = 0
+        self.fetches = 0
+        self.checkout_hits = 0
+
+    @classmethod
+    def from_env(cls, workdir: str) -> "RepoMirrors":
+        return cls(
+            cache_dir=os.getenv("GIT_MIRROR_DIR", os.path.join(workdir, ".git_mirrors")),
+            refresh=float(os.getenv("GIT_MIRROR_REFRESH", "60")),
+            max_checkouts=int(os.getenv("GIT_CHECKOUT_CACHE", "16")),
+        )
+
+    @contextmanager
+    def _lock(self, key: str):
+        """Hold key's lock; it is forgotten once nobody holds or waits for it."""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    @staticmethod
+    def key(url: str) -> str:
+        url = _strip_credentials(url).rstrip("/")
+        if url.endswith(".git"):
+            url = url[:-4]
+        return hashlib.sha256(url.encode()).hexdigest()[:16]
+
+    # ---------- mirror ----------
+
+    def sync(self, url: str, auth_url: str | None = None) -> tuple:
+        """Clone or fetch the mirror of url -> (mirror_path, head_commit)."""
+        key = self.key(url)
+        mirror = os.path.join(self.cache_dir, "mirrors", f"{key}.git")
+        auth_url = auth_url or url
+
+        with self._lock(key):
+            if not os.path.isdir(mirror):
+                os.makedirs(os.path.dirname(mirror), exist_ok=True)
+                tmp = f"{mirror}.{threading.get_ident()}.tmp"
+                shutil.rmtree(tmp, ignore_errors=True)
+                git.Repo.clone_from(auth_url, tmp, bare=True, depth=1, no_tags=True)
+                # Don't keep a token in the cached config
+                git.Repo(tmp).git.remote("set-url", "origin", url)
+                os.replace(tmp, mirror)
+                self.clones += 1
+                self._last_fetch[key] = time.monotonic()
+            elif time.monotonic() - self._last_fetch.get(key, 0) > self.refresh:
+                repo = git.Repo(mirror)
+                repo.git.fetch("--depth", "1", "--no-tags", auth_url, "HEAD")
+                repo.git.update_ref("HEAD", "FETCH_HEAD")
+                self.fetches += 1
+                self._last_fetch[key] = time.monotonic()
+
+            return mirror, git.Repo(mirror).head.commit.hexsha
+
+    @staticmethod
+    def list_paths(mirror: str, commit: str) -> list:
+        """Every file path in commit, read from the tree without a checkout."""
+        out = git.Repo(mirror).git.ls_tree("-r", "--name-only", "-z", commit)
+        return [p for p in out.split("\0") if p]
+
+    # ---------- checkouts ----------
+
+    def checkout(self, mirror: str, commit: str, patterns: list | None = None) -> str:
+        """
+        Directory holding the files of commit whose names match one of the
+        filename globs in patterns (all files without).
+        """
+        spec_key = hashlib.sha256("\0".join(sorted(patterns or [])).encode()).hexdigest()[:8]
+        name = f"{os.path.basename(mirror)[:-4]}-{commit[:12]}-{spec_key}"
+        target = os.path.join(self.cache_dir, "checkouts", name)
+
+        with self._lock(name):
+            if os.path.isdir(target):
+                self.checkout_hits += 1
+                os.utime(target)  # LRU by mtime
+                return target
+
+            tmp = f"{target}.{threading.get_ident()}.tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            # Filter while streaming: git archive fails outright on a pathspec that matches nothing
+            proc = subprocess.Popen(
+                ["git", "--git-dir", mirror, "archive", "--format=tar", commit],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            with tarfile.open(fileobj=proc.stdout, mode="r|") as archive:
+                for member in archive:
+                    if patterns and member.isfile() and not any(
+                        fnmatch.fnmatch(os.path.basename(member.name), p) for p in patterns
+                    ):
+                        continue
+                    archive.extract(member, tmp, filter="data")
+            proc.wait()
+            if proc.returncode != 0:
+                shutil.rmtree(tmp, ignore_errors=True)
+                raise RuntimeError(f"git archive failed: {proc.stderr.read().decode(errors='replace')}")
+            os.replace(tmp, target)
+
+        self._evict()
+        return target
+
+    @contextmanager
+    def reading(self, repo_id: str):
+        """
+        The checkout directory behind a repo_id handed out earlier (None if
+        it is no longer cached), kept from eviction until the block ends.
+        """
+        if "/" in repo_id or repo_id.startswith("."):
+            yield None
+            return
+        target = os.path.join(self.cache_dir, "checkouts", repo_id)
+        with self._lock(repo_id):
+            if not os.path.isdir(target):
+                yield None
+                return
+            os.utime(target)
+            yield target
+
+    def _evict(self) -> None:
+        root = os.path.join(self.cache_dir, "checkouts")
+        dirs = {d: os.path.getmtime(os.path.join(root, d)) for d in os.listdir(root) if not d.endswith(".tmp")}
+        oldest = sorted(dirs, key=dirs.get)[:max(0, len(dirs) - self.max_checkouts)]
+        for name in oldest:
+            # Wait for readers of the checkout; one used meanwhile is no longer the oldest
+            with self._lock(name):
+                target = os.path.join(root, name)
+                if os.path.isdir(target) and os.path.getmtime(target) == dirs[name]:
+                    shutil.rmtree(target, ignore_errors=True)
+
+    def stats(self) -> dict:
+        return {
+            "clones": self.clones,
+            "fetches": self.fetches,
+            "checkout_hits": self.checkout_hits,
+        }
@@ -0,0 +1,214 @@
+"""
+Parallel file ingestion for cloned repositories.
+
+One walk of the tree applies the ignore lists and every .gitignore it
+meets, and counts extensions for language detection as it goes. Stat'ing
+the candidates, sniffing the first few KB to tell text from binary, and
+reading the text files are spread over a thread pool, so a repository with
+thousands of files isn't read one open() at a time.
+"""
+import codecs
+import fnmatch
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+SNIFF_BYTES = 8192
+
+# Bytes that essentially never appear in source files
+_CONTROL = bytes(range(0, 32)).translate(None, b"\t\n\r\f\b\x1b")
+
+
+def looks_binary(prefix: bytes) -> bool:
+    """Classify from a file's first bytes: NUL, invalid UTF-8 or too many control bytes."""
+    if not prefix:
+        return False
+    if b"\0" in prefix:
+        return True
+    try:
+        # Incremental so a multi-byte character cut off at the end is fine
+        codecs.getincrementaldecoder("utf-8")().decode(prefix, final=False)
+    except UnicodeDecodeError:
+        return True
+    control = sum(prefix.count(bytes([b])) for b in _CONTROL)
+    return control / len(prefix) > 0.1
+
+
+# ================================
+# .gitignore
+# ================================
+
+def _compile_gitignore_pattern(pattern: str):
+    """Translate one .gitignore pattern into a regex over paths relative to its directory."""
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.strip("/")
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            parts.append("/.*")
+            i += 3
+        elif pattern[i] == "*":
+            parts.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i)
+            if end == -1:
+                parts.append(re.escape(pattern[i]))
+                i += 1
+            else:
+                parts.append(fnmatch.translate(pattern[i:end + 1])[4:-3])
+                i = end + 1
+        else:
+            parts.append(re.escape(pattern[i]))
+            i += 1
+    body = "".join(parts)
+    # Unanchored patterns match at any depth
+    prefix = "" if anchored else "(?:.*/)?"
+    return re.compile(f"^{prefix}{body}$")
+
+
+class GitIgnore:
+    """The rules of every .gitignore between the root and a directory, last match wins."""
+
+    def __init__(self, rules: tuple = ()):
+        self.rules = rules  # (base_dir, regex, negated, dir_only)
+
+    def extend(self, base_dir: str, path: str) -> "GitIgnore":
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return self
+        rules = list(self.rules)
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negated = line.startswith("!")
+            if negated:
+                line = line[1:]
+            if line.startswith("\\"):
+                line = line[1:]
+            rules.append((base_dir, _compile_gitignore_pattern(line), negated, line.endswith("/")))
+        return GitIgnore(tuple(rules))
+
+    def ignored(self, rel_path: str, is_dir: bool) -> bool:
+        result = False
+        for base_dir, regex, negated, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base_dir:
+                if not rel_path.startswith(base_dir + "/"):
+                    continue
+                candidate = rel_path[len(base_dir) + 1:]
+            else:
+                candidate = rel_path
+            if regex.match(candidate):
+                result = not negated
+        return result
+
+
+# ================================
+# INGESTION
+# ================================
+
+@dataclass
+class IngestedFile:
+    path: str
+    size: int
+    is_text: bool
+    content: str | None = None
+
+
+@dataclass
+class IngestResult:
+    files: list = field(default_factory=list)  # text files, sorted by path
+    skipped: dict = field(default_factory=dict)  # rel path -> reason
+    extension_counts: dict = field(default_factory=dict)
+
+
+def _classify(root: str, rel_path: str, max_size: int, read_content: bool):
+    path = os.path.join(root, rel_path)
+    try:
+        size = os.path.getsize(path)
+        if size > max_size:
+            return rel_path, size, "too large", None
+        with open(path, "rb") as f:
+            prefix = f.read(SNIFF_BYTES)
+            if looks_binary(prefix):
+                return rel_path, size, "binary", None
+            if not read_content:
+                return rel_path, size, None, None
+            data = prefix + f.read()
+        return rel_path, size, None, data.decode("utf-8")
+    except UnicodeDecodeError:
+        return rel_path, size, "binary", None
+    except OSError:
+        return rel_path, 0, "unreadable", None
+
+
+def ingest_tree(root: str, ignore_dirs=(), ignore_patterns=(), max_size: int = 1_000_000,
+                read_content: bool = True, workers: int = 8) -> IngestResult:
+    """Walk root once and classify (and optionally read) every file on a thread pool."""
+    result = IngestResult()
+    candidates = []
+    ignores = {root: GitIgnore()}
+
+    for dirpath, dirs, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+        gitignore = ignores.pop(dirpath)
+        if ".gitignore" in filenames:
+            gitignore = gitignore.extend(rel_dir, os.path.join(dirpath, ".gitignore"))
+
+        kept = []
+        for d in sorted(dirs):
+            rel = f"{rel_dir}/{d}" if rel_dir else d
+            if d in ignore_dirs or gitignore.ignored(rel, is_dir=True):
+                continue
+            kept.append(d)
+            ignores[os.path.join(dirpath, d)] = gitignore
+        dirs[:] = kept
+
+        for name in filenames:
+            rel = f"{rel_dir}/{name}" if rel_dir else name
+            if os.path.splitext(name)[1] in ignore_patterns or name in ignore_patterns:
+                continue
+            if gitignore.ignored(rel, is_dir=False):
+                result.skipped[rel] = "gitignored"
+                continue
+            ext = os.path.splitext(name)[1].lower()
+            result.extension_counts[ext] = result.extension_counts.get(ext, 0) + 1
+            candidates.append(rel)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = pool.map(lambda rel: _classify(root, rel, max_size, read_content), candidates)
+        for rel, size, reason, content in outcomes:
+            if reason:
+                result.skipped[rel] = reason
+            else:
+                result.files.append(IngestedFile(rel, size, True, content))
+
+    result.files.sort(key=lambda f: f.path)
+    return result
+
+
+def read_texts(root: str, rel_paths: list, workers: int = 8) -> dict:
+    """{rel_path: content} for rel_paths, read in parallel; unreadable files are left out."""
+    def read(rel):
+        try:
+            with open(os.path.join(root, rel), encoding="utf-8") as f:
+                return rel, f.read()
+        except (OSError, UnicodeDecodeError):
+            return rel, None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return {rel: text for rel, text in pool.map(read, rel_paths) if text is not None}
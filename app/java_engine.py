@@ -0,0 +1,245 @@
+"""
+Persistent Java execution sessions.
+
+A repair of a Java project re-runs `javac ... && java ...` up to nine times,
+usually after the LLM touched a single file. A session keeps one java-runner
+container alive for the whole repair with a warm javac (CompileServer) in
+it. Before each run only the files that changed on the host are copied in.
+The first build compiles the entry file with -sourcepath, like `javac
+Main.java`, so javac only builds what the program uses and an unrelated
+broken file can't fail it. After that only changed sources of that build
+and the sources that mention their classes are recompiled into a shared
+/classes directory. Compile and run times are recorded separately, and the
+program is killed after the run timeout like a one-off runner.
+"""
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+import uuid
+
+log = logging.getLogger(__name__)
+
+COMPILE_SERVER_PORT = 7070
+TIMEOUT_EXIT = 124  # same as coreutils timeout
+
+# Talks to the CompileServer over bash's /dev/tcp: one javac argument per
+# line, a blank line, then read back "<exit code>\n<diagnostics>"
+_COMPILE_CLIENT = (
+    'for i in $(seq 50); do exec 3<>/dev/tcp/127.0.0.1/{port} 2>/dev/null && break; sleep 0.1; done; '
+    '[ -e /dev/fd/3 ] || exit 111; '
+    'printf "%s\\n" "$@" >&3; echo >&3; cat <&3'
+).format(port=COMPILE_SERVER_PORT)
+
+
+def _docker(args: list):
+    proc = subprocess.run(["docker"] + args, capture_output=True, text=True)
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def main_class_name(source: str, main_file: str) -> str:
+    """Fully qualified class name of the file holding main()."""
+    cls = os.path.splitext(os.path.basename(main_file))[0]
+    package = re.search(r"^\s*package\s+([\w.]+)\s*;", source, re.M)
+    return f"{package.group(1)}.{cls}" if package else cls
+
+
+class JavaSession:
+    """One warm java-runner container serving every run of one repair."""
+
+    def __init__(self, host_dir: str, image: str = "java-runner", docker=None, run_timeout: float | None = None):
+        self.host_dir = host_dir
+        self.run_timeout = run_timeout
+        self.image = image
+        self.docker = docker or _docker
+        self.name = f"java_session_{uuid.uuid4().hex[:8]}"
+        self.started = False
+        self.compile_server = False
+        self.synced = {}  # rel path -> hash present in /work
+        self.compiled = {}  # .java rel path -> hash, for sources javac built into /classes
+        self.timings = []
+        self._lock = threading.Lock()
+
+    # ---------- container lifecycle ----------
+
+    def _start(self) -> None:
+        rc, _, err = self.docker(["run", "-d", "--name", self.name, "--network", "none",
+                                  self.image, "sleep", "infinity"])
+        if rc != 0:
+            raise RuntimeError(f"Could not start Java session container: {err}")
+        self.docker(["exec", self.name, "mkdir", "-p", "/work", "/classes"])
+        # Older images without the compile server fall back to plain javac
+        rc, _, _ = self.docker(["exec", self.name, "test", "-f", "/opt/cici/CompileServer.class"])
+        if rc == 0:
+            self.docker(["exec", "-d", self.name, "java", "-cp", "/opt/cici",
+                         "CompileServer", str(COMPILE_SERVER_PORT)])
+            self.compile_server = True
+        self.started = True
+
+    def close(self) -> None:
+        if self.started:
+            self.docker(["rm", "-f", self.name])
+            self.started = False
+
+    # ---------- incremental sync and compile ----------
+
+    def _scan(self) -> dict:
+        current = {}
+        for root, _, files in os.walk(self.host_dir):
+            for name in files:
+                if name == "upload.zip":
+                    continue
+                path = os.path.join(root, name)
+                current[os.path.relpath(path, self.host_dir)] = _sha256(path)
+        return current
+
+    def _sync(self, current: dict) -> set:
+        """Copy new or modified files into /work and drop deleted ones."""
+        changed = {rel for rel, digest in current.items() if self.synced.get(rel) != digest}
+        deleted = set(self.synced) - set(current)
+
+        if not self.synced and changed:
+            # First sync: one copy of the whole tree
+            self.docker(["cp", self.host_dir.rstrip("/") + "/.", f"{self.name}:/work"])
+        else:
+            for rel in sorted(changed):
+                dirname = os.path.dirname(rel)
+                if dirname:
+                    self.docker(["exec", self.name, "mkdir", "-p", f"/work/{dirname}"])
+                self.docker(["cp", os.path.join(self.host_dir, rel), f"{self.name}:/work/{rel}"])
+        if deleted:
+            self.docker(["exec", self.name, "rm", "-f"] + [f"/work/{rel}" for rel in sorted(deleted)])
+
+        self.synced = dict(current)
+        return deleted
+
+    def _sources_to_compile(self, current: dict, deleted: set, main_file: str) -> list:
+        # A removed source may leave stale classes behind: rebuild from scratch
+        if deleted & set(self.compiled) or not self.compiled:
+            self.docker(["exec", self.name, "sh", "-c", "rm -rf /classes && mkdir -p /classes"])
+            self.compiled = {}
+            # javac finds whatever else the entry needs through -sourcepath
+            return [main_file]
+
+        # Sources outside the build are left alone, as `javac Main.java` would
+        changed = {rel for rel, digest in self.compiled.items() if current.get(rel) != digest}
+        if not changed:
+            return []
+
+        # Recompile unchanged sources that mention a changed class so
+        # signature changes surface as compile errors, not runtime ones
+        names = [os.path.splitext(os.path.basename(rel))[0] for rel in changed]
+        pattern = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b")
+        for rel in self.compiled:
+            if rel in changed:
+                continue
+            with open(os.path.join(self.host_dir, rel), errors="ignore") as f:
+                if pattern.search(f.read()):
+                    changed.add(rel)
+        return sorted(changed)
+
+    def _built_sources(self, current: dict) -> set:
+        """Sources with a class file of the same name in /classes, i.e. part of the build."""
+        _, out, _ = self.docker(["exec", self.name, "find", "/classes", "-name", "*.class"])
+        classes = {os.path.relpath(path, "/classes")[:-len(".class")] for path in out.split()}
+        built = set()
+        for rel in current:
+            stem = rel[:-len(".java")] if rel.endswith(".java") else None
+            if stem is not None and any(stem == c or stem.endswith("/" + c) for c in classes):
+                built.add(rel)
+        return built
+
+    def _compile(self, sources: list):
+        args = ["-d", "/classes", "-cp", "/classes", "-sourcepath", "/work"] + [f"/work/{rel}" for rel in sources]
+        if self.compile_server:
+            rc, out, err = self.docker(["exec", "-w", "/work", self.name, "bash", "-c", _COMPILE_CLIENT, "bash"] + args)
+            if rc == 0 and out[:out.find("\n")].strip().lstrip("-").isdigit():
+                code, _, diagnostics = out.partition("\n")
+                # javac reports on stderr; keep that contract for the repair prompt
+                return int(code), "", diagnostics
+            log.warning("Compile server unavailable (%s); using javac", err.strip() or rc)
+            self.compile_server = False
+        return self.docker(["exec", "-w", "/work", self.name, "javac"] + args)
+
+    # ---------- execution ----------
+
+    def run(self, main_file: str):
+        """Sync, compile what changed and run main_file -> (returncode, stdout, stderr)."""
+        with self._lock:
+            if not self.started:
+                self._start()
+
+            current = self._scan()
+            deleted = self._sync(current)
+
+            compile_started = time.monotonic()
+            sources = self._sources_to_compile(current, deleted, main_file)
+            if sources:
+                ret, out, err = self._compile(sources)
+                compile_seconds = time.monotonic() - compile_started
+                if ret != 0:
+                    self.timings.append({
+                        "compile_seconds": compile_seconds,
+                        "run_seconds": None,
+                        "compiled_files": len(sources),
+                    })
+                    # Same shape as a failing `javac X && java X`
+                    return 1, out, err
+                for rel in set(sources) | self._built_sources(current):
+                    self.compiled[rel] = current[rel]
+            else:
+                compile_seconds = 0.0
+
+            with open(os.path.join(self.host_dir, main_file), errors="ignore") as f:
+                main_class = main_class_name(f.read(), main_file)
+
+            run_started = time.monotonic()
+            limit = ["timeout", "-k", "2", f"{self.run_timeout:g}"] if self.run_timeout else []
+            ret, out, err = self.docker(["exec", "-w", "/work", self.name] + limit
+                                        + ["java", "-cp", "/classes:/work", main_class])
+            if limit and ret == TIMEOUT_EXIT:
+                err += f"\nTimed out after {self.run_timeout:g}s\n"
+            self.timings.append({
+                "compile_seconds": compile_seconds,
+                "run_seconds": time.monotonic() - run_started,
+                "compiled_files": len(sources),
+            })
+            return ret, out, err
+
+
+# ================================
+# SESSION REGISTRY (one per repair)
+# ================================
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(run_id: str, host_dir: str, docker=None, run_timeout: float | None = None) -> JavaSession:
+    with _sessions_lock:
+        session = JavaSession(host_dir, docker=docker, run_timeout=run_timeout)
+        _sessions[run_id] = session
+        return session
+
+
+def get_session(run_id: str) -> JavaSession | None:
+    with _sessions_lock:
+        return _sessions.get(run_id)
+
+
+def close_session(run_id: str) -> None:
+    with _sessions_lock:
+        session = _sessions.pop(run_id, None)
+    if session is not None:
+        session.close()
@@ -0,0 +1,253 @@
+"""
+Bounded background job queue for long-running repair work.
+
+The repair loop blocks on docker subprocesses and LLM HTTP calls for minutes,
+so the API hands it to a fixed-size pool of worker threads and returns a job
+id straight away. Clients poll the job for its status and result, or follow
+its progress events (see Job.emit) and request cancellation.
+"""
+import contextvars
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+
+log = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when the queue already holds `max_queue` waiting jobs."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job function once cancellation was requested."""
+
+
+# Context variable rather than a thread-local so helper threads started with
+# contextvars.copy_context().run still see the job they work for
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+
+def current_job():
+    """The Job being executed by the calling worker thread, or None."""
+    return _current_job.get()
+
+
+@dataclass
+class Job:
+    id: str
+    fn: object = field(repr=False)
+    args: tuple = field(default=(), repr=False)
+    kwargs: dict = field(default_factory=dict, repr=False)
+    status: str = "queued"  # queued -> running -> succeeded | failed | cancelled
+    result: object = None
+    error: str | None = None
+    error_status: int | None = None
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    events: list = field(default_factory=list, repr=False)
+    cancel_requested: threading.Event = field(default_factory=threading.Event, repr=False)
+    _events_lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def emit(self, type: str, data: dict) -> None:
+        """Record a progress event; followers read them with events[seq:]."""
+        with self._events_lock:
+            self.events.append({
+                "seq": len(self.events),
+                "type": type,
+                "data": data,
+                "ts": time.time(),
+            })
+
+    def check_cancelled(self) -> None:
+        if self.cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def to_dict(self) -> dict:
+        wait = run = None
+        if self.started_at is not None:
+            wait = self.started_at - self.created_at
+            run = (self.finished_at or time.time()) - self.started_at
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "error_status": self.error_status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_seconds": wait,
+            "run_seconds": run,
+        }
+
+
+def _summary(samples) -> dict:
+    values = sorted(samples)
+    if not values:
+        return {"count": 0, "avg": None, "p50": None, "p95": None, "max": None}
+    return {
+        "count": len(values),
+        "avg": sum(values) / len(values),
+        "p50": values[len(values) // 2],
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+class JobQueue:
+    """FIFO queue drained by `workers` daemon threads."""
+
+    def __init__(self, workers: int = 2, max_queue: int = 100, history: int = 500):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.history = history
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pending = 0  # queued and not cancelled; _queue still holds cancelled jobs
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._cancelled = 0
+        self._wait_times = deque(maxlen=1000)
+        self._run_times = deque(maxlen=1000)
+
+    @classmethod
+    def from_env(cls) -> "JobQueue":
+        return cls(
+            workers=int(os.getenv("REPAIR_WORKERS", "2")),
+            max_queue=int(os.getenv("REPAIR_MAX_QUEUE", "100")),
+        )
+
+    def _ensure_workers(self) -> None:
+        # Called with self._lock held
+        while len(self._threads) < self.workers:
+            t = threading.Thread(
+                target=self._worker,
+                name=f"repair-worker-{len(self._threads)}",
+                daemon=True
+            )
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, fn, *args, **kwargs) -> Job:
+        """Queue fn(*args, **kwargs) and return its Job immediately."""
+        job = Job(id=uuid.uuid4().hex, fn=fn, args=args, kwargs=kwargs)
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected += 1
+                raise QueueFull(f"Job queue is full ({self.max_queue} waiting)")
+            self._ensure_workers()
+            self._jobs[job.id] = job
+            self._pending += 1
+            self._trim_history()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """
+        Request cancellation. Queued jobs never start; running jobs stop the
+        next time they call check_cancelled().
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return job
+            job.cancel_requested.set()
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                self._pending -= 1
+                self._cancelled += 1
+        return job
+
+    def wait(self, job_id: str, timeout: float | None = None) -> Job | None:
+        """Block until the job finishes (mainly for tests and scripts)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job.done:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.01)
+
+    def _trim_history(self) -> None:
+        # Drop the oldest finished jobs once we hold more than `history`
+        excess = len(self._jobs) - self.history
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.done][:excess]:
+            del self._jobs[job_id]
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                if job.status == "cancelled":
+                    self._queue.task_done()
+                    continue
+                self._pending -= 1
+                job.status = "running"
+                job.started_at = time.time()
+                self._running += 1
+                self._wait_times.append(job.started_at - job.created_at)
+
+            token = _current_job.set(job)
+            try:
+                job.result = job.fn(*job.args, **job.kwargs)
+                status = "succeeded"
+            except JobCancelled:
+                status = "cancelled"
+            except Exception as e:
+                # HTTPException-style errors carry a status code and detail
+                job.error = str(getattr(e, "detail", None) or e)
+                job.error_status = getattr(e, "status_code", None)
+                status = "failed"
+                log.warning("Job %s failed: %s", job.id, job.error)
+            finally:
+                _current_job.reset(token)
+
+            with self._lock:
+                job.finished_at = time.time()
+                job.status = status
+                self._running -= 1
+                self._run_times.append(job.finished_at - job.started_at)
+                if status == "succeeded":
+                    self._completed += 1
+                elif status == "cancelled":
+                    self._cancelled += 1
+                else:
+                    self._failed += 1
+            self._queue.task_done()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self._pending,
+                "running": self._running,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "cancelled": self._cancelled,
+                "wait_seconds": _summary(self._wait_times),
+                "run_seconds": _summary(self._run_times),
+            }
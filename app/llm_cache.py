@@ -0,0 +1,183 @@
+"""
+Memoization of LLM responses.
+
+Responses are keyed on everything that influences generation (model,
+options, format and a hash of the prompt). Lookups go through an in-memory
+LRU first and an optional SQLite file second. Identical prompts that are
+already in flight wait for the first request instead of generating twice.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# How often a caller waiting on an identical in-flight request checks its cancel flag
+CANCEL_POLL = 0.05
+
+
+def llm_cache_key(model: str, prompt: str, options: dict | None = None, format: str | None = None) -> str:
+    prompt_hash = hashlib.sha256(prompt.encode()).hexdigest()
+    raw = json.dumps(
+        {"model": model, "options": options or {}, "format": format, "prompt": prompt_hash},
+        sort_keys=True
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU in front of an optional persistent SQLite table."""
+
+    def __init__(self, max_entries: int = 128, db_path: str | None = None, ttl: float | None = None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._db = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.bypassed = 0
+
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "LLMCache":
+        ttl = os.getenv("LLM_CACHE_TTL")
+        return cls(
+            max_entries=int(os.getenv("LLM_CACHE_SIZE", "128")),
+            db_path=os.getenv("LLM_CACHE_DB") or None,
+            ttl=float(ttl) if ttl else None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 or self._db is not None
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            response = self._db_get(key)
+            if response is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, response)
+            return response
+
+    def put(self, key: str, response: str) -> None:
+        with self._lock:
+            self._remember(key, response)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, response, time.time())
+                )
+                self._db.commit()
+
+    def get_or_generate(self, key: str, generate, bypass: bool = False,
+                        cancel: threading.Event | None = None) -> str:
+        """
+        Return the cached response for key, or call generate() once even if
+        several threads ask for the same key at the same time. With bypass the
+        cache is not read, but the fresh response still replaces the old one.
+        A caller waiting on someone else's generation stops waiting once its
+        cancel is set and leaves it to generate() to give up.
+        """
+        if bypass:
+            with self._lock:
+                self.bypassed += 1
+            response = generate()
+            self.put(key, response)
+            return response
+
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        with self._lock:
+            waiter = self._inflight.get(key)
+            if waiter is None:
+                self._inflight[key] = threading.Event()
+            else:
+                self.deduplicated += 1
+
+        if waiter is not None:
+            while not waiter.wait(CANCEL_POLL):
+                if cancel is not None and cancel.is_set():
+                    return generate()
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+            # The first caller failed; generate on our own
+            return generate()
+
+        try:
+            response = generate()
+            self.put(key, response)
+            return response
+        finally:
+            with self._lock:
+                self._inflight.pop(key).set()
+
+    def _remember(self, key: str, response: str) -> None:
+        # Called with self._lock held
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key: str) -> str | None:
+        # Called with self._lock held
+        if self._db is None:
+            return None
+        row = self._db.execute(
+            "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if self.ttl is not None and time.time() - row[1] > self.ttl:
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        return row[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "deduplicated": self.deduplicated,
+                "bypassed": self.bypassed,
+            }
@@ -1,30 +1,371 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+
 import requests
+from requests.adapters import HTTPAdapter
+from llm_cache import LLMCache, llm_cache_key
+from llm_session import current_turn
+from telemetry import observe_generation
 
+try:
+    import httpx
+except ImportError:  # only needed by AsyncOllamaClient
+    httpx = None
 
-# for Ollama:
-def call_llm(prompt: str, format: str = None) -> str:
-    payload = {
-        "model": "codellama:7b-instruct",
-        "prompt": prompt,
-        "stream": False,
-        "options": {
-            "num_gpu": 0,  # Use CPU only to avoid GPU memory issues
-            "num_ctx": 2048,  # Limit context window size
+log = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "codellama:7b-instruct"
+DEFAULT_OPTIONS = {
+    "num_gpu": 0,  # Use CPU only to avoid GPU memory issues
+    "num_ctx": 2048,  # Limit context window size
+}
+
+# Shared by every caller in this process (LLM_CACHE_SIZE / LLM_CACHE_DB)
+LLM_CACHE = LLMCache.from_env()
+
+
+class LLMError(RuntimeError):
+    """The backend answered with an error or could not be reached."""
+
+
+class LLMServerError(LLMError):
+    """5xx from the backend; worth retrying."""
+
+
+class LLMClientError(LLMError):
+    """The backend rejected the request itself (4xx, or an error in the stream such as an unknown model)."""
+
+
+class LLMCancelled(LLMError):
+    """The caller stopped waiting for this answer (e.g. a hedged request lost)."""
+
+
+@dataclass
+class GenerationResult:
+    text: str
+    stopped_early: bool = False  # we hung up once the answer was complete
+    seconds: float = 0.0
+    first_token_seconds: float | None = None
+    stats: dict = field(default_factory=dict)  # Ollama's final chunk (eval_count, context, ...)
+    backend: str = ""  # base URL of the Ollama instance that answered
+
+
+_FENCED_BLOCK = re.compile(r"```[^\n]*\n.*?```", re.S)
+
+
+def _json_object_end(text: str) -> int | None:
+    """Index just past the first complete top-level JSON object, honouring strings."""
+    start = text.find("{")
+    if start == -1:
+        return None
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == "{":
+            depth += 1
+        elif c == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def answer_is_complete(text: str, format: str | None) -> bool:
+    """
+    True once the streamed answer contains everything we will use: the first
+    JSON object in json mode, otherwise the first fenced code block.
+    """
+    if format == "json":
+        return _json_object_end(text) is not None
+    return _FENCED_BLOCK.search(text) is not None
+
+
+class _Stream:
+    """Accumulates Ollama NDJSON chunks and decides when to stop reading."""
+
+    def __init__(self, format: str | None, stop_early: bool):
+        self.format = format
+        self.stop_early = stop_early
+        self.parts = []
+        self.started = time.monotonic()
+        self.first_token = None
+        self.final = {}
+        self.stopped_early = False
+
+    def feed(self, line) -> bool:
+        """Consume one line; returns True when no more lines are needed."""
+        if not line:
+            return False
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise LLMClientError(f"LLM API error: {chunk['error']}")
+
+        token = chunk.get("response", "")
+        if token:
+            if self.first_token is None:
+                self.first_token = time.monotonic() - self.started
+            self.parts.append(token)
+
+        if chunk.get("done"):
+            self.final = chunk
+            return True
+        # Only re-scan when a token could have closed the block
+        if self.stop_early and ("`" in token or "}" in token):
+            self.stopped_early = answer_is_complete("".join(self.parts), self.format)
+            return self.stopped_early
+        return False
+
+    def result(self) -> GenerationResult:
+        return GenerationResult(
+            text="".join(self.parts),
+            stopped_early=self.stopped_early,
+            seconds=time.monotonic() - self.started,
+            first_token_seconds=self.first_token,
+            stats={k: v for k, v in self.final.items() if k != "response"},
+        )
+
+
+class OllamaClient:
+    """
+    Ollama /api/generate over a pooled keep-alive session, consumed in
+    streaming mode so generation can be cut off after the closing fence or
+    brace instead of waiting for the model to ramble on.
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str = DEFAULT_MODEL,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 8,
+        keep_alive: str | None = None,
+    ):
+        self.base_url = (base_url or os.getenv("OLLAMA_HOST", "http://ollama:11434")).rstrip("/")
+        self.model = model
+        # How long Ollama keeps the model, and with it the prompt's KV cache, loaded after a request
+        self.keep_alive = keep_alive
+        # With streaming, the read timeout applies between chunks, not to the whole generation
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def from_env(cls, base_url: str | None = None, **overrides) -> "OllamaClient":
+        return cls(**{
+            "base_url": base_url,
+            "model": os.getenv("LLM_MODEL", DEFAULT_MODEL),
+            "connect_timeout": float(os.getenv("LLM_CONNECT_TIMEOUT", "5")),
+            "read_timeout": float(os.getenv("LLM_READ_TIMEOUT", "300")),
+            "retries": int(os.getenv("LLM_RETRIES", "2")),
+            "keep_alive": os.getenv("LLM_KEEP_ALIVE") or None,
+            **overrides,
+        })
+
+    def build_payload(self, prompt: str, format: str | None = None, options: dict | None = None,
+                      model: str | None = None, context: list | None = None) -> dict:
+        payload = {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": True,
+            "options": {**DEFAULT_OPTIONS, **(options or {})},
         }
-    }
+        # Add format parameter if specified (e.g., "json" to force JSON output)
+        if format:
+            payload["format"] = format
+        # Tokens of an earlier prompt and answer that this prompt continues
+        if context:
+            payload["context"] = context
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        return payload
+
+    def generate(
+        self,
+        prompt: str,
+        format: str | None = None,
+        options: dict | None = None,
+        stop_early: bool = True,
+        cancel: threading.Event | None = None,
+        model: str | None = None,
+        context: list | None = None,
+    ) -> GenerationResult:
+        payload = self.build_payload(prompt, format, options, model, context)
+
+        for attempt in range(self.retries + 1):
+            try:
+                return self._generate_once(payload, format, stop_early, cancel)
+            except (requests.ConnectionError, requests.Timeout, LLMServerError) as e:
+                if attempt == self.retries:
+                    raise LLMError(f"LLM request failed: {e}") from e
+                log.warning("LLM request failed (%s); retrying", e)
+                time.sleep(self.backoff * (2 ** attempt))
+
+    def _generate_once(self, payload: dict, format: str | None, stop_early: bool,
+                       cancel: threading.Event | None = None) -> GenerationResult:
+        stream = _Stream(format, stop_early)
+        with self.session.post(
+            f"{self.base_url}/api/generate",
+            json=payload,
+            stream=True,
+            timeout=self.timeout,
+        ) as r:
+            if r.status_code >= 500:
+                raise LLMServerError(f"status {r.status_code}: {r.text[:200]}")
+            if r.status_code >= 400:
+                raise LLMClientError(f"status {r.status_code}: {r.text[:200]}")
+            for line in r.iter_lines():
+                if cancel is not None and cancel.is_set():
+                    raise LLMCancelled("answer no longer needed")
+                if stream.feed(line):
+                    # Leaving the block closes the connection, which makes Ollama stop generating
+                    break
+
+        result = stream.result()
+        result.backend = self.base_url
+        observe_generation(result)
+        log.info(
+            "LLM generated %d chars in %.1fs%s",
+            len(result.text), result.seconds, " (stopped early)" if result.stopped_early else "",
+        )
+        return result
+
+    def ping(self, timeout: float = 2.0) -> bool:
+        """True if the backend answers /api/tags (cheap: no model is loaded)."""
+        try:
+            return self.session.get(f"{self.base_url}/api/tags", timeout=timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def close(self) -> None:
+        self.session.close()
+
 
-    # Add format parameter if specified (e.g., "json" to force JSON output)
-    if format:
-        payload["format"] = format
+class AsyncOllamaClient:
+    """asyncio variant of OllamaClient (requires httpx)."""
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        model: str = DEFAULT_MODEL,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 300.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        pool_size: int = 8,
+        keep_alive: str | None = None,
+    ):
+        if httpx is None:
+            raise RuntimeError("AsyncOllamaClient requires httpx (pip install httpx)")
+        self.base_url = (base_url or os.getenv("OLLAMA_HOST", "http://ollama:11434")).rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    build_payload = OllamaClient.build_payload
+
+    async def generate(
+        self,
+        prompt: str,
+        format: str | None = None,
+        options: dict | None = None,
+        stop_early: bool = True,
+        model: str | None = None,
+    ) -> GenerationResult:
+        payload = self.build_payload(prompt, format, options, model)
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._generate_once(payload, format, stop_early)
+            except (httpx.TransportError, LLMServerError) as e:
+                if attempt == self.retries:
+                    raise LLMError(f"LLM request failed: {e}") from e
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+
+    async def _generate_once(self, payload: dict, format: str | None, stop_early: bool) -> GenerationResult:
+        stream = _Stream(format, stop_early)
+        async with self.client.stream("POST", f"{self.base_url}/api/generate", json=payload) as r:
+            if r.status_code >= 500:
+                body = await r.aread()
+                raise LLMServerError(f"status {r.status_code}: {body[:200]!r}")
+            if r.status_code >= 400:
+                body = await r.aread()
+                raise LLMClientError(f"status {r.status_code}: {body[:200]!r}")
+            async for line in r.aiter_lines():
+                if stream.feed(line):
+                    break
+        result = stream.result()
+        result.backend = self.base_url
+        observe_generation(result)
+        return result
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+_client = None
+
+
+def get_client():
+    """The process-wide LLMGateway over LLM_BACKENDS (or just OLLAMA_HOST)."""
+    global _client
+    if _client is None:
+        from llm_gateway import LLMGateway  # imports this module
+        _client = LLMGateway.from_env()
+    return _client
+
+
+# for Ollama:
+def call_llm(prompt: str, format: str = None, use_cache: bool = True, options: dict | None = None,
+             model: str | None = None, cancel: threading.Event | None = None) -> str:
+    """
+    model overrides LLM_MODEL for this call (see model_cascade.py). Inside
+    llm_session.session_turn the call goes through that repair's LLMSession.
+    Setting cancel abandons the generation with LLMCancelled; nothing is cached.
+    """
+    client = get_client()
+    extra = {"model": model} if model else {}
+    if cancel is not None:
+        extra["cancel"] = cancel
+    turn = current_turn()
 
-    r = requests.post(
-        "http://ollama:11434/api/generate",
-        json=payload,
-    )
-    response_json = r.json()
-    print("LLM raw JSON:", response_json)
+    def generate() -> str:
+        if cancel is not None and cancel.is_set():
+            raise LLMCancelled("answer no longer needed")
+        if turn is not None:
+            session, prefix = turn
+            num_ctx = {**DEFAULT_OPTIONS, **(options or {})}["num_ctx"]
+            return session.generate(client, prompt, prefix, format, options, model, num_ctx, cancel=cancel).text
+        return client.generate(prompt, format=format, options=options, **extra).text
 
-    if "error" in response_json:
-        raise RuntimeError(f"LLM API error: {response_json['error']}")
+    if not LLM_CACHE.enabled:
+        return generate()
 
-    return response_json["response"]
+    key = llm_cache_key(model or client.model, prompt, {**DEFAULT_OPTIONS, **(options or {})}, format)
+    return LLM_CACHE.get_or_generate(key, generate, bypass=not use_cache, cancel=cancel)
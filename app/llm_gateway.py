@@ -0,0 +1,365 @@
+"""
+Routing of LLM requests over several Ollama backends.
+
+A repair fleet can share a few CPU inference nodes: LLM_BACKENDS lists
+them (defaulting to OLLAMA_HOST alone), each with a number of concurrent
+requests it may serve. A request takes a free slot on the healthy backend
+picked by LLM_ROUTING - "least_loaded" (lowest fraction of slots in use)
+or "fastest" (lowest recent latency) - and waits when every slot is busy.
+
+Backends that fail LLM_BREAKER_FAILURES times in a row are skipped for
+LLM_BREAKER_COOLDOWN seconds (circuit breaker); after that one trial
+request, or a successful /api/tags health check, lets them back in. With
+LLM_HEDGE_AFTER set, a request still unanswered after that many seconds is
+also sent to a second backend with a free slot, and the slower answer is
+abandoned. A request the backend rejects as invalid (4xx, unknown model)
+is neither retried nor counted against the breaker. A request may name a preferred backend (see llm_session.py),
+which it gets whenever that one has a free slot.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+
+from llm_client import GenerationResult, LLMCancelled, LLMClientError, LLMError, OllamaClient
+
+log = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+ROUTINGS = ("least_loaded", "fastest")
+
+
+@dataclass
+class GatewaySettings:
+    routing: str = "least_loaded"
+    retries: int = 2  # further backends tried after a failure
+    hedge_after: float = 0.0  # seconds before a duplicate request is sent (0 disables hedging)
+    breaker_failures: int = 3  # consecutive failures that open a backend's circuit
+    breaker_cooldown: float = 30.0  # seconds an open circuit stays open
+    health_interval: float = 10.0  # seconds between health checks of open circuits (0 disables)
+    queue_timeout: float = 300.0  # seconds a request may wait for a free slot
+
+    @classmethod
+    def from_env(cls) -> "GatewaySettings":
+        return cls(
+            routing=os.getenv("LLM_ROUTING", "least_loaded"),
+            retries=int(os.getenv("LLM_RETRIES", "2")),
+            hedge_after=float(os.getenv("LLM_HEDGE_AFTER", "0")),
+            breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+            breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+            health_interval=float(os.getenv("LLM_HEALTH_INTERVAL", "10")),
+            queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", "300")),
+        )
+
+
+def parse_backends(spec: str, default_concurrency: int) -> list:
+    """"http://a:11434*2,http://b:11434" -> [(url, max_concurrency)]"""
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, limit = item.partition("*")
+        backends.append((url.rstrip("/"), int(limit) if limit else default_concurrency))
+    return backends
+
+
+class _AnyOf:
+    """A hedge's own cancel flag that also trips when the caller's does."""
+
+    def __init__(self, own: threading.Event, caller: threading.Event | None):
+        self.own, self.caller = own, caller
+
+    def set(self) -> None:
+        self.own.set()
+
+    def is_set(self) -> bool:
+        return self.own.is_set() or (self.caller is not None and self.caller.is_set())
+
+
+class Backend:
+    """One Ollama instance: its client, slot count, latency estimate and circuit state."""
+
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, client: OllamaClient, max_concurrency: int = 1):
+        self.client = client
+        self.url = client.base_url
+        self.max_concurrency = max(1, max_concurrency)
+        self.in_flight = 0
+        self.latency = None  # EWMA of answer seconds; None until the first answer
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.requests = 0
+        self.failures = 0
+        self.hedges_won = 0
+
+    def available(self, now: float) -> bool:
+        """Whether a request may be routed here, ignoring free slots."""
+        if self.state == OPEN and now >= self.open_until:
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            # One trial request decides whether the circuit closes again
+            return not self.trial_in_flight
+        return self.state == CLOSED
+
+    def load(self) -> float:
+        return self.in_flight / self.max_concurrency
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "max_concurrency": self.max_concurrency,
+            "latency_seconds": self.latency,
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges_won": self.hedges_won,
+        }
+
+
+class LLMGateway:
+    """Drop-in for OllamaClient.generate that spreads requests over several backends."""
+
+    def __init__(self, backends: list, settings: GatewaySettings | None = None):
+        if not backends:
+            raise ValueError("LLMGateway needs at least one backend")
+        self.settings = settings or GatewaySettings()
+        if self.settings.routing not in ROUTINGS:
+            raise ValueError(f"Unknown LLM_ROUTING '{self.settings.routing}'; expected one of {ROUTINGS}")
+        self.backends = backends
+        self.hedged = 0
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(
+            max_workers=2 * sum(b.max_concurrency for b in backends), thread_name_prefix="llm-gateway"
+        )
+        self._stopped = threading.Event()
+        self._health_thread = None
+
+    @classmethod
+    def from_env(cls) -> "LLMGateway":
+        spec = os.getenv("LLM_BACKENDS") or os.getenv("OLLAMA_HOST", "http://ollama:11434")
+        concurrency = int(os.getenv("LLM_BACKEND_CONCURRENCY", "4"))
+        # Failover between backends replaces the client's own retries
+        backends = [
+            Backend(OllamaClient.from_env(url, retries=0, pool_size=limit), limit)
+            for url, limit in parse_backends(spec, concurrency)
+        ]
+        gateway = cls(backends, GatewaySettings.from_env())
+        gateway.start_health_checks()
+        return gateway
+
+    @property
+    def model(self) -> str:
+        return self.backends[0].client.model
+
+    # ---------- slots ----------
+
+    def _pick(self, exclude, prefer: str | None = None) -> Backend | None:
+        now = time.monotonic()
+        candidates = [
+            b for b in self.backends
+            if b not in exclude and b.in_flight < b.max_concurrency and b.available(now)
+        ]
+        if not candidates:
+            return None
+        for b in candidates:
+            if b.url == prefer:
+                return b
+        if self.settings.routing == "fastest":
+            # Unmeasured backends first, so every one gets a latency estimate
+            return min(candidates, key=lambda b: (b.latency is not None, b.latency or 0.0, b.load()))
+        return min(candidates, key=lambda b: (b.load(), b.latency or 0.0))
+
+    def _claim(self, backend: Backend) -> Backend:
+        backend.in_flight += 1
+        backend.requests += 1
+        if backend.state == HALF_OPEN:
+            backend.trial_in_flight = True
+        return backend
+
+    def _acquire(self, exclude=(), prefer: str | None = None) -> Backend:
+        """A slot on the best backend, waiting for one to free up."""
+        deadline = time.monotonic() + self.settings.queue_timeout
+        with self._cond:
+            while True:
+                backend = self._pick(exclude, prefer)
+                if backend is not None:
+                    return self._claim(backend)
+                if not any(b not in exclude for b in self.backends):
+                    raise LLMError("every LLM backend failed for this request")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise LLMError(f"no LLM backend slot free within {self.settings.queue_timeout:.0f}s")
+                # Woken by releases; the timeout also notices circuits whose cooldown ended
+                self._cond.wait(min(remaining, 1.0))
+
+    def _try_acquire(self, exclude) -> Backend | None:
+        with self._cond:
+            backend = self._pick(exclude)
+            return self._claim(backend) if backend is not None else None
+
+    def _release(self, backend: Backend, ok: bool | None, seconds: float = 0.0) -> None:
+        """ok=None: the request was abandoned, which says nothing about the backend."""
+        with self._cond:
+            backend.in_flight -= 1
+            backend.trial_in_flight = False
+            if ok:
+                backend.consecutive_failures = 0
+                backend.state = CLOSED
+                a = Backend.EWMA_ALPHA
+                backend.latency = seconds if backend.latency is None else a * seconds + (1 - a) * backend.latency
+            elif ok is False:
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                if backend.state == HALF_OPEN or backend.consecutive_failures >= self.settings.breaker_failures:
+                    self._open(backend)
+            self._cond.notify_all()
+
+    def _open(self, backend: Backend) -> None:
+        if backend.state != OPEN:
+            log.warning("LLM backend %s is failing; skipping it for %.0fs", backend.url, self.settings.breaker_cooldown)
+        backend.state = OPEN
+        backend.open_until = time.monotonic() + self.settings.breaker_cooldown
+
+    # ---------- requests ----------
+
+    def _call(self, backend: Backend, cancel: threading.Event | None, prompt: str, format, options,
+              stop_early: bool, model: str | None = None, context: list | None = None) -> GenerationResult:
+        ok = False
+        started = time.monotonic()
+        try:
+            if cancel is not None and cancel.is_set():
+                raise LLMCancelled("answer no longer needed")
+            result = backend.client.generate(prompt, format=format, options=options, stop_early=stop_early,
+                                             cancel=cancel, model=model, context=context)
+            ok = True
+            return result
+        except (LLMCancelled, LLMClientError):
+            # Says nothing about the backend's health
+            ok = None
+            raise
+        finally:
+            self._release(backend, ok, time.monotonic() - started)
+
+    def generate(
+        self,
+        prompt: str,
+        format: str | None = None,
+        options: dict | None = None,
+        stop_early: bool = True,
+        model: str | None = None,
+        context: list | None = None,
+        prefer: str | None = None,
+        cancel: threading.Event | None = None,
+    ) -> GenerationResult:
+        """
+        prefer: base URL of the backend to use when it has a free slot.
+        cancel: once set, the generation is abandoned with LLMCancelled and its slot freed.
+        """
+        failed = set()
+        for attempt in range(self.settings.retries + 1):
+            backend = self._acquire(exclude=failed, prefer=prefer)
+            try:
+                if self.settings.hedge_after > 0 and len(self.backends) > 1:
+                    return self._hedged(backend, failed, prompt, format, options, stop_early, model, context,
+                                        cancel)
+                return self._call(backend, cancel, prompt, format, options, stop_early, model, context)
+            except (LLMCancelled, LLMClientError):
+                raise
+            except LLMError as e:
+                failed.add(backend)
+                if attempt == self.settings.retries:
+                    raise
+                log.warning("LLM backend %s failed (%s); trying another", backend.url, e)
+                if len(failed) == len(self.backends):
+                    # Every backend failed once: allow them all again
+                    failed.clear()
+
+    def _hedged(self, primary: Backend, failed: set, prompt: str, format, options, stop_early: bool,
+                model: str | None = None, context: list | None = None, cancel: threading.Event | None = None):
+        """Send to primary; if it is slow, also to a second backend and keep the first answer."""
+        cancels = {primary: _AnyOf(threading.Event(), cancel)}
+        args = (prompt, format, options, stop_early, model, context)
+        futures = {self._pool.submit(self._call, primary, cancels[primary], *args): primary}
+        done, _ = wait(futures, timeout=self.settings.hedge_after)
+        if not done:
+            second = self._try_acquire(exclude=failed | {primary})
+            if second is not None:
+                self.hedged += 1
+                cancels[second] = _AnyOf(threading.Event(), cancel)
+                futures[self._pool.submit(self._call, second, cancels[second], *args)] = second
+
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                backend = futures[future]
+                try:
+                    result = future.result()
+                except LLMError as e:
+                    if backend is not primary:
+                        failed.add(backend)
+                    error = e
+                    continue
+                # Stop the losing hedge; the caller's own cancel flag is left alone
+                for other, hedge_cancel in cancels.items():
+                    if other is not backend:
+                        hedge_cancel.set()
+                if backend is not primary:
+                    backend.hedges_won += 1
+                return result
+        # The primary's failure is the one the caller retries around
+        raise error
+
+    # ---------- health ----------
+
+    def check_health(self) -> None:
+        """Ping open circuits; a backend that answers gets its trial right away."""
+        for backend in self.backends:
+            if backend.state == CLOSED:
+                continue
+            healthy = backend.client.ping()
+            with self._cond:
+                if healthy:
+                    log.info("LLM backend %s is answering again", backend.url)
+                    backend.state = HALF_OPEN
+                    backend.open_until = 0.0
+                    self._cond.notify_all()
+                elif backend.state == OPEN:
+                    self._open(backend)
+
+    def start_health_checks(self) -> None:
+        if self.settings.health_interval <= 0 or self._health_thread is not None:
+            return
+
+        def loop():
+            while not self._stopped.wait(self.settings.health_interval):
+                try:
+                    self.check_health()
+                except Exception as e:
+                    log.warning("LLM health check failed: %s", e)
+
+        self._health_thread = threading.Thread(target=loop, name="llm-health", daemon=True)
+        self._health_thread.start()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "routing": self.settings.routing,
+                "hedge_after": self.settings.hedge_after,
+                "hedged": self.hedged,
+                "backends": [b.stats() for b in self.backends],
+            }
+
+    def close(self) -> None:
+        self._stopped.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for backend in self.backends:
+            backend.client.close()
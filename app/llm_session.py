@@ -0,0 +1,104 @@
+"""
+Backend state shared by the LLM calls of one repair.
+
+Repair prompts are a stable prefix (rules, the project files and the
+expected output) followed by a short variable suffix (the latest STDERR and
+exit code), so consecutive attempts mostly resend the same tokens. Ollama
+keeps the KV cache of the last prompt per loaded model and only evaluates
+what follows the longest prefix it has already seen - but only on the
+instance that saw it. An LLMSession therefore sends every attempt of a
+repair to the backend that answered the previous one (while it has a free
+slot), and LLM_KEEP_ALIVE keeps the model loaded between attempts.
+
+With LLM_SESSION_CONTEXT=1 a session also continues from the `context`
+tokens Ollama returns: when the prefix is unchanged, only the new suffix is
+sent after the previous prompt and answer, so the model sees its failed
+answer and what it led to. The context only arrives with Ollama's final
+chunk, so those calls are read to the end instead of stopping early. A
+context that would leave too little of num_ctx for the answer is dropped
+and the full prompt sent instead.
+"""
+import contextvars
+import threading
+from contextlib import contextmanager
+
+from prompt_context import estimate_tokens
+from telemetry import REGISTRY
+
+SESSION_REQUESTS = REGISTRY.counter(
+    "cici_llm_session_requests_total", "LLM calls of repair sessions by what they reused", ("reuse",)
+)
+
+# Put in front of the suffix when continuing from the previous answer
+FOLLOW_UP = "\nThat answer did not fix it. Here is what it produced; answer again in the same format.\n"
+
+# Share of num_ctx kept free for the answer when continuing a context
+ANSWER_SHARE = 0.25
+
+_turn = contextvars.ContextVar("llm_turn", default=None)
+
+
+def current_turn():
+    """(LLMSession, prefix) of the enclosing session_turn, or None."""
+    return _turn.get()
+
+
+@contextmanager
+def session_turn(session, prefix: str):
+    """Send the call_llm calls in this block through session, their prompts starting with prefix."""
+    if session is None:
+        yield
+        return
+    token = _turn.set((session, prefix))
+    try:
+        yield
+    finally:
+        _turn.reset(token)
+
+
+class LLMSession:
+    def __init__(self, key: str, use_context: bool = False):
+        self.key = key
+        self.use_context = use_context
+        self.backend = None  # base URL that answered the last call
+        self.prefix = None
+        self.model = None
+        self.context = None  # Ollama's tokens for the last prompt and answer
+        self.reuse = {"context": 0, "prefix": 0, "new": 0}
+        self._lock = threading.Lock()
+
+    def generate(self, client, prompt: str, prefix: str, format=None, options=None, model=None, num_ctx=2048,
+                 cancel=None):
+        """client.generate for prompt, reusing what the backend kept from the previous call."""
+        model_name = model or client.model
+        suffix = prompt[len(prefix):] if prefix and prompt.startswith(prefix) else None
+        with self._lock:
+            same_prefix = suffix is not None and (prefix, model_name) == (self.prefix, self.model)
+            context = self.context if same_prefix else None
+            if context and len(context) + estimate_tokens(FOLLOW_UP + suffix) > num_ctx * (1 - ANSWER_SHARE):
+                context = None
+            backend = self.backend
+
+        reuse = "context" if context else "prefix" if same_prefix else "new"
+        SESSION_REQUESTS.inc(reuse=reuse)
+        result = client.generate(
+            FOLLOW_UP + suffix if context else prompt,
+            format=format,
+            options=options,
+            stop_early=not self.use_context,
+            model=model,
+            context=context,
+            prefer=backend,
+            cancel=cancel,
+        )
+
+        with self._lock:
+            self.reuse[reuse] += 1
+            self.backend = result.backend or backend
+            self.prefix, self.model = prefix, model_name
+            self.context = result.stats.get("context") if self.use_context else None
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.backend, **self.reuse}
@@ -0,0 +1,229 @@
+"""
+Per-run file manifest.
+
+Every run directory gets one index of its project files: path, size, mtime,
+content hash, a text/binary flag and, for small text files, the content
+itself. It is built once (from the upload's extraction listing, or by a
+single scan for directories created some other way), persisted next to the
+run directory as <run_id>.manifest.json and updated whenever the repair
+loop writes a file, so entry-file selection, prompt building and result
+assembly never walk or re-read the tree.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+
+# Text files up to this size keep their content in the manifest
+CACHE_BYTES = int(os.getenv("MANIFEST_CACHE_BYTES", str(256 * 1024)))
+
+
+# Version control metadata that may come along in an archive
+VCS_DIRS = {".git", ".hg", ".svn"}
+
+
+def is_junk(rel_path: str) -> bool:
+    """OS and version control debris that never belongs to the project."""
+    parts = rel_path.replace(os.sep, "/").split("/")
+    name = parts[-1]
+    return (
+        any(p.startswith("__MACOSX") or p in VCS_DIRS for p in parts[:-1])
+        or name.startswith("._")
+        or name in (".DS_Store", "Thumbs.db")
+        # The upload itself, while it sits in the run directory
+        or rel_path == "upload.zip"
+    )
+
+
+@dataclass
+class FileEntry:
+    path: str
+    size: int
+    mtime: float
+    sha256: str
+    is_text: bool
+    content: str | None = None  # cached for small text files
+
+
+def _entry_from_bytes(rel_path: str, data: bytes, mtime: float) -> FileEntry:
+    try:
+        text = None if b"\0" in data[:8192] else data.decode("utf-8")
+    except UnicodeDecodeError:
+        text = None
+    return FileEntry(
+        path=rel_path,
+        size=len(data),
+        mtime=mtime,
+        sha256=hashlib.sha256(data).hexdigest(),
+        is_text=text is not None,
+        content=text if text is not None and len(data) <= CACHE_BYTES else None,
+    )
+
+
+class Manifest:
+    def __init__(self, root: str, entries: dict | None = None, originals: dict | None = None):
+        self.root = root
+        self.entries = entries or {}  # rel path -> FileEntry
+        # First version of every file the repair rewrote, content always kept
+        # (None for files the repair created)
+        self.originals = originals or {}
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> str:
+        return self.root.rstrip("/") + ".manifest.json"
+
+    # ---------- building ----------
+
+    @classmethod
+    def build(cls, root: str, paths: list | None = None) -> "Manifest":
+        """Index root; with `paths` (e.g. an extraction listing) the tree isn't walked."""
+        if paths is None:
+            paths = []
+            for dirpath, dirs, files in os.walk(root):
+                dirs[:] = [d for d in dirs if not d.startswith("__MACOSX") and d not in VCS_DIRS]
+                for name in files:
+                    paths.append(os.path.relpath(os.path.join(dirpath, name), root))
+        manifest = cls(root)
+        for rel in sorted(paths):
+            if not is_junk(rel):
+                manifest._record(rel)
+        return manifest
+
+    def _record(self, rel_path: str) -> FileEntry:
+        abs_path = os.path.join(self.root, rel_path)
+        with open(abs_path, "rb") as f:
+            data = f.read()
+        entry = _entry_from_bytes(rel_path, data, os.path.getmtime(abs_path))
+        self.entries[rel_path] = entry
+        return entry
+
+    def keep_originals(self, paths) -> None:
+        """Remember the current version of paths before they are overwritten for the first time."""
+        with self._lock:
+            for rel_path in paths:
+                if rel_path in self.originals:
+                    continue
+                entry = self.entries.get(rel_path)
+                if entry is not None and entry.is_text and entry.content is None:
+                    with open(os.path.join(self.root, rel_path), encoding="utf-8", errors="replace") as f:
+                        entry = FileEntry(**{**asdict(entry), "content": f.read()})
+                self.originals[rel_path] = entry
+
+    def update(self, files: dict) -> None:
+        """Record {rel_path: text} that was just written under root."""
+        with self._lock:
+            for rel_path, text in files.items():
+                abs_path = os.path.join(self.root, rel_path)
+                self.entries[rel_path] = _entry_from_bytes(
+                    rel_path, text.encode("utf-8"), os.path.getmtime(abs_path)
+                )
+        self.save()
+
+    # ---------- reading ----------
+
+    def paths(self) -> list:
+        with self._lock:
+            return sorted(self.entries)
+
+    def text(self, rel_path: str) -> str | None:
+        """Content of a text file (from the manifest when cached), None for binaries."""
+        with self._lock:
+            entry = self.entries.get(rel_path)
+        if entry is None or not entry.is_text:
+            return None
+        if entry.content is not None:
+            return entry.content
+        with open(os.path.join(self.root, rel_path), encoding="utf-8", errors="replace") as f:
+            return f.read()
+
+    def original_text(self, rel_path: str) -> str | None:
+        """Content of rel_path before the repair touched it."""
+        with self._lock:
+            if rel_path in self.originals:
+                entry = self.originals[rel_path]
+                return entry.content if entry is not None else None
+        return self.text(rel_path)
+
+    def changed(self) -> list:
+        """Files whose content differs from their original."""
+        with self._lock:
+            return sorted(
+                rel for rel, original in self.originals.items()
+                if original is None or rel not in self.entries
+                or self.entries[rel].sha256 != original.sha256
+            )
+
+    def contents(self, paths: list | None = None) -> dict:
+        """{rel_path: stripped text} for the text files among paths (default: all)."""
+        result = {}
+        for rel_path in (paths if paths is not None else self.paths()):
+            text = self.text(rel_path)
+            if text is not None:
+                result[rel_path] = text.strip()
+        return result
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "files": {rel: asdict(entry) for rel, entry in self.entries.items()},
+                "originals": {rel: asdict(entry) if entry else None for rel, entry in self.originals.items()},
+            }
+
+    # ---------- persistence ----------
+
+    def save(self) -> None:
+        tmp = f"{self.path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, self.path)
+
+    @classmethod
+    def load(cls, root: str) -> "Manifest | None":
+        try:
+            with open(root.rstrip("/") + ".manifest.json") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if "files" not in data:
+            return None
+        return cls(
+            root,
+            {rel: FileEntry(**entry) for rel, entry in data["files"].items()},
+            {rel: FileEntry(**entry) if entry else None for rel, entry in data.get("originals", {}).items()},
+        )
+
+
+# ================================
+# RECENTLY USED MANIFESTS
+# ================================
+
+_manifests = OrderedDict()
+_manifests_lock = threading.Lock()
+_MAX_OPEN = 64
+
+
+def remember_manifest(manifest: Manifest) -> Manifest:
+    with _manifests_lock:
+        _manifests[manifest.root] = manifest
+        _manifests.move_to_end(manifest.root)
+        while len(_manifests) > _MAX_OPEN:
+            _manifests.popitem(last=False)
+    return manifest
+
+
+def get_manifest(root: str) -> Manifest:
+    """The manifest of a run directory: in memory, on disk, or built (and saved) now."""
+    with _manifests_lock:
+        manifest = _manifests.get(root)
+        if manifest is not None:
+            _manifests.move_to_end(root)
+            return manifest
+
+    manifest = Manifest.load(root)
+    if manifest is None:
+        manifest = Manifest.build(root)
+        manifest.save()
+    return remember_manifest(manifest)
@@ -0,0 +1,181 @@
+"""
+Tiered model cascade for repair attempts.
+
+Most repairs are cheap (a missing colon, a misspelt name) and don't need
+the largest model or context. A cascade is an ordered list of tiers, each
+a model and a num_ctx: cheap error classes start on the first tier, the
+rest on the second, and every LLM_CASCADE_FAILURES failed verifications
+move the repair one tier up. Which tier solved which error class is
+counted so the tiers can be tuned.
+
+Tiers are written "model@num_ctx" (either part may be left out, e.g.
+"@4096" keeps LLM_MODEL) with an optional "name=" prefix. LLM_CASCADE
+holds the default list, LLM_CASCADE_<LANGUAGE> one per language, and a
+request may bring its own in RepairRequest.cascade. Without any, a repair
+uses a single tier with the gateway's model and DEFAULT_OPTIONS. A request
+may only name models that are configured here (LLM_MODEL, the tiers above
+and LLM_CASCADE_MODELS) and num_ctx up to LLM_CASCADE_MAX_NUM_CTX.
+"""
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+
+from llm_client import DEFAULT_MODEL
+
+# Error classes a small model or short context usually fixes
+CHEAP_CLASSES = frozenset({"syntax", "name"})
+
+_PYTHON_CLASSES = {
+    "SyntaxError": "syntax",
+    "IndentationError": "syntax",
+    "TabError": "syntax",
+    "NameError": "name",
+    "UnboundLocalError": "name",
+    "ImportError": "name",
+    "ModuleNotFoundError": "name",
+    "AttributeError": "name",
+    "TypeError": "type",
+}
+_PYTHON_EXCEPTION = re.compile(r"^(\w+(?:Error|Exception))\b", re.M)
+
+
+def error_class(language: str, ret: int, out: str, err: str) -> str:
+    """Coarse class of a failed run: syntax, name, type, compile, runtime or wrong_output."""
+    if ret == 0:
+        return "wrong_output"
+    if language == "java":
+        if "cannot find symbol" in err or re.search(r"package \S+ does not exist", err):
+            return "name"
+        if re.search(r"error: (?:'.+' expected|illegal start|class, interface|reached end of file)", err):
+            return "syntax"
+        if "incompatible types" in err:
+            return "type"
+        return "compile" if "error:" in err else "runtime"
+    found = _PYTHON_EXCEPTION.findall(err)
+    return _PYTHON_CLASSES.get(found[-1], "runtime") if found else "runtime"
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    model: str | None = None  # None: the gateway's LLM_MODEL
+    num_ctx: int | None = None  # None: DEFAULT_OPTIONS
+
+    @classmethod
+    def parse(cls, spec: str) -> "Tier":
+        name, _, rest = spec.strip().rpartition("=")
+        model, _, num_ctx = rest.partition("@")
+        if num_ctx and not num_ctx.isdigit():
+            raise ValueError(f"Bad model tier '{spec}': num_ctx must be a whole number")
+        return cls(name=name or rest, model=model or None, num_ctx=int(num_ctx) if num_ctx else None)
+
+    def options(self) -> dict:
+        return {"num_ctx": self.num_ctx} if self.num_ctx else {}
+
+
+DEFAULT_TIER = Tier("default")
+
+
+def parse_cascade(spec) -> list:
+    """"a@2048,b@4096" or a list of tier strings -> [Tier]"""
+    items = spec.split(",") if isinstance(spec, str) else spec
+    return [Tier.parse(item) for item in items if item and item.strip()]
+
+
+@dataclass
+class CascadeSettings:
+    default: list = field(default_factory=lambda: [DEFAULT_TIER])
+    languages: dict = field(default_factory=dict)  # language -> [Tier]
+    failures_per_tier: int = 1
+    models: frozenset = frozenset()  # models a request may name besides the configured tiers'
+    max_num_ctx: int = 8192
+
+    @classmethod
+    def from_env(cls, languages=("python", "java")) -> "CascadeSettings":
+        extra = {m.strip() for m in os.getenv("LLM_CASCADE_MODELS", "").split(",") if m.strip()}
+        return cls(
+            default=parse_cascade(os.getenv("LLM_CASCADE", "")) or [DEFAULT_TIER],
+            languages={
+                lang: tiers for lang in languages
+                if (tiers := parse_cascade(os.getenv(f"LLM_CASCADE_{lang.upper()}", "")))
+            },
+            failures_per_tier=max(1, int(os.getenv("LLM_CASCADE_FAILURES", "1"))),
+            models=frozenset(extra | {os.getenv("LLM_MODEL", DEFAULT_MODEL)}),
+            max_num_ctx=int(os.getenv("LLM_CASCADE_MAX_NUM_CTX", "8192")),
+        )
+
+    def allowed_models(self) -> set:
+        configured = [t for tiers in [self.default, *self.languages.values()] for t in tiers]
+        return set(self.models) | {t.model for t in configured if t.model}
+
+    def check(self, specs) -> list:
+        """Parse a request's tiers -> [Tier]; ValueError for malformed ones or models not configured here."""
+        tiers = parse_cascade(specs or [])
+        allowed = self.allowed_models()
+        for tier in tiers:
+            if tier.model is not None and tier.model not in allowed:
+                raise ValueError(f"Model '{tier.model}' is not available; expected one of {sorted(allowed)}")
+            if tier.num_ctx is not None and not 0 < tier.num_ctx <= self.max_num_ctx:
+                raise ValueError(f"num_ctx of tier '{tier.name}' must be between 1 and {self.max_num_ctx}")
+        return tiers
+
+    def tiers_for(self, language: str, override=None) -> list:
+        return parse_cascade(override or []) or self.languages.get(language) or self.default
+
+
+class ModelCascade:
+    """The tier of one repair, moving up after failed verifications."""
+
+    def __init__(self, tiers: list, error_class: str, failures_per_tier: int = 1):
+        self.tiers = tiers
+        self.error_class = error_class
+        self.failures_per_tier = failures_per_tier
+        self.index = 0 if error_class in CHEAP_CLASSES else min(1, len(tiers) - 1)
+        self.failures = 0
+        self.tried = [self.tier.name]
+
+    @property
+    def tier(self) -> Tier:
+        return self.tiers[self.index]
+
+    def failed(self) -> bool:
+        """Count a failed attempt on the current tier; True when that moved the repair up a tier."""
+        self.failures += 1
+        if self.failures < self.failures_per_tier or self.index == len(self.tiers) - 1:
+            return False
+        self.index += 1
+        self.failures = 0
+        self.tried.append(self.tier.name)
+        return True
+
+    def summary(self) -> dict:
+        return {"error_class": self.error_class, "tier": self.tier.name, "tiers_tried": list(self.tried)}
+
+
+class CascadeStats:
+    """Attempts and successes per (language, error class, tier)."""
+
+    def __init__(self):
+        self.attempts = Counter()
+        self.solved = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, language: str, cascade: ModelCascade, solved: bool) -> None:
+        key = (language, cascade.error_class, cascade.tier.name)
+        with self._lock:
+            self.attempts[key] += 1
+            if solved:
+                self.solved[key] += 1
+
+    def stats(self) -> list:
+        with self._lock:
+            return [
+                {"language": lang, "error_class": cls, "tier": tier,
+                 "attempts": count, "solved": self.solved[(lang, cls, tier)]}
+                for (lang, cls, tier), count in sorted(self.attempts.items())
+            ]
+
+
+CASCADE_STATS = CascadeStats()
@@ -0,0 +1,171 @@
+"""
+Applying model-written unified diffs.
+
+Small models get hunk headers, context lines and whitespace wrong all the
+time, so hunks are located by their content rather than trusted line
+numbers: exact match near the stated position first, then anywhere in the
+file, then ignoring whitespace, then the most similar window above a
+similarity threshold. A patch that still can't be placed raises PatchError
+so the caller can fall back to asking for whole files.
+"""
+import difflib
+import re
+from dataclasses import dataclass, field
+
+_HUNK_HEADER = re.compile(r"^@@\s*-?(\d+)?(?:,(\d+))?\s*\+?(\d+)?(?:,(\d+))?\s*@@")
+_FENCE = re.compile(r"```[^\n]*\n(.*?)```", re.S)
+
+
+class PatchError(ValueError):
+    """The patch is malformed or a hunk can't be placed."""
+
+
+@dataclass
+class Hunk:
+    old_start: int | None  # 1-based, as claimed by the header
+    old: list = field(default_factory=list)  # context and removed lines
+    new: list = field(default_factory=list)  # context and added lines
+
+
+def _strip_path(path: str) -> str:
+    path = path.strip().split("\t")[0]
+    return path[2:] if path.startswith(("a/", "b/")) else path
+
+
+def _line_counts(header) -> list | None:
+    """[old, new] line counts a hunk header promises, or None when it doesn't say."""
+    if header is None or header.group(1) is None or header.group(3) is None:
+        return None
+    old_count, new_count = header.group(2), header.group(4)
+    return [int(old_count) if old_count is not None else 1, int(new_count) if new_count is not None else 1]
+
+
+def _is_file_header(line: str, hunk: Hunk | None, left: list | None, following: list) -> bool:
+    """Whether a ---/+++ line starts a file rather than removing/adding a line that begins with -- or ++."""
+    if hunk is None:
+        return True
+    pair = line.startswith("--- ") and bool(following) and following[0].startswith("+++ ")
+    if pair and following[1:2] and following[1].startswith("@@"):
+        # ---, +++, @@ starts the next file even when the hunk's counts claim more lines
+        return True
+    if left is not None:
+        # Otherwise inside a hunk until the lines its header promised are used up
+        return left[0] <= 0 and left[1] <= 0
+    # No counts to go by: only a --- line directly followed by +++ ends the hunk
+    return pair
+
+
+def parse_unified_diff(text: str, default_path: str) -> dict:
+    """{path: [Hunk]} from a diff, tolerating fences, prose and missing headers."""
+    fenced = _FENCE.findall(text)
+    if fenced:
+        text = "\n".join(fenced)
+
+    patches = {}
+    path = default_path
+    hunk = None
+    left = None  # [old, new] lines the current hunk header still promises
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if line.startswith(("--- ", "+++ ")) and _is_file_header(line, hunk, left, lines[i + 1:i + 3]):
+            if line.startswith("+++ "):
+                path = _strip_path(line[4:])
+                if path == "/dev/null":
+                    path = default_path
+            hunk = None
+            continue
+        header = _HUNK_HEADER.match(line)
+        if header or line.startswith("@@"):
+            hunk = Hunk(int(header.group(1)) if header and header.group(1) else None)
+            left = _line_counts(header)
+            patches.setdefault(path, []).append(hunk)
+            continue
+        if hunk is None:
+            continue  # prose around the diff
+        if line.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        if line.startswith("-"):
+            hunk.old.append(line[1:])
+            used = (1, 0)
+        elif line.startswith("+"):
+            hunk.new.append(line[1:])
+            used = (0, 1)
+        else:
+            # " context", or a context line that lost its leading space (or was left blank)
+            context = line[1:] if line.startswith(" ") else line
+            hunk.old.append(context)
+            hunk.new.append(context)
+            used = (1, 1)
+        if left is not None:
+            left = [left[0] - used[0], left[1] - used[1]]
+
+    for hunks in patches.values():
+        for h in hunks:
+            # Blank lines picked up after the last real line of a hunk
+            while h.old and h.new and h.old[-1] == "" and h.new[-1] == "":
+                h.old.pop()
+                h.new.pop()
+    patches = {p: [h for h in hunks if h.old != h.new] for p, hunks in patches.items()}
+    return {p: hunks for p, hunks in patches.items() if hunks}
+
+
+def _find(lines: list, old: list, hint: int | None, start: int, fuzz: float) -> int | None:
+    """Index in lines where old begins, searching at or after start."""
+    n = len(old)
+    if n == 0:
+        # Pure insertion: trust the header, where -N,0 means after line N
+        return max(start, min(len(lines), hint or 0))
+
+    candidates = range(start, len(lines) - n + 1)
+    # Exact, closest to the claimed position first
+    order = sorted(candidates, key=lambda i: abs(i - ((hint or 1) - 1)))
+    for i in order:
+        if lines[i:i + n] == old:
+            return i
+
+    squash = [re.sub(r"\s+", "", line) for line in lines]
+    target = [re.sub(r"\s+", "", line) for line in old]
+    for i in order:
+        if squash[i:i + n] == target:
+            return i
+
+    best, best_ratio = None, fuzz
+    for i in order:
+        ratio = difflib.SequenceMatcher(None, "\n".join(squash[i:i + n]), "\n".join(target)).ratio()
+        if ratio > best_ratio:
+            best, best_ratio = i, ratio
+    return best
+
+
+def apply_hunks(text: str, hunks: list, fuzz: float = 0.8) -> str:
+    lines = text.splitlines()
+    # Apply bottom-up would need trusted positions; top-down with a moving floor instead
+    floor = 0
+    for hunk in hunks:
+        index = _find(lines, hunk.old, hunk.old_start, floor, fuzz)
+        if index is None:
+            index = _find(lines, hunk.old, hunk.old_start, 0, fuzz)
+        if index is None:
+            preview = "\n".join(hunk.old[:3])
+            raise PatchError(f"could not locate hunk starting with:\n{preview}")
+        lines[index:index + len(hunk.old)] = hunk.new
+        floor = index + len(hunk.new)
+    return "\n".join(lines) + ("\n" if text.endswith("\n") else "")
+
+
+def apply_patch(files: dict, patch_text: str, default_path: str, fuzz: float = 0.8) -> dict:
+    """Apply a unified diff to {path: text}; returns {path: new_text} for the patched files."""
+    patches = parse_unified_diff(patch_text, default_path)
+    if not patches:
+        raise PatchError("no hunks found in the answer")
+
+    result = {}
+    for path, hunks in patches.items():
+        if path not in files:
+            # New file: only additions make sense
+            if any(h.old for h in hunks):
+                raise PatchError(f"patch edits unknown file {path}")
+            result[path] = "\n".join(line for h in hunks for line in h.new) + "\n"
+            continue
+        result[path] = apply_hunks(files[path], hunks, fuzz)
+    return result
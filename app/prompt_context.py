@@ -0,0 +1,273 @@
+"""
+Token-budgeted project context for multi-file repair prompts.
+
+Concatenating every file overflows the model's small context window
+(num_ctx) on anything but toy projects, and Ollama silently drops what
+doesn't fit. Instead, files are ranked by how relevant they are to the
+failure: files named in the stack trace first (innermost frame highest),
+then the entry file and their import-graph neighbours, then everything
+else by graph distance. Files are sent in full while the budget lasts,
+then as signature summaries, and finally only by name.
+"""
+import ast
+import os
+import re
+from dataclasses import dataclass, field
+
+# Rough chars-per-token of code for llama-family tokenizers
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+# ================================
+# STACK TRACES
+# ================================
+
+@dataclass
+class Frame:
+    path: str  # project-relative path
+    line: int | None
+
+
+_PY_FRAME = re.compile(r'File "([^"]+)", line (\d+)')
+_JAVA_FRAME = re.compile(r"at ([\w$.]+)\.[\w$<>]+\((\w+\.java):(\d+)\)")
+_JAVAC_ERROR = re.compile(r"^(?:/work/)?([\w/.$-]+\.java):(\d+): error", re.M)
+
+
+def _match_project_path(path: str, project_files: list) -> str | None:
+    """Project file that path refers to (container and scratch prefixes differ)."""
+    path = path.replace("\\", "/")
+    best = None
+    for rel in project_files:
+        if path == rel or path.endswith("/" + rel):
+            if best is None or len(rel) > len(best):
+                best = rel
+    return best
+
+
+def parse_frames(err: str, project_files: list) -> list:
+    """Frames of err that point into the project, outermost first."""
+    frames = []
+    for path, line in _PY_FRAME.findall(err):
+        rel = _match_project_path(path, project_files)
+        if rel:
+            frames.append(Frame(rel, int(line)))
+
+    # Java stack traces list the innermost frame first
+    java = []
+    for cls, filename, line in _JAVA_FRAME.findall(err):
+        package = cls.rsplit(".", 1)[0].replace(".", "/") if "." in cls else ""
+        rel = _match_project_path(f"{package}/{filename}" if package else filename, project_files)
+        if rel is None:
+            rel = next((p for p in project_files if os.path.basename(p) == filename), None)
+        if rel:
+            java.append(Frame(rel, int(line)))
+    frames.extend(reversed(java))
+
+    for path, line in _JAVAC_ERROR.findall(err):
+        rel = _match_project_path(path, project_files)
+        if rel:
+            frames.append(Frame(rel, int(line)))
+    return frames
+
+
+# ================================
+# IMPORT GRAPH
+# ================================
+
+def _python_module_files(project_files: list) -> dict:
+    modules = {}
+    for rel in project_files:
+        if rel.endswith(".py"):
+            module = rel[:-3].replace("/", ".")
+            if module.endswith(".__init__"):
+                module = module[:-len(".__init__")]
+            modules[module] = rel
+    return modules
+
+
+def _python_imports(rel: str, code: str, modules: dict) -> set:
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return set()
+    package = rel[:-3].replace("/", ".").rsplit(".", 1)[0] if "/" in rel else ""
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parts = package.split(".") if package else []
+                parts = parts[:len(parts) - (node.level - 1)] if node.level > 1 else parts
+                base = ".".join(p for p in parts + ([base] if base else []) if p)
+            names.append(base)
+            names.extend(f"{base}.{alias.name}" if base else alias.name for alias in node.names)
+
+    deps = set()
+    for name in names:
+        # Modules are also importable relative to the entry file's directory
+        while name:
+            if name in modules:
+                deps.add(modules[name])
+                break
+            suffix = next((m for m in modules if m.endswith("." + name)), None)
+            if suffix:
+                deps.add(modules[suffix])
+                break
+            name = name.rpartition(".")[0]
+    deps.discard(rel)
+    return deps
+
+
+def _java_references(rel: str, code: str, classes: dict) -> set:
+    deps = set()
+    for cls, path in classes.items():
+        if path != rel and re.search(rf"\b{re.escape(cls)}\b", code):
+            deps.add(path)
+    return deps
+
+
+def import_graph(files: dict, language: str) -> dict:
+    """{path: set of project paths it depends on}."""
+    paths = list(files)
+    if language == "java":
+        classes = {os.path.splitext(os.path.basename(p))[0]: p for p in paths if p.endswith(".java")}
+        return {p: _java_references(p, code, classes) for p, code in files.items()}
+    modules = _python_module_files(paths)
+    return {p: _python_imports(p, code, modules) if p.endswith(".py") else set() for p, code in files.items()}
+
+
+# ================================
+# SUMMARIES
+# ================================
+
+def summarize(path: str, code: str) -> str:
+    """Imports and declarations only, enough to call into the file correctly."""
+    if path.endswith(".py"):
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            tree = None
+        if tree is not None:
+            lines = code.splitlines()
+            keep = []
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                    keep.append(node.lineno)
+                    # Multi-line signatures up to the colon
+                    if not isinstance(node, (ast.Import, ast.ImportFrom)) and node.body:
+                        keep.extend(range(node.lineno + 1, node.body[0].lineno))
+                elif isinstance(node, ast.Assign) and node.col_offset == 0:
+                    keep.append(node.lineno)
+            return "\n".join(lines[i - 1] for i in sorted(set(keep)) if i - 1 < len(lines))
+
+    declaration = re.compile(
+        r"^\s*(import |package |(public|private|protected|static|final|abstract|class|interface|enum|def |async def )).*"
+    )
+    return "\n".join(
+        line.rstrip(" {") for line in code.splitlines()
+        if declaration.match(line) and not line.strip().startswith(("return", "//", "*"))
+    )
+
+
+# ================================
+# CONTEXT
+# ================================
+
+@dataclass
+class ProjectContext:
+    payload: str
+    tokens_used: int
+    budget: int
+    full: list = field(default_factory=list)
+    summarized: list = field(default_factory=list)
+    omitted: list = field(default_factory=list)
+
+    def stats(self) -> dict:
+        return {
+            "tokens_used": self.tokens_used,
+            "budget": self.budget,
+            "full": self.full,
+            "summarized": self.summarized,
+            "omitted": self.omitted,
+        }
+
+
+def rank_files(files: dict, entry_file: str, frames: list, graph: dict) -> list:
+    """Paths ordered from most to least relevant to the failure."""
+    score = {p: 0.0 for p in files}
+
+    for depth, frame in enumerate(frames):
+        # Later frames are closer to where the error was raised
+        score[frame.path] = max(score[frame.path], 100 + depth)
+
+    if entry_file in score:
+        score[entry_file] = max(score[entry_file], 90)
+
+    reverse = {p: set() for p in files}
+    for p, deps in graph.items():
+        for d in deps:
+            reverse.setdefault(d, set()).add(p)
+
+    # Breadth-first distance from the trace and entry file over the undirected graph
+    seeds = {f.path for f in frames} | ({entry_file} if entry_file in files else set())
+    distance = {p: 0 for p in seeds}
+    queue = list(seeds)
+    while queue:
+        current = queue.pop(0)
+        for neighbour in graph.get(current, set()) | reverse.get(current, set()):
+            if neighbour in files and neighbour not in distance:
+                distance[neighbour] = distance[current] + 1
+                queue.append(neighbour)
+
+    for p in files:
+        if p not in seeds:
+            score[p] = 50 / distance[p] if p in distance else 0.0
+    return sorted(files, key=lambda p: (-score[p], len(files[p]), p))
+
+
+def _block(path: str, body: str, kind: str) -> str:
+    label = "FILE" if kind == "full" else "SUMMARY"
+    return f"===== {label}: {path} =====\n{body}\n===== END {label} {path} =====\n"
+
+
+def build_context(files: dict, entry_file: str, err: str, language: str, budget: int) -> ProjectContext:
+    """Fit the most relevant files into `budget` tokens."""
+    frames = parse_frames(err or "", list(files))
+    graph = import_graph(files, language)
+    ranked = rank_files(files, entry_file, frames, graph)
+
+    context = ProjectContext(payload="", tokens_used=0, budget=budget)
+    blocks = []
+    for path in ranked:
+        full = _block(path, files[path], "full")
+        cost = estimate_tokens(full)
+        if context.tokens_used + cost <= budget or not blocks:
+            blocks.append(full)
+            context.full.append(path)
+            context.tokens_used += cost
+            continue
+
+        summary = summarize(path, files[path])
+        if summary:
+            block = _block(path, summary, "summary")
+            cost = estimate_tokens(block)
+            if context.tokens_used + cost <= budget:
+                blocks.append(block)
+                context.summarized.append(path)
+                context.tokens_used += cost
+                continue
+        context.omitted.append(path)
+
+    if context.omitted:
+        listing = "===== OTHER FILES (not shown) =====\n" + "\n".join(context.omitted) + "\n"
+        blocks.append(listing)
+        context.tokens_used += estimate_tokens(listing)
+
+    context.payload = "\n".join(blocks)
+    return context
@@ -0,0 +1,217 @@
+"""
+Fork-based Python execution.
+
+A long-lived python-runner container runs a few copies of
+runners/fork_worker.py (one `docker exec -i` each). The worker has the
+common stdlib already imported and forks a resource-limited child per run,
+so verifying a small script costs a docker cp and a fork instead of a
+container start.
+"""
+import json
+import logging
+import os
+import queue
+import subprocess
+import threading
+import uuid
+from dataclasses import asdict, dataclass
+
+log = logging.getLogger(__name__)
+
+WORKER_SCRIPT = "/opt/cici/fork_worker.py"
+# Seconds on top of the run's own timeout for copying, forking and the reply
+REPLY_GRACE = 10.0
+
+
+class WorkerError(RuntimeError):
+    """The worker process or its container is gone, or stopped answering."""
+
+
+@dataclass
+class WorkerLimits:
+    cpu_seconds: int = 10
+    memory_mb: int = 512
+    max_output: int = 1_000_000  # bytes kept per stream
+    timeout: float = 30.0  # wall clock seconds
+    processes: int = 2  # concurrent fork servers per container
+
+    @classmethod
+    def from_env(cls) -> "WorkerLimits":
+        return cls(
+            cpu_seconds=int(os.getenv("PY_WORKER_CPU_SECONDS", "10")),
+            memory_mb=int(os.getenv("PY_WORKER_MEMORY_MB", "512")),
+            max_output=int(os.getenv("PY_WORKER_MAX_OUTPUT", "1000000")),
+            timeout=float(os.getenv("PY_WORKER_TIMEOUT", "30")),
+            processes=int(os.getenv("PY_WORKER_PROCESSES", "2")),
+        )
+
+    def request_limits(self) -> dict:
+        limits = asdict(self)
+        limits.pop("processes")
+        return limits
+
+
+class ForkWorker:
+    """One fork server process, spoken to with line-delimited JSON over its pipes."""
+
+    def __init__(self, argv: list, limits: WorkerLimits):
+        self.limits = limits
+        self.proc = subprocess.Popen(
+            argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        # Replies are read on a thread so a hung worker can't block the caller forever
+        self._replies = queue.Queue()
+        threading.Thread(target=self._read_replies, name="fork-worker-reader", daemon=True).start()
+
+    def _read_replies(self) -> None:
+        for line in self.proc.stdout:
+            self._replies.put(line)
+        self._replies.put("")  # EOF
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, src: str, entry: str, remove: bool = False):
+        """Run entry from the src directory (as the worker sees it) -> (returncode, stdout, stderr)."""
+        request = {"src": src, "entry": entry, "remove": remove, "limits": self.limits.request_limits()}
+        try:
+            self.proc.stdin.write(json.dumps(request) + "\n")
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerError(f"fork worker died: {e}") from e
+        try:
+            line = self._replies.get(timeout=self.limits.timeout + REPLY_GRACE)
+        except queue.Empty:
+            log.warning("Fork worker gave no answer within %.0fs; restarting it", self.limits.timeout + REPLY_GRACE)
+            self.proc.kill()
+            raise WorkerError("fork worker stopped answering")
+        if not line:
+            raise WorkerError(f"fork worker exited with {self.proc.poll()}")
+        reply = json.loads(line)
+        return reply["returncode"], reply["stdout"], reply["stderr"]
+
+    def close(self) -> None:
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+def _docker(args: list):
+    proc = subprocess.run(["docker"] + args, capture_output=True, text=True)
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+class PythonWorkerPool:
+    """A python-runner container hosting `limits.processes` fork servers."""
+
+    def __init__(self, image: str = "python-runner", limits: WorkerLimits | None = None, docker=None):
+        self.image = image
+        self.limits = limits or WorkerLimits()
+        self.docker = docker or _docker
+        self.name = f"python_worker_{uuid.uuid4().hex[:8]}"
+        self._idle = queue.Queue()
+        self._workers = []
+        self._lock = threading.Lock()
+        self.started = False
+        self.runs = 0
+
+    def start(self) -> None:
+        rc, _, err = self.docker(["run", "-d", "--name", self.name, "--network", "none",
+                                  self.image, "sleep", "infinity"])
+        if rc != 0:
+            raise WorkerError(f"Could not start Python worker container: {err}")
+        self.docker(["exec", self.name, "mkdir", "-p", "/jobs"])
+        for _ in range(max(1, self.limits.processes)):
+            self._add_worker()
+        self.started = True
+
+    def _add_worker(self) -> None:
+        worker = ForkWorker(["docker", "exec", "-i", self.name, "python", WORKER_SCRIPT], self.limits)
+        with self._lock:
+            self._workers.append(worker)
+        self._idle.put(worker)
+
+    def run(self, src_dir: str, entry: str):
+        """Copy src_dir into the container and run entry in a forked child."""
+        job_dir = f"/jobs/{uuid.uuid4().hex}"
+        rc, _, err = self.docker(["cp", src_dir.rstrip("/") + "/.", f"{self.name}:{job_dir}"])
+        if rc != 0:
+            raise WorkerError(f"docker cp into worker failed: {err}")
+
+        worker = self._idle.get()
+        healthy = False
+        try:
+            result = worker.run(job_dir, entry, remove=True)
+            healthy = True
+        finally:
+            if healthy:
+                self._idle.put(worker)
+            else:
+                # Dead, hung or garbled: replace the process so the pool keeps its size
+                worker.proc.kill()
+                with self._lock:
+                    self._workers.remove(worker)
+                self._add_worker()
+        self.runs += 1
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+        if self.started:
+            self.docker(["rm", "-f", self.name])
+            self.started = False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "container": self.name if self.started else None,
+                "processes": len(self._workers),
+                "idle": self._idle.qsize(),
+                "runs": self.runs,
+            }
+
+
+# ================================
+# SHARED POOL (one per API process)
+# ================================
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_python_workers(limits: WorkerLimits | None = None) -> PythonWorkerPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = PythonWorkerPool(limits=limits or WorkerLimits.from_env())
+            pool.start()
+            _pool = pool
+        return _pool
+
+
+def reset_python_workers() -> None:
+    """Stop the shared pool; the next get_python_workers() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def python_worker_stats() -> dict | None:
+    with _pool_lock:
+        return _pool.stats() if _pool is not None else None
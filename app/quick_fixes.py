@@ -0,0 +1,377 @@
+"""
+Rule-based fixes tried before the LLM.
+
+Many failures are mechanical: a missing colon or bracket, a typo in a
+name, str + int, an index one past the end, a divisor initialised to 0.
+Each rule looks at the exception (or javac error) and the innermost project
+frame of the traceback, and proposes small edits to that line using the
+AST or tokens of the file. Proposals are only candidates: the caller runs
+them like any other fix and falls through to the LLM if none works.
+
+Some rules only guess at the intent (drop the statement using an undefined
+name, divide by a parameter's len or guard the division, take the last item
+instead): they make the program exit 0 whether or not it then does the right
+thing, so they are only proposed when the request gives an expected output
+to check them against.
+"""
+import ast
+import difflib
+import re
+from dataclasses import dataclass
+
+from prompt_context import parse_frames
+
+_EXCEPTION = re.compile(r"^(\w+(?:Error|Exception|Warning)):\s?(.*)$", re.M)
+_JAVAC = re.compile(r"^(?:/work/)?([\w/.$-]+\.java):(\d+): error: (.*)$", re.M)
+_BLOCK_START = re.compile(r"^\s*(async\s+)?(def|class|if|elif|else|for|while|try|except|finally|with|match|case)\b")
+_PAIRS = {"(": ")", "[": "]", "{": "}"}
+
+
+@dataclass
+class QuickFix:
+    rule: str
+    description: str
+    files: dict  # {relative_path: new_contents}
+
+
+# ================================
+# HELPERS
+# ================================
+
+def _lines(text: str) -> list:
+    return text.split("\n")
+
+
+def _with_line(text: str, lineno: int, new_line: str | None) -> str:
+    """text with line `lineno` (1-based) replaced, or removed when new_line is None."""
+    lines = _lines(text)
+    if new_line is None:
+        del lines[lineno - 1]
+    else:
+        lines[lineno - 1] = new_line
+    return "\n".join(lines)
+
+
+def _split_comment(line: str) -> tuple:
+    """(code, comment) for a line whose comment can be found without a tokenizer."""
+    if "#" in line and "'" not in line and '"' not in line:
+        index = line.index("#")
+        return line[:index].rstrip(), "  " + line[index:]
+    return line.rstrip(), ""
+
+
+# AST column offsets count UTF-8 bytes, not characters
+
+def _segment(line: str, start: int, end: int) -> str:
+    return line.encode("utf-8")[start:end].decode("utf-8")
+
+
+def _replace_spans(line: str, spans: list) -> str:
+    """Apply [(start_col, end_col, text)] to line, right to left."""
+    data = line.encode("utf-8")
+    for start, end, text in sorted(spans, reverse=True):
+        data = data[:start] + text.encode("utf-8") + data[end:]
+    return data.decode("utf-8")
+
+
+def _nodes_on_line(tree: ast.AST, lineno: int, kind) -> list:
+    return [
+        n for n in ast.walk(tree)
+        if isinstance(n, kind) and n.lineno == lineno and getattr(n, "end_lineno", lineno) == lineno
+    ]
+
+
+def _defined_names(tree: ast.AST) -> set:
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.arg):
+            names.add(node.arg)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((a.asname or a.name).split(".")[0] for a in node.names)
+    return names
+
+
+def _enclosing_function(tree: ast.AST, lineno: int):
+    best = None
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.lineno <= lineno <= node.end_lineno:
+            if best is None or node.lineno > best.lineno:
+                best = node
+    return best
+
+
+def _statement_at(tree: ast.AST, lineno: int):
+    """(statement, the body list holding it) for the innermost statement starting on lineno."""
+    found = None
+    for node in ast.walk(tree):
+        for name in ("body", "orelse", "finalbody"):
+            body = getattr(node, name, None)
+            if isinstance(body, list):
+                for stmt in body:
+                    if isinstance(stmt, ast.stmt) and stmt.lineno == lineno:
+                        found = (stmt, body)
+    return found
+
+
+# ================================
+# PYTHON RULES
+# ================================
+
+def _missing_colon(text, lineno, exc, message):
+    if exc != "SyntaxError" or not ("expected ':'" in message or message.startswith("invalid syntax")):
+        return
+    line = _lines(text)[lineno - 1]
+    code, comment = _split_comment(line)
+    if _BLOCK_START.match(code) and not code.endswith(":"):
+        yield "added the missing ':'", _with_line(text, lineno, code + ":" + comment)
+
+
+def _unclosed_bracket(text, lineno, exc, message):
+    match = re.match(r"'([(\[{])' was never closed", message)
+    if exc != "SyntaxError" or not match:
+        return
+    code, comment = _split_comment(_lines(text)[lineno - 1])
+    yield f"closed the '{match.group(1)}'", _with_line(text, lineno, code + _PAIRS[match.group(1)] + comment)
+
+
+def _undefined_name(text, lineno, exc, message):
+    match = re.match(r"name '(\w+)' is not defined", message)
+    if exc not in ("NameError", "UnboundLocalError") or not match:
+        return
+    name = match.group(1)
+    tree = ast.parse(text)
+    line = _lines(text)[lineno - 1]
+
+    # Python also suggests builtins (email -> eval); only names of this file are used
+    hint = re.search(r"Did you mean: '(\w+)'", message)
+    known = _defined_names(tree) - {name}
+    suggestions = [hint.group(1)] if hint and hint.group(1) in known else []
+    suggestions += [s for s in difflib.get_close_matches(name, sorted(known), n=3, cutoff=0.75) if s not in suggestions]
+    # Only the name itself: the same word inside a string or comment stays
+    uses = [node for node in ast.walk(tree) if isinstance(node, ast.Name) and node.id == name
+            and node.lineno == lineno]
+    if not uses:
+        return
+    for suggestion in suggestions:
+        spans = [(node.col_offset, node.end_col_offset, suggestion) for node in uses]
+        yield f"renamed '{name}' to '{suggestion}'", _with_line(text, lineno, _replace_spans(line, spans))
+
+
+def _undefined_name_stub(text, lineno, exc, message):
+    match = re.match(r"name '(\w+)' is not defined", message)
+    if exc not in ("NameError", "UnboundLocalError") or not match:
+        return
+    name = match.group(1)
+    tree = ast.parse(text)
+    line = _lines(text)[lineno - 1]
+    found = _statement_at(tree, lineno)
+    if found is None:
+        return
+    stmt, body = found
+    if isinstance(stmt, ast.Expr) and len(body) > 1 and stmt.end_lineno == lineno:
+        yield f"removed the statement using undefined '{name}'", _with_line(text, lineno, None)
+    indent = line[:len(line) - len(line.lstrip())]
+    lines = _lines(text)
+    lines.insert(lineno - 1, f"{indent}{name} = None")
+    yield f"defined '{name}'", "\n".join(lines)
+
+
+def _str_concatenation(text, lineno, exc, message):
+    if exc != "TypeError" or not (
+        "can only concatenate str" in message
+        or re.search(r"unsupported operand type\(s\) for \+=?: '(int|float)' and 'str'", message)
+        or re.search(r"unsupported operand type\(s\) for \+=?: 'str' and '(int|float)'", message)
+    ):
+        return
+    tree = ast.parse(text)
+    line = _lines(text)[lineno - 1]
+
+    def is_text(node):
+        return (isinstance(node, ast.Constant) and isinstance(node.value, str)) or isinstance(node, ast.JoinedStr) \
+            or (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "str")
+
+    spans = []
+    for node in _nodes_on_line(tree, lineno, ast.BinOp):
+        if not isinstance(node.op, ast.Add):
+            continue
+        # Flatten a + b + c into its operands
+        operands, stack = [], [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, ast.BinOp) and isinstance(current.op, ast.Add):
+                stack.extend([current.right, current.left])
+            else:
+                operands.append(current)
+        if not any(is_text(o) for o in operands):
+            continue
+        for operand in operands:
+            if not is_text(operand) and operand.lineno == lineno == operand.end_lineno:
+                span = (operand.col_offset, operand.end_col_offset, f"str({_segment(line, operand.col_offset, operand.end_col_offset)})")
+                if span not in spans:
+                    spans.append(span)
+        break  # the outermost chain covers the nested ones
+    if spans:
+        yield "converted the operands to str", _with_line(text, lineno, _replace_spans(line, spans))
+
+
+def _index_out_of_range(text, lineno, exc, message):
+    if exc != "IndexError" or "out of range" not in message:
+        return
+    tree = ast.parse(text)
+    line = _lines(text)[lineno - 1]
+    for node in _nodes_on_line(tree, lineno, ast.Subscript):
+        index = node.slice
+        if isinstance(index, ast.Call) and isinstance(index.func, ast.Name) and index.func.id == "len":
+            yield ("indexed len() - 1",
+                   _with_line(text, lineno, _replace_spans(line, [(index.end_col_offset, index.end_col_offset, " - 1")])))
+
+
+def _index_last_item(text, lineno, exc, message):
+    if exc != "IndexError" or "out of range" not in message:
+        return
+    tree = ast.parse(text)
+    line = _lines(text)[lineno - 1]
+    for node in _nodes_on_line(tree, lineno, ast.Subscript):
+        index = node.slice
+        if isinstance(index, ast.Constant) and isinstance(index.value, int) and index.value > 0:
+            yield (f"used the last item instead of [{index.value}]",
+                   _with_line(text, lineno, _replace_spans(line, [(index.col_offset, index.end_col_offset, "-1")])))
+
+
+def _division_by_zero(text, lineno, exc, message):
+    if exc != "ZeroDivisionError":
+        return
+    tree = ast.parse(text)
+    lines = _lines(text)
+    line = lines[lineno - 1]
+    for node in _nodes_on_line(tree, lineno, ast.BinOp):
+        if not isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)) or not isinstance(node.right, ast.Name):
+            continue
+        divisor = node.right.id
+        scope = _enclosing_function(tree, lineno) or tree
+
+        # A divisor initialised to 0 was most likely meant to be a count
+        for assign in ast.walk(scope):
+            if (isinstance(assign, ast.Assign) and len(assign.targets) == 1
+                    and isinstance(assign.targets[0], ast.Name) and assign.targets[0].id == divisor
+                    and isinstance(assign.value, ast.Constant) and assign.value.value == 0
+                    and assign.value.lineno == assign.value.end_lineno):
+                value = assign.value
+                params = [a.arg for a in scope.args.args] if isinstance(scope, (ast.FunctionDef, ast.AsyncFunctionDef)) else []
+                for param in params:
+                    fixed = _replace_spans(lines[value.lineno - 1], [(value.col_offset, value.end_col_offset, f"len({param})")])
+                    yield f"set {divisor} to len({param})", _with_line(text, value.lineno, fixed)
+
+
+def _division_guard(text, lineno, exc, message):
+    if exc != "ZeroDivisionError":
+        return
+    tree = ast.parse(text)
+    line = _lines(text)[lineno - 1]
+    for node in _nodes_on_line(tree, lineno, ast.BinOp):
+        if not isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)) or not isinstance(node.right, ast.Name):
+            continue
+        divisor = node.right.id
+        expression = _segment(line, node.col_offset, node.end_col_offset)
+        guarded = f"({expression} if {divisor} else 0)"
+        yield f"guarded the division by {divisor}", _with_line(
+            text, lineno, _replace_spans(line, [(node.col_offset, node.end_col_offset, guarded)])
+        )
+
+
+# (rule, proposer, only a guess: needs an expected output to be trusted)
+PYTHON_RULES = [
+    ("missing_colon", _missing_colon, False),
+    ("unclosed_bracket", _unclosed_bracket, False),
+    ("undefined_name", _undefined_name, False),
+    ("str_concatenation", _str_concatenation, False),
+    ("index_out_of_range", _index_out_of_range, False),
+    ("division_by_zero", _division_by_zero, True),
+    ("undefined_name_stub", _undefined_name_stub, True),
+    ("index_last_item", _index_last_item, True),
+    ("division_guard", _division_guard, True),
+]
+
+
+# ================================
+# JAVA RULES
+# ================================
+
+_JAVA_KEYWORDS = set("""
+abstract assert boolean break byte case catch char class const continue default do double else enum extends
+final finally float for goto if implements import instanceof int interface long native new package private
+protected public return short static strictfp super switch synchronized this throw throws transient try void
+volatile while var record true false null
+""".split())
+
+
+def _java_fixes(text: str, lineno: int, message: str, detail: str):
+    lines = _lines(text)
+    if not 0 < lineno <= len(lines):
+        return
+    line = lines[lineno - 1]
+    if message == "';' expected":
+        code = line.rstrip()
+        comment = ""
+        if "//" in code and '"' not in code:
+            code, comment = code.split("//", 1)
+            code, comment = code.rstrip(), "  //" + comment
+        if code and not code.endswith(";"):
+            yield "missing_semicolon", "added the missing ';'", _with_line(text, lineno, code + ";" + comment)
+
+    symbol = re.search(r"symbol:\s+(?:variable|method|class) (\w+)", detail)
+    if message == "cannot find symbol" and symbol:
+        name = symbol.group(1)
+        identifiers = set(re.findall(r"\b[A-Za-z_]\w*\b", text)) - _JAVA_KEYWORDS - {name}
+        for suggestion in difflib.get_close_matches(name, sorted(identifiers), n=3, cutoff=0.75):
+            yield ("unknown_symbol", f"renamed '{name}' to '{suggestion}'",
+                   _with_line(text, lineno, re.sub(rf"\b{name}\b", suggestion, line)))
+
+
+# ================================
+# ENTRY POINT
+# ================================
+
+def propose_fixes(language: str, files: dict, entry_file: str, err: str, guesses: bool = False) -> list:
+    """
+    Candidate QuickFixes for the failure in err, most likely first. guesses
+    adds the rules that only make sense when the output is checked.
+    """
+    if language == "java":
+        fixes = []
+        for match in _JAVAC.finditer(err or ""):
+            path = next((p for p in files if p == match.group(1) or p.endswith("/" + match.group(1))), None)
+            if path is None:
+                continue
+            detail = err[match.end():match.end() + 200]
+            for rule, description, text in _java_fixes(files[path], int(match.group(2)), match.group(3).strip(), detail):
+                fixes.append(QuickFix(rule, f"{path}:{match.group(2)}: {description}", {path: text}))
+            break  # later errors are often caused by the first
+        return fixes
+
+    exceptions = _EXCEPTION.findall(err or "")
+    frames = [f for f in parse_frames(err or "", list(files)) if f.path.endswith(".py") and f.line]
+    if not exceptions or not frames:
+        return []
+    exc, message = exceptions[-1]
+    frame = frames[-1]  # innermost
+    text = files.get(frame.path)
+    if text is None or frame.line > len(_lines(text)):
+        return []
+
+    fixes = []
+    for rule, propose, guess in PYTHON_RULES:
+        if guess and not guesses:
+            continue
+        try:
+            for description, new_text in propose(text, frame.line, exc, message.strip()):
+                if new_text != text:
+                    fixes.append(QuickFix(rule, f"{frame.path}:{frame.line}: {description}", {frame.path: new_text}))
+        except SyntaxError:
+            # Rules that need an AST don't apply to a file that doesn't parse
+            continue
+    return fixes
@@ -0,0 +1,219 @@
+"""
+When to keep trying, change tack or give up on a repair.
+
+Before every attempt the repair loop asks its policy for a Decision. The
+"fixed" policy only counts attempts, like the loop always did. The
+"adaptive" policy also stops on the request's wall-clock deadline and token
+budget, and watches for a repair that is stuck: the same error signature
+(the failure with line numbers, paths and addresses stripped) or near
+identical answers several attempts in a row. A stuck repair first moves up
+the Strategy ladder (whole files instead of patches, then a fresh sample
+instead of the cached answer, then - only when max_candidates allows it -
+more parallel samples, as many as the rest of the token budget pays for)
+and is aborted once there is nothing left to try, so hopeless cases stop
+holding a worker, the LLM and the sandbox.
+"""
+import difflib
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass, replace
+
+CONTINUE = "continue"
+ESCALATE = "escalate"
+ABORT = "abort"
+
+
+@dataclass
+class PolicyLimits:
+    max_attempts: int = 8
+    deadline_seconds: float | None = None  # from when the job was submitted
+    token_budget: int | None = None  # prompt + answer tokens over the whole repair
+    repeat_limit: int = 2  # identical failures in a row before the repair counts as stuck
+    similarity: float = 0.95  # answers at least this similar count as a repeat
+
+    @classmethod
+    def from_env(cls) -> "PolicyLimits":
+        deadline = float(os.getenv("REPAIR_DEADLINE_SECONDS", "0"))
+        budget = int(os.getenv("REPAIR_TOKEN_BUDGET", "0"))
+        return cls(
+            max_attempts=int(os.getenv("REPAIR_MAX_ATTEMPTS", "8")),
+            deadline_seconds=deadline or None,
+            token_budget=budget or None,
+            repeat_limit=int(os.getenv("REPAIR_REPEAT_LIMIT", "2")),
+            similarity=float(os.getenv("REPAIR_SIMILARITY", "0.95")),
+        )
+
+
+@dataclass
+class Strategy:
+    """How the next attempt asks for a fix."""
+    edit_mode: str = "full"
+    candidates: int = 1
+    fresh_samples: bool = False  # bypass the LLM cache
+
+    def escalate(self, max_candidates: int) -> "Strategy | None":
+        """The next, more expensive way to ask, or None when there is none."""
+        if self.edit_mode == "patch":
+            return replace(self, edit_mode="full")
+        if not self.fresh_samples:
+            return replace(self, fresh_samples=True)
+        if self.candidates < max_candidates:
+            return replace(self, candidates=min(max_candidates, self.candidates * 2))
+        return None
+
+
+@dataclass
+class Decision:
+    action: str  # CONTINUE, ESCALATE or ABORT
+    reason: str = ""
+    strategy: Strategy | None = None  # the strategy to use from now on when escalating
+
+
+_NOISE = [
+    (re.compile(r"0x[0-9a-fA-F]+"), "0x?"),
+    (re.compile(r'File "[^"]*"'), 'File "?"'),
+    (re.compile(r"[\w./-]+\.(py|java):\d+"), r"?.\1:?"),
+    (re.compile(r"\bline \d+"), "line ?"),
+    (re.compile(r"\d+"), "?"),
+]
+
+
+def error_signature(ret: int, out: str, err: str) -> str:
+    """What a failure looks like, independent of where exactly it happened."""
+    lines = [line.strip() for line in (err or "").splitlines() if line.strip()]
+    if lines:
+        # The exception line (Python) or the first error (javac) identifies the failure
+        errors = [line for line in lines if ": error:" in line]
+        text = errors[0] if errors else lines[-1]
+    else:
+        text = f"exit {ret}\n{(out or '').strip()[-500:]}"
+    for pattern, substitute in _NOISE:
+        text = pattern.sub(substitute, text)
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+
+@dataclass
+class Attempt:
+    ret: int
+    out: str
+    err: str
+    answer: str = ""
+    prompt_tokens: int = 0
+    answer_tokens: int = 0
+    signature: str = ""
+
+
+class RepairPolicy:
+    """Attempt counting only."""
+    name = "fixed"
+
+    def __init__(self, limits: PolicyLimits, strategy: Strategy, max_candidates: int = 1,
+                 started: float | None = None):
+        self.limits = limits
+        self.strategy = strategy
+        self.max_candidates = max_candidates
+        self.started = time.time() if started is None else started
+        self.attempts = []
+        self.escalations = []  # reasons, in order
+
+    def observe(self, attempt: Attempt) -> None:
+        attempt.signature = error_signature(attempt.ret, attempt.out, attempt.err)
+        self.attempts.append(attempt)
+
+    @property
+    def tokens_used(self) -> int:
+        return sum(a.prompt_tokens + a.answer_tokens for a in self.attempts)
+
+    def decide(self) -> Decision:
+        """Called before every attempt after the initial run."""
+        if len(self.attempts) > self.limits.max_attempts:
+            return Decision(ABORT, f"used all {self.limits.max_attempts} attempts")
+        return Decision(CONTINUE)
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.name,
+            "tokens_used": self.tokens_used,
+            "elapsed_seconds": round(time.time() - self.started, 3),
+            "escalations": self.escalations,
+            "strategy": {
+                "edit_mode": self.strategy.edit_mode,
+                "candidates": self.strategy.candidates,
+                "fresh_samples": self.strategy.fresh_samples,
+            },
+        }
+
+
+class AdaptivePolicy(RepairPolicy):
+    """Budgets, deadline and stuck detection on top of the attempt limit."""
+    name = "adaptive"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stuck_since = 0  # index of the first attempt considered by stuck detection
+
+    def _repeats(self) -> int:
+        """How many of the latest attempts repeat the one before them."""
+        recent = self.attempts[self._stuck_since:]
+        count = 0
+        for previous, current in zip(reversed(recent[:-1]), reversed(recent)):
+            same_error = previous.signature == current.signature
+            same_answer = False
+            if previous.answer and current.answer:
+                matcher = difflib.SequenceMatcher(None, previous.answer, current.answer)
+                # quick_ratio is an upper bound and saves the full comparison on long answers
+                same_answer = (matcher.quick_ratio() >= self.limits.similarity
+                               and matcher.ratio() >= self.limits.similarity)
+            if not (same_error or same_answer):
+                break
+            count += 1
+        return count
+
+    def _affordable_candidates(self) -> int:
+        """max_candidates, lowered to what the rest of the token budget pays for."""
+        if self.limits.token_budget is None or not self.attempts[1:]:
+            return self.max_candidates
+        last = self.attempts[-1]
+        per_candidate = (last.prompt_tokens + last.answer_tokens) / self.strategy.candidates
+        if per_candidate <= 0:
+            return self.max_candidates
+        left = self.limits.token_budget - self.tokens_used
+        return max(1, min(self.max_candidates, int(left // per_candidate)))
+
+    def decide(self) -> Decision:
+        decision = super().decide()
+        if decision.action == ABORT:
+            return decision
+
+        limits = self.limits
+        if limits.deadline_seconds is not None and time.time() - self.started >= limits.deadline_seconds:
+            return Decision(ABORT, f"deadline of {limits.deadline_seconds:g}s reached")
+
+        if limits.token_budget is not None and self.attempts[1:]:
+            # Don't start an attempt that would likely overrun the budget
+            last = self.attempts[-1]
+            if self.tokens_used + last.prompt_tokens + last.answer_tokens > limits.token_budget:
+                return Decision(ABORT, f"token budget of {limits.token_budget} would be exceeded")
+
+        if self._repeats() >= limits.repeat_limit:
+            reason = f"same failure {limits.repeat_limit + 1} times in a row"
+            strategy = self.strategy.escalate(self._affordable_candidates())
+            if strategy is None:
+                return Decision(ABORT, reason)
+            self.strategy = strategy
+            self.escalations.append(reason)
+            self._stuck_since = len(self.attempts) - 1
+            return Decision(ESCALATE, reason, strategy)
+        return Decision(CONTINUE)
+
+
+POLICIES = {policy.name: policy for policy in (RepairPolicy, AdaptivePolicy)}
+
+
+def make_policy(name: str, limits: PolicyLimits, strategy: Strategy, max_candidates: int = 1,
+                started: float | None = None) -> RepairPolicy:
+    if name not in POLICIES:
+        raise ValueError(f"Unknown repair policy {name!r}; expected one of {sorted(POLICIES)}")
+    return POLICIES[name](limits, strategy, max_candidates, started)
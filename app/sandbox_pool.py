@@ -0,0 +1,366 @@
+"""
+Warm pool of pre-started runner containers.
+
+Instead of paying a full create -> cp -> start -> rm cycle for every
+verification run, each runner image (python-runner, java-runner) keeps a few
+idle containers running `sleep infinity`. An execution borrows one, copies the
+project into /work, runs the command with `docker exec`, then kills whatever
+the program left running, wipes /work and the temp directories and hands the
+container back. A background thread tops the pool back up and recycles
+containers that sat idle too long or were used too many times.
+
+When docker itself fails (the container vanished, the daemon refused the
+exec) the container is recycled and the run retried once on a fresh one;
+if that fails too SandboxError is raised, so the failure is never mistaken
+for (or cached as) the program's result.
+"""
+import logging
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+
+from telemetry import span
+
+log = logging.getLogger(__name__)
+
+# Run between executions: PID 1 is `sleep infinity`, and kill -1 spares it and the shell itself
+RESET_SCRIPT = (
+    "kill -9 -1 2>/dev/null; "
+    "rm -rf /work /tmp/* /tmp/.[!.]* /var/tmp/* /dev/shm/* 2>/dev/null; "
+    "mkdir -p /work"
+)
+
+# Exit code reported for a program stopped by the run timeout (like coreutils `timeout`)
+TIMEOUT_EXIT = 124
+
+# How the docker CLI reports its own failures on stderr
+_DOCKER_ERRORS = ("Error response from daemon", "Error: No such container", "Cannot connect to the Docker daemon")
+
+
+class SandboxError(RuntimeError):
+    """Docker could not run the command; there is no program result."""
+
+
+def is_docker_error(result) -> bool:
+    """True when an exec result comes from docker rather than the program."""
+    ret, _, err = result
+    return ret != 0 and (err or "").lstrip().startswith(_DOCKER_ERRORS)
+
+
+@dataclass
+class PoolSettings:
+    size: int = 0  # warm containers kept per image (0 disables pooling)
+    max_idle: float = 300.0  # seconds an idle container may wait before it is recycled
+    max_uses: int = 25  # executions before a container is thrown away
+    refill_interval: float = 5.0  # seconds between background maintenance passes
+    run_timeout: float = 30.0  # seconds a program may run, as on the cold path
+
+    @classmethod
+    def from_env(cls) -> "PoolSettings":
+        return cls(
+            size=int(os.getenv("SANDBOX_POOL_SIZE", "0")),
+            max_idle=float(os.getenv("SANDBOX_POOL_MAX_IDLE", "300")),
+            max_uses=int(os.getenv("SANDBOX_POOL_MAX_USES", "25")),
+            refill_interval=float(os.getenv("SANDBOX_POOL_REFILL_INTERVAL", "5")),
+            run_timeout=float(os.getenv("SANDBOX_RUN_TIMEOUT", "30")),
+        )
+
+
+class DockerBackend:
+    """Container operations implemented with the docker CLI."""
+
+    def start(self, image: str, name: str) -> None:
+        subprocess.run(
+            ["docker", "run", "-d", "--name", name, image, "sleep", "infinity"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+    def exec(self, name: str, argv: list, workdir: str | None = None, timeout: float | None = None):
+        cmd = ["docker", "exec"]
+        if workdir:
+            cmd += ["-w", workdir]
+        try:
+            proc = subprocess.run(cmd + [name] + list(argv), capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired as e:
+            # Only the docker client is gone; the program keeps running until the container is removed
+            out = e.stdout.decode(errors="replace") if isinstance(e.stdout, bytes) else e.stdout or ""
+            return TIMEOUT_EXIT, out, f"Timed out after {timeout:g}s\n"
+        return proc.returncode, proc.stdout, proc.stderr
+
+    def copy_in(self, name: str, src_dir: str, dest: str) -> None:
+        subprocess.run(
+            ["docker", "cp", src_dir.rstrip("/") + "/.", f"{name}:{dest}"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+
+    def remove(self, name: str) -> None:
+        subprocess.run(["docker", "rm", "-f", name], capture_output=True)
+
+
+class FakeDockerBackend:
+    """
+    In-memory stand-in for DockerBackend so the pool can be exercised without
+    a docker daemon. `handler(image, argv, files)` produces the result of the
+    executed command; `files` maps paths inside the container to their contents
+    and may be written to by the handler. Each container's `processes` lists
+    what its programs left running; the reset between runs clears both.
+    """
+
+    def __init__(self, handler=None):
+        self.handler = handler or (lambda image, argv, files: (0, "", ""))
+        self.containers = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def start(self, image: str, name: str) -> None:
+        with self._lock:
+            self.calls.append(("start", name))
+            self.containers[name] = {"image": image, "files": {}, "processes": []}
+
+    def exec(self, name: str, argv: list, workdir: str | None = None, timeout: float | None = None):
+        with self._lock:
+            self.calls.append(("exec", name, list(argv)))
+            container = self.containers.get(name)
+        if container is None:
+            return 1, "", f"Error response from daemon: No such container: {name}"
+
+        if argv == ["sh", "-c", RESET_SCRIPT]:
+            container["files"].clear()
+            container["processes"].clear()
+            return 0, "", ""
+        if argv[:1] == ["mkdir"]:
+            return 0, "", ""
+        return self.handler(container["image"], list(argv), container["files"])
+
+    def copy_in(self, name: str, src_dir: str, dest: str) -> None:
+        with self._lock:
+            self.calls.append(("copy_in", name, src_dir))
+            container = self.containers[name]
+        for root, _, files in os.walk(src_dir):
+            for f in files:
+                path = os.path.join(root, f)
+                rel = os.path.relpath(path, src_dir)
+                with open(path, "r", errors="ignore") as fp:
+                    container["files"][os.path.join(dest, rel)] = fp.read()
+
+    def remove(self, name: str) -> None:
+        with self._lock:
+            self.calls.append(("remove", name))
+            self.containers.pop(name, None)
+
+
+@dataclass
+class _Warm:
+    name: str
+    uses: int = 0
+    idle_since: float = 0.0
+
+
+class SandboxPool:
+    """Keeps `settings.size` warm containers of one runner image."""
+
+    def __init__(self, image: str, settings: PoolSettings | None = None, backend=None):
+        self.image = image
+        self.settings = settings or PoolSettings.from_env()
+        self.backend = backend or DockerBackend()
+        self._idle = deque()
+        self._in_use = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.hits = 0
+        self.misses = 0
+        self.recycled = 0
+        self.start_failures = 0
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        """Start the background refill thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(
+                target=self._maintain_loop,
+                name=f"sandbox-pool-{self.image}",
+                daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop refilling and remove every idle container."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for warm in idle:
+            self.backend.remove(warm.name)
+
+    # ---------- borrowing ----------
+
+    def acquire(self) -> _Warm:
+        """Hand out a clean container, starting one on the spot if the pool is empty."""
+        with self._lock:
+            warm = self._idle.popleft() if self._idle else None
+            if warm is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._in_use += 1
+
+        if warm is None:
+            try:
+                warm = self._spawn()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+
+        # Ask the refill thread to replace what we just took
+        self._wake.set()
+        return warm
+
+    def release(self, warm: _Warm, healthy: bool = True) -> None:
+        """Reset a borrowed container and return it to the pool, or recycle it."""
+        warm.uses += 1
+        if healthy and warm.uses < self.settings.max_uses and not self._stopped.is_set():
+            ret, _, _ = self.backend.exec(warm.name, ["sh", "-c", RESET_SCRIPT])
+            healthy = ret == 0
+        else:
+            healthy = False
+
+        with self._lock:
+            self._in_use -= 1
+            keep = healthy and len(self._idle) < self.settings.size
+            if keep:
+                warm.idle_since = time.monotonic()
+                self._idle.append(warm)
+            else:
+                self.recycled += 1
+
+        if not keep:
+            self.backend.remove(warm.name)
+            self._wake.set()
+
+    def run(self, src_dir: str, argv: list):
+        """Copy src_dir into a warm container's /work and run argv there."""
+        result = self._run_once(src_dir, argv)
+        if is_docker_error(result):
+            log.warning("Sandbox pool %s: docker failed (%s); retrying on a fresh container",
+                        self.image, result[2].strip()[:200])
+            result = self._run_once(src_dir, argv)
+            if is_docker_error(result):
+                raise SandboxError(f"docker could not run {argv[0]}: {result[2].strip()[:200]}")
+        return result
+
+    def _run_once(self, src_dir: str, argv: list):
+        warm = self.acquire()
+        healthy = False
+        try:
+            self.backend.exec(warm.name, ["mkdir", "-p", "/work"])
+            with span("container.copy", image=self.image, pooled=True):
+                self.backend.copy_in(warm.name, src_dir, "/work")
+            with span("container.exec", image=self.image, pooled=True):
+                result = self.backend.exec(warm.name, argv, workdir="/work", timeout=self.settings.run_timeout)
+            # A timed-out program may still be running; don't hand its container out again
+            healthy = not is_docker_error(result) and result[0] != TIMEOUT_EXIT
+            return result
+        finally:
+            self.release(warm, healthy=healthy)
+
+    # ---------- background maintenance ----------
+
+    def _spawn(self) -> _Warm:
+        name = f"{self.image.replace('-', '_')}_pool_{uuid.uuid4().hex[:8]}"
+        self.backend.start(self.image, name)
+        return _Warm(name=name, idle_since=time.monotonic())
+
+    def maintain(self) -> None:
+        """One maintenance pass: evict stale idle containers, then refill to size."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [w for w in self._idle if now - w.idle_since > self.settings.max_idle]
+            for warm in stale:
+                self._idle.remove(warm)
+            self.recycled += len(stale)
+        for warm in stale:
+            self.backend.remove(warm.name)
+
+        while not self._stopped.is_set():
+            with self._lock:
+                if len(self._idle) >= self.settings.size:
+                    return
+            try:
+                warm = self._spawn()
+            except Exception as e:
+                self.start_failures += 1
+                log.warning("Sandbox pool %s: failed to start warm container: %s", self.image, e)
+                return
+            with self._lock:
+                self._idle.append(warm)
+
+    def _maintain_loop(self) -> None:
+        while not self._stopped.is_set():
+            self.maintain()
+            self._wake.wait(self.settings.refill_interval)
+            self._wake.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "image": self.image,
+                "size": self.settings.size,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "recycled": self.recycled,
+                "start_failures": self.start_failures,
+            }
+
+
+# ================================
+# PER-IMAGE POOL REGISTRY
+# ================================
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(image: str, settings: PoolSettings | None = None, backend=None) -> SandboxPool:
+    """Return the shared pool for a runner image, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(image)
+        if pool is None:
+            pool = SandboxPool(image, settings=settings, backend=backend)
+            pool.start()
+            _pools[image] = pool
+        return pool
+
+
+def pool_stats() -> list:
+    with _pools_lock:
+        pools = list(_pools.values())
+    return [p.stats() for p in pools]
+
+
+def shutdown_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.stop()
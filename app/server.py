@@ -1,16 +1,52 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-import subprocess, uuid, os, shutil, json, tempfile
+from fastapi.middleware.gzip import GZipMiddleware
+import subprocess, uuid, os, shutil, json, time, asyncio, threading, contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import Callable, Optional, List, Dict
 import re
+import difflib
+import logging
+from dataclasses import dataclass, replace
 from pathlib import Path
-import zipfile
-from llm_client import call_llm
+from contextlib import asynccontextmanager
+from llm_client import DEFAULT_OPTIONS, LLM_CACHE, LLMCancelled, call_llm, get_client
+from llm_session import SESSION_REQUESTS, LLMSession, session_turn
+from prompt_context import ProjectContext, build_context, estimate_tokens
+from patching import PatchError, apply_patch
+from repair_policy import ABORT, ESCALATE, POLICIES, Attempt, PolicyLimits, Strategy, error_signature, make_policy
+from quick_fixes import propose_fixes
+from model_cascade import CASCADE_STATS, DEFAULT_TIER, CascadeSettings, ModelCascade, Tier, error_class
+from static_checks import STATIC_CHECK_STATS, CandidateHistory, check_candidate
+from sandbox_pool import PoolSettings, get_pool, pool_stats, shutdown_pools
+from exec_cache import ExecutionCache, execution_key, image_digest, tree_digest
+from workspace import host_path, link_tree, run_mounted
+from job_queue import JobCancelled, JobQueue, QueueFull, current_job
+from java_engine import close_session, get_session, open_session
+from manifest import Manifest, get_manifest, remember_manifest
+from git_mirror import RepoMirrors
+from ingest import SNIFF_BYTES, ingest_tree, looks_binary, read_texts
+from uploads import UploadLimits, UploadRejected, extract_zip, safe_join, save_upload
+from python_worker import WorkerError, get_python_workers, python_worker_stats, reset_python_workers
+from telemetry import REGISTRY, REPAIRS, configure_logging, span, timed
 import git
 
+configure_logging()
+log = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Remove warm runner containers so they don't outlive the API
+    shutdown_pools()
+    reset_python_workers()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware to allow frontend requests
 app.add_middleware(
@@ -21,24 +57,111 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Repair results and file listings of whole projects compress very well
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 WORKDIR = "/repair_data"
 
+# Caps for /upload (UPLOAD_MAX_BYTES, UPLOAD_MAX_FILES, UPLOAD_MAX_UNCOMPRESSED, UPLOAD_MAX_RATIO)
+UPLOAD_LIMITS = UploadLimits.from_env()
+
+# Warm runner containers (see sandbox_pool.py); SANDBOX_POOL_SIZE=0 keeps the cold path
+SANDBOX_POOL_SETTINGS = PoolSettings.from_env()
+
+# "copy" streams the run directory into the runner with docker cp (warm pool or
+# one-off container); "mount" bind-mounts it read-only and the runner copies it
+# into its own writable /work (see workspace.py). HOST_WORKDIR is
+# where the docker daemon sees WORKDIR when the API itself runs in a container.
+SANDBOX_WORKSPACE_MODE = os.getenv("SANDBOX_WORKSPACE_MODE", "copy")
+HOST_WORKDIR = os.getenv("HOST_WORKDIR")
+
+# Bare mirrors and per-commit checkouts of cloned repositories (GIT_MIRROR_DIR)
+REPO_MIRRORS = RepoMirrors.from_env(WORKDIR)
+GITHUB_URL_PREFIXES = ("https://github.com/", "http://github.com/")
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "8"))
+
+# Results of identical executions (same files, entry file and runner image)
+EXEC_CACHE = ExecutionCache.from_env(WORKDIR)
+
+RUNNER_IMAGES = {"python": "python-runner", "java": "java-runner"}
+
+# "session" keeps one java-runner with a warm javac per repair and recompiles
+# only what changed between attempts (see java_engine.py); "oneshot" compiles
+# everything in a fresh container every time
+JAVA_ENGINE = os.getenv("JAVA_ENGINE", "oneshot")
+
+# Wall clock seconds a program may run in a runner container (exit code 124 after that)
+RUN_TIMEOUT = float(os.getenv("SANDBOX_RUN_TIMEOUT", "30"))
+TIMEOUT_EXIT = 124
+
+# "fork" runs Python programs in forked children of a warm interpreter inside
+# one long-lived python-runner (see python_worker.py); "container" uses the
+# workspace mode / pool / one-off container paths below
+PYTHON_ENGINE = os.getenv("PYTHON_ENGINE", "container")
+
+# Upper bound for RepairRequest.candidates, and the sampling spread used for them
+MAX_CANDIDATES = int(os.getenv("REPAIR_MAX_CANDIDATES", "4"))
+CANDIDATE_TEMPERATURES = [0.2, 0.5, 0.8, 1.0]
+# Parallel samples a stuck repair may escalate to (1 = never more than the request asked for)
+ESCALATE_CANDIDATES = int(os.getenv("REPAIR_ESCALATE_CANDIDATES", "1"))
+
+# Token budget for the project files in a multi-file prompt; the rest of
+# num_ctx is left for the instructions, the error and the answer
+PROMPT_CONTEXT_TOKENS = int(os.getenv("PROMPT_CONTEXT_TOKENS", str(DEFAULT_OPTIONS["num_ctx"] // 2)))
+
+# Parse/compile, import and duplicate checks that reject a candidate before it
+# reaches the sandbox (see static_checks.py)
+STATIC_CHECKS = os.getenv("STATIC_CHECKS", "1") == "1"
+
+# Rule-based fixes tried before the first LLM call (see quick_fixes.py), and
+# how many of their candidates may be executed per repair
+QUICK_FIXES = os.getenv("QUICK_FIXES", "1") == "1"
+QUICK_FIX_MAX_RUNS = int(os.getenv("QUICK_FIX_MAX_RUNS", "6"))
+
+# Model/num_ctx tiers per language (LLM_CASCADE, LLM_CASCADE_<LANGUAGE>; see model_cascade.py)
+CASCADE_SETTINGS = CascadeSettings.from_env()
+
+# Continue from Ollama's context tokens between attempts (see llm_session.py)
+LLM_SESSION_CONTEXT = os.getenv("LLM_SESSION_CONTEXT", "0") == "1"
+
+# Attempt limit, deadline and token budget defaults (see repair_policy.py);
+# requests can lower max_attempts and set their own deadline and budget
+REPAIR_POLICY = os.getenv("REPAIR_POLICY", "adaptive")
+POLICY_LIMITS = PolicyLimits.from_env()
+
+# Repair loops run here so they don't block the event loop (REPAIR_WORKERS threads)
+REPAIR_JOBS = JobQueue.from_env()
+
 
 class RepairRequest(BaseModel):
     expected_output: Optional[str] = None
     language: str  # python or java
     entry_file: str | None = None  # chosen by the user in UI if there are multiple files OR auto-detected in repair function if just one file is uploaded
+    llm_cache: bool = True  # False always asks the model for a fresh sample
+    candidates: int = 1  # >1 generates and verifies that many fixes in parallel per attempt
+    response_mode: str = "full"  # "diff" returns only the changed files as unified diffs
+    edit_mode: str = "full"  # "patch" asks the model for a unified diff instead of whole files
+    policy: Optional[str] = None  # "adaptive" or "fixed" (see repair_policy.py); default REPAIR_POLICY
+    max_attempts: Optional[int] = None  # capped by REPAIR_MAX_ATTEMPTS
+    deadline_seconds: Optional[float] = None  # give up this long after the job was submitted
+    token_budget: Optional[int] = None  # prompt + answer tokens the repair may spend
+    quick_fixes: bool = True  # try rule-based fixes before asking the LLM
+    cascade: Optional[List[str]] = None  # model tiers, e.g. ["qwen2.5-coder:1.5b@2048", "codellama:7b-instruct@4096"]
 
 
 class GitHubCloneRequest(BaseModel):
     url: str
     token: Optional[str] = None
+    language: Optional[str] = None  # only check out this language's source files
+    page: int = 1
+    page_size: Optional[int] = None  # None returns every file at once
+    include_content: bool = True  # False lists files; contents come from /github-clone/{repo_id}/files
 
 
 class GitHubFile(BaseModel):
     name: str
     path: str
-    content: str
+    content: Optional[str] = None
     size: int
 
 
@@ -47,11 +170,15 @@ class GitHubCloneResponse(BaseModel):
     files: List[GitHubFile]
     total_files: int
     detected_language: Optional[str] = None
+    repo_id: Optional[str] = None  # handle for fetching file contents later
+    commit: Optional[str] = None
+    page: int = 1
+    total_pages: int = 1
 
 
 def run_python(run_id, filename):
     # repair_data is mounted at /repair_data inside the container
-    host_base = f"/repair_data/{run_id}"
+    host_base = os.path.join(WORKDIR, run_id)
     host_src = os.path.join(host_base, filename)
 
     if not os.path.exists(host_base):
@@ -60,15 +187,32 @@ def run_python(run_id, filename):
     if not os.path.exists(host_src):
         raise FileNotFoundError(f"Source file not found on host: {host_src}")
 
+    # Fastest path: fork a child of the warm interpreter in the worker container
+    if PYTHON_ENGINE == "fork":
+        try:
+            return get_python_workers().run(host_base, filename)
+        except WorkerError as e:
+            log.warning("Python fork worker failed (%s); falling back to a container run", e)
+
+    # No docker cp: the runner copies the run directory from a read-only mount
+    if SANDBOX_WORKSPACE_MODE == "mount":
+        return run_mounted("python-runner", host_path(host_base, WORKDIR, HOST_WORKDIR), ["python", filename])
+
+    # Fast path: borrow an already running container from the warm pool
+    if SANDBOX_POOL_SETTINGS.size > 0:
+        pool = get_pool("python-runner", SANDBOX_POOL_SETTINGS)
+        return pool.run(host_base, ["python", filename])
+
     runner_name = f"python_runner_{uuid.uuid4().hex[:8]}"
 
-    subprocess.run(
-        ["docker", "create", "--name", runner_name, "python-runner", "python", filename],
-        capture_output=True,
-        text=True,
-        check=True
-    )
-    print("Created docker container:", runner_name)
+    with span("container.create", image="python-runner"):
+        subprocess.run(
+            ["docker", "create", "--name", runner_name, "python-runner", "python", filename],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    log.debug("Created docker container: %s", runner_name)
 
     # create folder inside container
     dirname = os.path.dirname(filename)
@@ -77,26 +221,38 @@ def run_python(run_id, filename):
         capture_output=True,
         text=True
     )
-    print("Created directory inside container:", dirname)
 
     # copy the entire run_id folder
-    subprocess.run(
-        ["docker", "cp", host_base + "/.", f"{runner_name}:/work"],
-        capture_output=True,
-        text=True,
-        check=True
-    )
-    print("Copied files into container")
+    with span("container.copy", image="python-runner"):
+        subprocess.run(
+            ["docker", "cp", host_base + "/.", f"{runner_name}:/work"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
 
-    proc = subprocess.run(
-        ["docker", "start", "-a", runner_name],
-        capture_output=True,
-        text=True
-    )
-    print("Container run complete. Cleaning up.")
+    with span("container.start", image="python-runner"):
+        result = start_attached(runner_name)
+
+    with span("container.rm", image="python-runner"):
+        subprocess.run(["docker", "rm", "-f", runner_name], capture_output=True)
 
-    subprocess.run(["docker", "rm", "-f", runner_name], capture_output=True)
+    return result
 
+
+def start_attached(runner_name: str):
+    """`docker start -a` a created runner, stopping it after RUN_TIMEOUT -> (returncode, stdout, stderr)."""
+    try:
+        proc = subprocess.run(
+            ["docker", "start", "-a", runner_name],
+            capture_output=True,
+            text=True,
+            timeout=RUN_TIMEOUT
+        )
+    except subprocess.TimeoutExpired as e:
+        subprocess.run(["docker", "kill", runner_name], capture_output=True)
+        out = e.stdout.decode(errors="replace") if isinstance(e.stdout, bytes) else e.stdout or ""
+        return TIMEOUT_EXIT, out, f"Timed out after {RUN_TIMEOUT:g}s\n"
     return proc.returncode, proc.stdout, proc.stderr
 
 
@@ -106,7 +262,7 @@ def run_java(run_id, main_file):
     main_file: the filename that contains the main(...) entrypoint, e.g. "Main.java"
     """
 
-    host_base = f"/repair_data/{run_id}"
+    host_base = os.path.join(WORKDIR, run_id)
     host_main_path = os.path.join(host_base, main_file)
 
     if not os.path.exists(host_base):
@@ -115,23 +271,45 @@ def run_java(run_id, main_file):
     if not os.path.exists(host_main_path):
         raise FileNotFoundError(f"Main file not found: {host_main_path}")
 
+    # Incremental path: the repair's persistent session (not used for candidate workspaces)
+    session = get_session(run_id)
+    if session is not None:
+        try:
+            return session.run(main_file)
+        except RuntimeError as e:
+            log.warning("Java session failed (%s); falling back to a one-off runner", e)
+            close_session(run_id)
+
+    main_class = main_file.replace('.java', '')
+    compile_and_run = f"javac {main_class}.java && java {main_class}"
+
+    # No docker cp: the runner copies the run directory from a read-only mount
+    if SANDBOX_WORKSPACE_MODE == "mount":
+        return run_mounted("java-runner", host_path(host_base, WORKDIR, HOST_WORKDIR), ["bash", "-lc", compile_and_run])
+
+    # Fast path: borrow an already running container from the warm pool
+    if SANDBOX_POOL_SETTINGS.size > 0:
+        pool = get_pool("java-runner", SANDBOX_POOL_SETTINGS)
+        return pool.run(host_base, ["bash", "-lc", compile_and_run])
+
     runner_name = f"java_runner_{uuid.uuid4().hex[:8]}"
 
     # Java runner image must:
     # - copy /work
     # - run: javac *.java && java MainClass
-    subprocess.run(
-        [
-            "docker", "create", "--name", runner_name,
-            "java-runner",  # <--- This is your custom Java runner image
-            "bash", "-lc",
-            f"javac {main_file.replace('.java','')}.java && java {main_file.replace('.java','')}"
-        ],
-        capture_output=True,
-        text=True,
-        check=True
-    )
-    print("Created docker container:", runner_name)
+    with span("container.create", image="java-runner"):
+        subprocess.run(
+            [
+                "docker", "create", "--name", runner_name,
+                "java-runner",  # <--- This is your custom Java runner image
+                "bash", "-lc",
+                compile_and_run
+            ],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+    log.debug("Created docker container: %s", runner_name)
 
     # Ensure directory exists inside container
     dirname = os.path.dirname(main_file)
@@ -140,29 +318,83 @@ def run_java(run_id, main_file):
         capture_output=True,
         text=True
     )
-    print("Created directory inside container:", dirname)
 
     # Copy entire directory for multi-file support
-    subprocess.run(
-        ["docker", "cp", host_base + "/.", f"{runner_name}:/work"],
-        capture_output=True,
-        text=True,
-        check=True
-    )
-    print("Copied Java project into container")
+    with span("container.copy", image="java-runner"):
+        subprocess.run(
+            ["docker", "cp", host_base + "/.", f"{runner_name}:/work"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
 
     # Run container
-    proc = subprocess.run(
-        ["docker", "start", "-a", runner_name],
-        capture_output=True,
-        text=True
-    )
-    print("Container run complete. Cleaning up.")
+    with span("container.start", image="java-runner"):
+        result = start_attached(runner_name)
 
     # Cleanup
-    subprocess.run(["docker", "rm", "-f", runner_name], capture_output=True)
+    with span("container.rm", image="java-runner"):
+        subprocess.run(["docker", "rm", "-f", runner_name], capture_output=True)
 
-    return proc.returncode, proc.stdout, proc.stderr
+    return result
+
+
+@app.get("/sandbox/stats")
+def sandbox_stats():
+    """Hit/miss and occupancy counters for the warm runner pools and the execution cache."""
+    return {
+        "enabled": SANDBOX_POOL_SETTINGS.size > 0,
+        "pools": pool_stats(),
+        "python_workers": python_worker_stats(),
+        "exec_cache": EXEC_CACHE.stats(),
+        "static_checks": STATIC_CHECK_STATS.stats(),
+    }
+
+
+@app.get("/llm/stats")
+def llm_stats():
+    """Hit rate of the LLM response cache, and load and health of each LLM backend."""
+    sessions = {reuse: int(SESSION_REQUESTS.value(reuse=reuse)) for reuse in ("context", "prefix", "new")}
+    return {**LLM_CACHE.stats(), "gateway": get_client().stats(), "cascade": CASCADE_STATS.stats(),
+            "sessions": sessions}
+
+
+def _register_metrics():
+    """Expose counters other modules already keep alongside the telemetry ones."""
+    REGISTRY.callback("cici_repair_queue_depth", "Repair jobs waiting for a worker",
+                      lambda: REPAIR_JOBS.stats()["queue_depth"])
+    REGISTRY.callback("cici_repair_jobs_running", "Repair jobs being executed",
+                      lambda: REPAIR_JOBS.stats()["running"])
+    REGISTRY.callback("cici_llm_cache_lookups_total", "LLM response cache lookups",
+                      lambda: {(k,): v for k, v in LLM_CACHE.stats().items() if k in ("hits", "disk_hits", "misses")},
+                      labels=("result",), type="counter")
+    REGISTRY.callback("cici_exec_cache_lookups_total", "Execution cache lookups",
+                      lambda: {(k,): v for k, v in EXEC_CACHE.stats().items() if k in ("hits", "disk_hits", "misses")},
+                      labels=("result",), type="counter")
+    REGISTRY.callback("cici_llm_backend_in_flight", "Requests being served by each LLM backend",
+                      lambda: {(b["url"],): b["in_flight"] for b in get_client().stats()["backends"]},
+                      labels=("backend",))
+    REGISTRY.callback("cici_llm_backend_up", "1 while a backend's circuit is not open",
+                      lambda: {(b["url"],): int(b["state"] != "open") for b in get_client().stats()["backends"]},
+                      labels=("backend",))
+    REGISTRY.callback("cici_cascade_attempts_total", "LLM attempts per language, error class and model tier",
+                      lambda: {(s["language"], s["error_class"], s["tier"]): s["attempts"] for s in CASCADE_STATS.stats()},
+                      labels=("language", "error_class", "tier"), type="counter")
+    REGISTRY.callback("cici_cascade_solved_total", "Repairs solved per language, error class and model tier",
+                      lambda: {(s["language"], s["error_class"], s["tier"]): s["solved"] for s in CASCADE_STATS.stats()},
+                      labels=("language", "error_class", "tier"), type="counter")
+    REGISTRY.callback("cici_static_check_rejections_total", "Candidates rejected before running",
+                      lambda: {(k,): v for k, v in STATIC_CHECK_STATS.stats()["rejected"].items()},
+                      labels=("reason",), type="counter")
+
+
+_register_metrics()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint: stage timings, LLM tokens, repairs, queues and caches."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 def extract_code_only(text: str) -> str:
@@ -247,218 +479,406 @@ async def upload(file: UploadFile = File(...), language: str = "python"):
 
     filename = file.filename.lower()
 
-    # CASE 1: ZIP FILE UPLOAD
-    if filename.endswith(".zip"):
-        zip_path = os.path.join(run_dir, "upload.zip")
-        with open(zip_path, "wb") as f:
-            f.write(await file.read())
+    try:
+        # CASE 1: ZIP FILE UPLOAD
+        if filename.endswith(".zip"):
+            zip_path = os.path.join(run_dir, "upload.zip")
+            # Disk writes run in the threadpool so a large upload doesn't stall the event loop
+            with span("upload.save", run_id=run_id):
+                await run_in_threadpool(save_upload, file.file, zip_path, UPLOAD_LIMITS.max_upload_bytes)
+
+            # Extract entry by entry; the listing comes straight from extraction
+            try:
+                with span("upload.extract", run_id=run_id):
+                    extracted = await run_in_threadpool(extract_zip, zip_path, run_dir, UPLOAD_LIMITS)
+            finally:
+                os.remove(zip_path)
 
-        # Extract zip
-        try:
-            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-                zip_ref.extractall(run_dir)
-        except zipfile.BadZipFile:
-            raise HTTPException(400, "Uploaded file is not a valid zip archive")
+            remember_manifest(Manifest.build(run_dir, [rel for rel, _ in extracted])).save()
 
-        # List extracted files
-        extracted_files = []
-        for root, dirs, files in os.walk(run_dir):
+            # Hidden files are extracted but not offered as project files
+            extracted_files = [rel for rel, _ in extracted if not os.path.basename(rel).startswith(".")]
 
-            # Ignore junk directories
-            dirs[:] = [d for d in dirs if not d.startswith("__MACOSX")]
+            return {
+                "run_id": run_id,
+                "files": extracted_files,
+                "directory": True,
+                "message": "Zip directory uploaded and extracted successfully"
+            }
 
-            for f in files:
-                # Skip zip itself
-                if f == "upload.zip":
-                    continue
+        # CASE 2: SINGLE FILE UPLOAD
+        else:
+            dest_path = safe_join(run_dir, file.filename)
+            with span("upload.save", run_id=run_id):
+                await run_in_threadpool(save_upload, file.file, dest_path, UPLOAD_LIMITS.max_upload_bytes)
+            remember_manifest(Manifest.build(run_dir, [file.filename])).save()
+
+            return {
+                "run_id": run_id,
+                "files": [file.filename],
+                "directory": False,
+                "message": "Single file uploaded successfully"
+            }
+    except UploadRejected as e:
+        shutil.rmtree(run_dir, ignore_errors=True)
+        raise HTTPException(e.status_code, e.detail)
+
+
+# Map extensions to language names
+EXTENSION_LANGUAGES = {
+    '.py': 'python',
+    '.java': 'java',
+    '.js': 'javascript',
+    '.ts': 'typescript',
+    '.cpp': 'cpp',
+    '.c': 'c',
+    '.go': 'go',
+    '.rb': 'ruby'
+}
 
-                # Skip macOS junk files
-                if f.startswith(".") or f.endswith(".DS_Store") or "__MACOSX" in root:
-                    continue
 
-                relpath = os.path.relpath(os.path.join(root, f), run_dir)
-                extracted_files.append(relpath)
+def detect_language_from_files(files: List[Path]) -> Optional[str]:
+    """Detect the primary programming language based on file extensions."""
+    extension_counts = {}
 
-        # Filter so only paths that start with the directory name are returned
-        # Example: keep only "syntax_fix_dir/..."
-        top_level_dirs = [d for d in os.listdir(run_dir) 
-                          if os.path.isdir(os.path.join(run_dir, d)) and not d.startswith("__MACOSX")]
+    for file_path in files:
+        ext = file_path.suffix.lower()
+        extension_counts[ext] = extension_counts.get(ext, 0) + 1
 
+    return detect_language_from_counts(extension_counts)
 
-        return {
-            "run_id": run_id,
-            "files": extracted_files,
-            "directory": True,
-            "message": "Zip directory uploaded and extracted successfully"
-        }
 
-    # CASE 2: SINGLE FILE UPLOAD
-    else:
-        dest_path = os.path.join(run_dir, file.filename)
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+def detect_language_from_counts(extension_counts: dict) -> Optional[str]:
+    """Most common known language among {extension: file count}."""
+    known = {ext: n for ext, n in extension_counts.items() if ext in EXTENSION_LANGUAGES}
+    if not known:
+        return None
 
-        with open(dest_path, "wb") as f:
-            f.write(await file.read())
-        
+    # Get most common extension
+    most_common_ext = max(known, key=known.get)
+    return EXTENSION_LANGUAGES.get(most_common_ext)
 
-        return {
-            "run_id": run_id,
-            "files": [file.filename],
-            "directory": False,
-            "message": "Single file uploaded successfully"
-        }
 
+# Ignore common directories that shouldn't be uploaded
+GITHUB_IGNORE_DIRS = {'.git', '__pycache__', 'node_modules', '.pytest_cache',
+                      'venv', 'env', '.venv', 'build', 'dist', '.idea', '.vscode'}
 
-def detect_language_from_files(files: List[Path]) -> Optional[str]:
-    """Detect the primary programming language based on file extensions."""
-    extension_counts = {}
+# Ignore common file patterns
+GITHUB_IGNORE_PATTERNS = {'.pyc', '.pyo', '.class', '.o', '.so', '.dylib',
+                          '.dll', '.exe', '.DS_Store', '.gitignore'}
 
-    for file_path in files:
-        ext = file_path.suffix.lower()
-        if ext in ['.py', '.java', '.js', '.ts', '.cpp', '.c', '.go', '.rb']:
-            extension_counts[ext] = extension_counts.get(ext, 0) + 1
 
-    if not extension_counts:
+def read_github_file(checkout: str, rel_path: str) -> Optional[GitHubFile]:
+    """GitHubFile with content, or None for binary, unreadable and large files."""
+    file_path = Path(checkout) / rel_path
+    try:
+        # Skip files larger than 1MB
+        file_size = file_path.stat().st_size
+        if file_size > 1_000_000:
+            return None
+        with open(file_path, "rb") as f:
+            prefix = f.read(SNIFF_BYTES)
+            if looks_binary(prefix):
+                return None
+            content = (prefix + f.read()).decode("utf-8")
+    except (UnicodeDecodeError, OSError):
+        # Skip binary files or files we can't read
         return None
 
-    # Map extensions to language names
-    ext_to_lang = {
-        '.py': 'python',
-        '.java': 'java',
-        '.js': 'javascript',
-        '.ts': 'typescript',
-        '.cpp': 'cpp',
-        '.c': 'c',
-        '.go': 'go',
-        '.rb': 'ruby'
-    }
-
-    # Get most common extension
-    most_common_ext = max(extension_counts, key=extension_counts.get)
-    return ext_to_lang.get(most_common_ext)
+    return GitHubFile(name=file_path.name, path=rel_path, content=content, size=file_size)
 
 
 @app.post("/github-clone", response_model=GitHubCloneResponse)
-async def github_clone(request: GitHubCloneRequest):
-    """Clone a GitHub repository and return all files with their content."""
+def github_clone(request: GitHubCloneRequest):
+    """
+    Return the files of a GitHub repository. The repository is served from a
+    cached shallow mirror (fetched incrementally, at most every
+    GIT_MIRROR_REFRESH seconds), optionally restricted to one language's
+    files, and can be paged and listed without contents.
+    """
 
     # Validate GitHub URL
-    if not request.url.startswith(("https://github.com/", "http://github.com/")):
+    if not request.url.startswith(GITHUB_URL_PREFIXES):
         raise HTTPException(400, "Invalid GitHub URL. Must start with https://github.com/")
 
     # Extract repo name from URL
     repo_name = request.url.rstrip('/').split('/')[-1].replace('.git', '')
 
-    # Create temporary directory for cloning
-    temp_dir = tempfile.mkdtemp(prefix=f"github_clone_{repo_name}_")
-
     try:
-        # Clone the repository
-        print(f"Cloning repository: {request.url}")
-
         # Build clone URL with token if provided
         clone_url = request.url
         if request.token:
             # Insert token into URL: https://token@github.com/user/repo.git
             clone_url = request.url.replace("https://", f"https://{request.token}@")
 
-        git.Repo.clone_from(clone_url, temp_dir, depth=1)
-        print(f"Repository cloned to: {temp_dir}")
-
-        # Walk through the repository and collect files
-        files = []
-        all_file_paths = []
-
-        # Ignore common directories that shouldn't be uploaded
-        ignore_dirs = {'.git', '__pycache__', 'node_modules', '.pytest_cache',
-                      'venv', 'env', '.venv', 'build', 'dist', '.idea', '.vscode'}
-
-        # Ignore common file patterns
-        ignore_patterns = {'.pyc', '.pyo', '.class', '.o', '.so', '.dylib',
-                         '.dll', '.exe', '.DS_Store', '.gitignore'}
-
-        for root, dirs, filenames in os.walk(temp_dir):
-            # Remove ignored directories from the walk
-            dirs[:] = [d for d in dirs if d not in ignore_dirs]
-
-            for filename in filenames:
-                file_path = Path(root) / filename
-
-                # Skip ignored file patterns
-                if file_path.suffix in ignore_patterns or file_path.name in ignore_patterns:
-                    continue
+        log.info("Syncing repository mirror: %s", request.url)
+        with span("github.sync"):
+            mirror, commit = REPO_MIRRORS.sync(request.url, clone_url)
+
+        patterns = None
+        if request.language:
+            patterns = [f"*{ext}" for ext, lang in EXTENSION_LANGUAGES.items() if lang == request.language]
+            patterns.append(".gitignore")
+        with span("github.checkout"):
+            repo_id = os.path.basename(REPO_MIRRORS.checkout(mirror, commit, patterns))
+
+        # Hold the checkout so it can't be evicted while it is read
+        with REPO_MIRRORS.reading(repo_id) as checkout:
+            if checkout is None:
+                raise RuntimeError("checkout was evicted before it could be read")
+            # One parallel pass: ignore rules, binary sniffing and extension counts;
+            # contents are read now only if the whole listing is returned with them
+            read_all = request.include_content and not request.page_size
+            with span("files.collect"):
+                ingested = ingest_tree(
+                    checkout,
+                    ignore_dirs=GITHUB_IGNORE_DIRS,
+                    ignore_patterns=GITHUB_IGNORE_PATTERNS,
+                    read_content=read_all,
+                    workers=INGEST_WORKERS,
+                )
+            for rel_path, reason in ingested.skipped.items():
+                log.debug("Skipping %s file: %s", reason, rel_path)
 
-                # Get relative path from repo root
-                rel_path = file_path.relative_to(temp_dir)
-                all_file_paths.append(rel_path)
+            if patterns:
+                # The checkout only holds one language; detect from the whole tree instead
+                detected_language = detect_language_from_files([Path(p) for p in REPO_MIRRORS.list_paths(mirror, commit)])
+            else:
+                detected_language = detect_language_from_counts(ingested.extension_counts)
 
-                # Read file content (skip binary files and large files)
-                try:
-                    # Skip files larger than 1MB
-                    file_size = file_path.stat().st_size
-                    if file_size > 1_000_000:
-                        print(f"Skipping large file: {rel_path}")
-                        continue
-
-                    # Try to read as text
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-
-                    files.append(GitHubFile(
-                        name=filename,
-                        path=str(rel_path).replace('\\', '/'),  # Normalize path separators
-                        content=content,
-                        size=file_size
-                    ))
-
-                except (UnicodeDecodeError, PermissionError):
-                    # Skip binary files or files we can't read
-                    print(f"Skipping binary/unreadable file: {rel_path}")
-                    continue
+            page_size = request.page_size or max(len(ingested.files), 1)
+            total_pages = max(1, -(-len(ingested.files) // page_size))
+            page = ingested.files[(request.page - 1) * page_size:request.page * page_size]
 
-        # Detect primary language
-        detected_language = detect_language_from_files(all_file_paths)
+            if request.include_content and not read_all:
+                contents = read_texts(checkout, [f.path for f in page], workers=INGEST_WORKERS)
+            else:
+                contents = {f.path: f.content for f in page}
+
+        files = [
+            GitHubFile(
+                name=os.path.basename(f.path),
+                path=f.path,
+                content=contents.get(f.path) if request.include_content else None,
+                size=f.size,
+            )
+            for f in page
+        ]
 
-        print(f"Collected {len(files)} files from repository")
+        log.info("Collected %d files from repository", len(files))
 
         return GitHubCloneResponse(
             repo_name=repo_name,
             files=files,
-            total_files=len(files),
-            detected_language=detected_language
+            total_files=len(ingested.files),
+            detected_language=detected_language,
+            repo_id=repo_id,
+            commit=commit,
+            page=request.page,
+            total_pages=total_pages,
         )
 
     except git.GitCommandError as e:
         raise HTTPException(400, f"Failed to clone repository: {str(e)}")
     except Exception as e:
         raise HTTPException(500, f"Error processing repository: {str(e)}")
-    finally:
-        # Clean up temporary directory
-        try:
-            shutil.rmtree(temp_dir)
-            print(f"Cleaned up temporary directory: {temp_dir}")
-        except Exception as e:
-            print(f"Warning: Failed to clean up temp directory {temp_dir}: {e}")
 
 
-@app.post("/repair/{run_id}")
+@app.get("/github-clone/{repo_id}/files", response_model=GitHubFile)
+def github_file(repo_id: str, path: str):
+    """Content of one file of a clone listed earlier with include_content=false."""
+    if os.path.isabs(path) or ".." in Path(path).parts:
+        raise HTTPException(400, "Invalid path")
+    with REPO_MIRRORS.reading(repo_id) as checkout:
+        if checkout is None:
+            raise HTTPException(404, "Unknown or expired repo_id; clone the repository again")
+        github_file = read_github_file(checkout, path)
+    if github_file is None:
+        raise HTTPException(404, f"No text file '{path}' in this repository")
+    return github_file
+
+
+@app.post("/repair/{run_id}", status_code=202)
 async def repair(run_id: str, req: RepairRequest):
-    print("ENTERED /repair endpoint")
+    """
+    Validate the request and queue the repair loop on the worker pool.
+    Poll GET /jobs/{job_id} for the result.
+    """
+    # Entry file selection reads the run directory; keep it off the event loop
+    job = await run_in_threadpool(start_repair_job, run_id, req)
+    return {"job_id": job.id, "run_id": run_id, "status": job.status}
 
-    single_file = False
+
+def start_repair_job(run_id: str, req: RepairRequest):
+    if (req.policy or REPAIR_POLICY) not in POLICIES:
+        raise HTTPException(400, f"Unknown policy '{req.policy}'; expected one of {sorted(POLICIES)}")
+    try:
+        CASCADE_SETTINGS.check(req.cascade)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    # Entry file problems are reported right away instead of through the job
+    project_files, entry_file, single_file = select_entry_file(run_id, req)
+
+    try:
+        job = REPAIR_JOBS.submit(run_repair, run_id, req, project_files, entry_file, single_file)
+    except QueueFull as e:
+        raise HTTPException(503, str(e))
+
+    log.info("Queued repair job %s for run %s", job.id, run_id)
+    return job
+
+
+@app.get("/runs/{run_id}/files")
+def run_files(run_id: str, path: str | None = None, version: str = "fixed"):
+    """
+    Without path: hashes and sizes of every file in the run. With path: the
+    full content of that file, either as it is now ("fixed") or as uploaded
+    ("original").
+    """
     run_dir = os.path.join(WORKDIR, run_id)
+    if os.path.dirname(os.path.normpath(run_dir)) != os.path.normpath(WORKDIR) or not os.path.isdir(run_dir):
+        raise HTTPException(404, "Run not found")
+    manifest = get_manifest(run_dir)
+
+    if path is None:
+        changed = set(manifest.changed())
+        return {
+            rel: {"size": e.size, "sha256": e.sha256, "is_text": e.is_text, "changed": rel in changed}
+            for rel, e in manifest.entries.items()
+        }
+
+    if version not in ("fixed", "original"):
+        raise HTTPException(400, "version must be 'fixed' or 'original'")
+    content = manifest.text(path) if version == "fixed" else manifest.original_text(path)
+    if content is None:
+        raise HTTPException(404, f"No text file '{path}' in this run")
+    entry = manifest.entries.get(path) if version == "fixed" else manifest.originals.get(path, manifest.entries.get(path))
+    return {"path": path, "version": version, "sha256": entry.sha256 if entry else None, "content": content}
+
+
+@app.get("/jobs/stats")
+def job_stats():
+    """Queue depth, wait time and run time of the repair worker pool."""
+    return REPAIR_JOBS.stats()
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = REPAIR_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return job.to_dict()
+
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Stop a queued or running repair before its next LLM call or sandbox run."""
+    job = REPAIR_JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown job: {job_id}")
+    return job.to_dict()
 
-    # Collect all files in the run directory (recursive)
-    project_files = []
-    for root, dirs, files in os.walk(run_dir):
-        for f in files:
-            # ignore uploaded zip
-            if f == "upload.zip":
+
+# issue id -> job id of the repair started over that issue's WebSocket
+ISSUE_JOBS = {}
+
+
+def forget_finished_issue_jobs() -> None:
+    """Drop issues whose repair is over (or no longer known to the queue)."""
+    for issue_id, job_id in list(ISSUE_JOBS.items()):
+        job = REPAIR_JOBS.get(job_id)
+        if job is None or job.done:
+            ISSUE_JOBS.pop(issue_id, None)
+
+
+def final_stream_message(job) -> dict:
+    if job.status == "succeeded":
+        return {"type": "repair_complete", "data": {"jobId": job.id, "result": job.result}}
+    if job.status == "cancelled":
+        return {"type": "error", "data": {"message": "Repair cancelled", "code": "cancelled"}}
+    return {"type": "error", "data": {"message": job.error, "code": str(job.error_status or "failed")}}
+
+
+@app.websocket("/ws/issues/{issue_id}/stream")
+async def stream_issue(websocket: WebSocket, issue_id: str):
+    """
+    Live progress of an issue's repair.
+
+    Client -> server:
+      {"type": "start", "run_id": "...", "language": "python", ...RepairRequest fields}
+      {"type": "cancel"}
+    Server -> client: iteration_start, iteration_update, output and
+    iteration_complete events as they happen, then repair_complete (or error).
+    Reconnecting to an issue with a repair in flight replays its events.
+    """
+    await websocket.accept()
+    forget_finished_issue_jobs()
+    job = REPAIR_JOBS.get(ISSUE_JOBS.get(issue_id, ""))
+
+    async def read_client():
+        nonlocal job
+        while True:
+            msg = await websocket.receive_json()
+
+            if msg.get("type") == "start":
+                if job is not None and not job.done:
+                    await websocket.send_json({"type": "error", "data": {"message": "Repair already running", "code": "409"}})
+                    continue
+                try:
+                    req = RepairRequest.model_validate(msg)
+                    job = await run_in_threadpool(start_repair_job, msg.get("run_id", ""), req)
+                except HTTPException as e:
+                    await websocket.send_json({"type": "error", "data": {"message": e.detail, "code": str(e.status_code)}})
+                    continue
+                except ValueError as e:
+                    await websocket.send_json({"type": "error", "data": {"message": str(e), "code": "422"}})
+                    continue
+                ISSUE_JOBS[issue_id] = job.id
+
+            elif msg.get("type") == "cancel" and job is not None:
+                REPAIR_JOBS.cancel(job.id)
+
+    reader = asyncio.create_task(read_client())
+    sent = 0
+    try:
+        # Forward job events until the repair finishes or the client goes away
+        while not reader.done():
+            if job is None:
+                await asyncio.sleep(0.05)
                 continue
-            rel = os.path.relpath(os.path.join(root, f), run_dir)
-            project_files.append(rel)
 
-    print(f"Project files collected in run dir: {project_files}")
+            finished = job.done
+            for event in job.events[sent:]:
+                await websocket.send_json({"type": event["type"], "data": event["data"]})
+                sent += 1
+
+            if finished and sent == len(job.events):
+                await websocket.send_json(final_stream_message(job))
+                await websocket.close()
+                break
+
+            await asyncio.sleep(0.05)
+    except WebSocketDisconnect:
+        # The repair keeps running; the client can reconnect or cancel over HTTP
+        pass
+    finally:
+        reader.cancel()
+        # However the stream ended, a finished repair no longer belongs to the issue
+        forget_finished_issue_jobs()
+
+
+def select_entry_file(run_id: str, req: RepairRequest):
+    """Return (project_files, entry_file, single_file) for a run directory."""
+    single_file = False
+    run_dir = os.path.join(WORKDIR, run_id)
+    if not os.path.isdir(run_dir):
+        raise HTTPException(404, "No files found in uploaded project")
+
+    with span("files.collect", run_id=run_id):
+        project_files = get_manifest(run_dir).paths()
+
+    log.debug("Project files collected in run dir: %s", project_files)
 
     if not project_files:
         raise HTTPException(404, "No files found in uploaded project")
@@ -485,105 +905,329 @@ async def repair(run_id: str, req: RepairRequest):
             )
         entry_file = req.entry_file
 
-    max_attempts = 8
+    return project_files, entry_file, single_file
 
-    # Save original code before any modifications
-    original_code = {}
 
-    for root, _, files in os.walk(run_dir):
-        # Skip entire __MACOSX directories
-        if "__MACOSX" in root:
-            continue
+@timed("sandbox.run")
+def run_program(language: str, run_id: str, entry_file: str):
+    """
+    Run the project with the runner for its language -> (returncode, stdout, stderr).
+    Served from EXEC_CACHE when this exact file tree was already executed.
+    """
+    key = None
+    if EXEC_CACHE.enabled:
+        digest = image_digest(RUNNER_IMAGES.get(language, "java-runner"))
+        # Without the image digest we can't tell whether the runner changed
+        if digest:
+            files_digest = tree_digest(os.path.join(WORKDIR, run_id))
+            key = execution_key(language, entry_file, files_digest, digest)
+            cached = EXEC_CACHE.get(key)
+            if cached is not None:
+                log.debug("Execution cache hit for %s", entry_file)
+                return cached
+
+    if language == "python":
+        result = run_python(run_id, entry_file)
+    else:
+        result = run_java(run_id, entry_file)
+
+    # 125 means docker itself failed, not the program; a timeout may not happen again
+    if key is not None and result[0] not in (125, TIMEOUT_EXIT):
+        EXEC_CACHE.put(key, result)
+    return result
+
+
+def report(type: str, **data):
+    """Publish a progress event to the job running this repair (no-op outside a job)."""
+    job = current_job()
+    if job is not None:
+        job.emit(type, data)
+
+
+def check_cancelled():
+    """Abort the repair if its job was cancelled by the client."""
+    job = current_job()
+    if job is not None:
+        job.check_cancelled()
+
+
+def report_run(run_id: str, attempt: int, ret: int, out: str, err: str, run_seconds: float,
+               llm_seconds: float | None = None, candidate: int | None = None, rejected: bool = False):
+    """Stream a verification run's output, exit code and timing."""
+    iteration_id = f"{run_id}-{attempt}"
+    extra = {} if candidate is None else {"candidate": candidate}
+    if rejected:
+        # Not executed: the output is the static check's
+        extra["rejected"] = True
+    if out:
+        report("output", iterationId=iteration_id, output=out, stream="stdout", **extra)
+    if err:
+        report("output", iterationId=iteration_id, output=err, stream="stderr", **extra)
+    report(
+        "iteration_complete",
+        iterationId=iteration_id,
+        attempt=attempt,
+        exit_code=ret,
+        run_seconds=run_seconds,
+        llm_seconds=llm_seconds,
+        **extra
+    )
 
-        for name in files:
-            # Skip the uploaded zip file itself
-            if name.lower().endswith(".zip"):
-                continue
 
-            # Skip macOS junk files
-            if name.startswith("._") or name == ".DS_Store":
-                continue
+def run_repair(run_id: str, req: RepairRequest, project_files: list, entry_file: str, single_file: bool) -> dict:
+    """
+    The run -> LLM -> verify loop. Runs on a worker thread because every step
+    blocks (docker subprocesses and the LLM HTTP call).
+    """
+    with span("repair", run_id=run_id, language=req.language):
+        if req.language != "java" or JAVA_ENGINE != "session":
+            result = repair_attempts(run_id, req, project_files, entry_file, single_file)
+        else:
+            session = open_session(run_id, os.path.join(WORKDIR, run_id), run_timeout=RUN_TIMEOUT)
+            try:
+                result = repair_attempts(run_id, req, project_files, entry_file, single_file)
+            finally:
+                close_session(run_id)
+            # Compile and run time of every run that went through the session
+            result["timings"] = session.timings
+    REPAIRS.inc(language=req.language, status=result["status"])
+    return result
+
+
+def repair_policy(req: RepairRequest):
+    """The policy for one repair, from the server defaults and the request's own limits."""
+    limits = POLICY_LIMITS
+    if req.max_attempts is not None:
+        limits = replace(limits, max_attempts=max(1, min(req.max_attempts, limits.max_attempts)))
+    if req.deadline_seconds is not None:
+        limits = replace(limits, deadline_seconds=req.deadline_seconds)
+    if req.token_budget is not None:
+        limits = replace(limits, token_budget=req.token_budget)
+    strategy = Strategy(
+        edit_mode=req.edit_mode,
+        candidates=max(1, min(req.candidates, MAX_CANDIDATES)),
+        fresh_samples=not req.llm_cache,
+    )
+    # The deadline counts time spent waiting in the queue
+    job = current_job()
+    started = job.created_at if job is not None else None
+    # A stuck repair only widens to parallel samples when REPAIR_ESCALATE_CANDIDATES allows it
+    max_candidates = min(ESCALATE_CANDIDATES, MAX_CANDIDATES)
+    return make_policy(req.policy or REPAIR_POLICY, limits, strategy, max_candidates, started)
 
-            file_path = os.path.join(root, name)
-            rel_path = os.path.relpath(file_path, run_dir)
 
-            # Now it's safe to open
-            with open(file_path, "r", errors="ignore") as f:
-                original_code[rel_path] = f.read().strip()
+def repair_attempts(run_id: str, req: RepairRequest, project_files: list, entry_file: str, single_file: bool) -> dict:
+    run_dir = os.path.join(WORKDIR, run_id)
+    policy = repair_policy(req)
+    max_attempts = policy.limits.max_attempts
 
-    
-    print("Original code collected for repair")
+    # Save original code before any modifications
+    manifest = get_manifest(run_dir)
+    original_code = manifest.contents()
 
     # Initial run to check if code is already working
-    if req.language == "python":
-        print("Running initial Python execution")
-        ret, out, err = run_python(run_id, entry_file)
-        print(f"INITIAL RUN - RET: {ret}, OUT:\n{out}\nERR:\n{err}")
-    else:
-        ret, out, err = run_java(run_id, entry_file)
-        print(f"INITIAL RUN - RET: {ret}, OUT:\n{out}\nERR:\n{err}")
+    report("iteration_start", iterationId=f"{run_id}-0", attempt=0, max_attempts=max_attempts)
+    started = time.monotonic()
+    ret, out, err = run_program(req.language, run_id, entry_file)
+    log.info("Initial run of %s exited with %s", run_id, ret)
+    log.debug("Initial run output:\n%s\nERR:\n%s", out, err)
+    report_run(run_id, 0, ret, out, err, time.monotonic() - started)
+    policy.observe(Attempt(ret, out, err))
+
+    # The unchanged project counts as tried: a candidate that changes nothing isn't run again
+    history = CandidateHistory(original_code)
+    history.claim(history.digest({}))
+    history.record(history.digest({}), (ret, out, err))
 
     # Check if already successful
-    if ret == 0 and (req.expected_output is None or out.strip() == req.expected_output.strip()):
-
-        fixed_code_map = {}
-
-        for f in project_files:
-            name = os.path.basename(f).lower()
-
-            # Skip junk files
-            if (
-                name.startswith("__") or
-                name.endswith(".zip") or
-                name == ".ds_store" or
-                name.startswith("._")
-            ):
-                continue
-
-            abs_path = os.path.join(run_dir, f)
-
-            try:
-                with open(abs_path, "r", encoding="utf-8") as fp:
-                    fixed_code_map[f] = fp.read().strip()
-            except Exception as e:
-                print(f"Skipping non-text file {f}: {e}")
-                continue
-
+    if is_expected(req, ret, out):
         return {
             "status": "success",
             "iterations": 0,
             "output": out,
             "message": "Code was already working",
-            "original_code": original_code,
-            "fixed_code": fixed_code_map
+            **result_files(req, run_id, manifest, original_code, project_files)
         }
 
-    # Attempt fixes
-    for attempt in range(1, max_attempts + 1):
-        print(f"\n=== FIX ATTEMPT {attempt}/{max_attempts} ===")
-
-        def build_llm_project_payload(original_code: dict) -> str:
-            """
-            Convert {relative_path: source_code} into an LLM-friendly payload.
-            """
-            chunks = []
-
-            for rel_path, code in original_code.items():
-                chunks.append(
-                    f"===== FILE: {rel_path} =====\n"
-                    f"{code}\n"
-                    f"===== END FILE {rel_path} =====\n"
-                )
+    if QUICK_FIXES and req.quick_fixes:
+        quick = try_quick_fixes(run_id, req, manifest, entry_file, err, history)
+        if quick is not None:
+            fix, out = quick
+            return {
+                "status": "success",
+                "iterations": 1,
+                "output": out,
+                "message": f"Fixed without the LLM: {fix.description}",
+                "quick_fix": fix.rule,
+                "prompt_tokens": [],
+                **result_files(req, run_id, manifest, original_code, project_files,
+                               fixed_entry=entry_file if single_file else None)
+            }
+
+    # Prompts already sent during this repair; repeating one should produce a
+    # new sample rather than the cached answer that didn't work
+    sent_prompts = set()
+    prompt_tokens = []
+    cascade = ModelCascade(
+        CASCADE_SETTINGS.tiers_for(req.language, req.cascade),
+        error_class(req.language, ret, out, err),
+        CASCADE_SETTINGS.failures_per_tier,
+    )
+    # Keeps attempts on the backend that already holds the prompt prefix
+    session = LLMSession(run_id, use_context=LLM_SESSION_CONTEXT)
+
+    # Attempt fixes until they succeed or the policy gives up
+    attempt = 0
+    while True:
+        check_cancelled()
+        decision = policy.decide()
+        if decision.action == ABORT:
+            break
+        if decision.action == ESCALATE:
+            log.info("Repair looks stuck (%s); switching to %s", decision.reason, decision.strategy)
+            report("strategy", iterationId=f"{run_id}-{attempt}", reason=decision.reason, **policy.stats()["strategy"])
+        strategy = policy.strategy
+
+        attempt += 1
+        log.info("Fix attempt %d/%d for %s", attempt, max_attempts, run_id)
+        report("iteration_start", iterationId=f"{run_id}-{attempt}", attempt=attempt, max_attempts=max_attempts)
+
+        tier = cascade.tier
+        context = None
+        protected = set()
+        if not single_file:
+            # Rank files against this attempt's error and fit them into the budget,
+            # which grows and shrinks with the tier's context window
+            budget = PROMPT_CONTEXT_TOKENS * (tier.num_ctx or DEFAULT_OPTIONS["num_ctx"]) // DEFAULT_OPTIONS["num_ctx"]
+            with span("prompt.context", files=len(original_code)):
+                context = build_context(original_code, entry_file, err, req.language, budget)
+            # Files the model only saw in part must not be overwritten by it
+            protected = set(context.summarized) | set(context.omitted)
+            prompt_tokens.append(context.tokens_used)
+            report("context", iterationId=f"{run_id}-{attempt}", **context.stats())
+
+        prompt = make_prompt(req, entry_file, single_file, original_code, ret, err, context, protected,
+                             edit_mode=strategy.edit_mode, tier=tier, session=session)
+        use_cache = not strategy.fresh_samples and prompt.text not in sent_prompts
+        sent_prompts.add(prompt.text)
+
+        if strategy.candidates > 1:
+            ret, out, err, answer = try_candidates_in_parallel(
+                run_id, req, prompt, attempt, entry_file, strategy.candidates, use_cache, history
+            )
+        else:
+            ret, out, err, answer = try_candidate(run_id, req, prompt, attempt, entry_file, use_cache, history)
+        # Every parallel candidate sends the prompt and gets its own answer
+        policy.observe(Attempt(ret, out, err, answer, estimate_tokens(prompt.text) * strategy.candidates,
+                               estimate_tokens(answer) * strategy.candidates))
+
+        # Check if fix was successful
+        solved = is_expected(req, ret, out)
+        CASCADE_STATS.record(req.language, cascade, solved)
+        if solved:
+            return {
+                "status": "success",
+                "iterations": attempt,
+                "output": out,
+                "message": f"Fixed after {attempt} attempt(s)",
+                "prompt_tokens": prompt_tokens,
+                "policy": policy.stats(),
+                "cascade": cascade.summary(),
+                # A single file comes back as plain text
+                **result_files(req, run_id, manifest, original_code, project_files,
+                               fixed_entry=entry_file if single_file else None)
+            }
+        if cascade.failed():
+            log.info("Moving %s up to model tier %s", run_id, cascade.tier.name)
+            report("tier", iterationId=f"{run_id}-{attempt}", tier=cascade.tier.name, model=cascade.tier.model,
+                   num_ctx=cascade.tier.num_ctx)
 
-            return "\n".join(chunks)
+    # If neither branch succeeded, we fall through to here:
+    # FINAL FAILURE RETURN
+    log.info("Giving up on %s: %s", run_id, decision.reason)
+    return {
+        "status": "failed",
+        "iterations": attempt,
+        "last_output": out,
+        "last_error": err,
+        "last_exit_code": ret,
+        "message": f"Could not fix after {attempt} attempts ({decision.reason})",
+        "stopped_because": decision.reason,
+        "prompt_tokens": prompt_tokens,
+        "policy": policy.stats(),
+        "cascade": cascade.summary(),
+        **result_files(req, run_id, manifest, original_code, project_files)
+    }
 
 
-        project_payload = build_llm_project_payload(original_code)
-        print(f"LLM project payload built:\n{project_payload}")
+@timed("result.assemble")
+def result_files(req: RepairRequest, run_id: str, manifest: Manifest, original_code: dict,
+                 project_files: list, fixed_entry: str | None = None) -> dict:
+    """
+    The code part of a repair result. "full" returns original_code and
+    fixed_code with every file; "diff" returns unified diffs of the files
+    the repair changed and only hashes for the rest, so the payload grows
+    with the fix rather than with the project. Full contents stay available
+    from /runs/{run_id}/files.
+    """
+    if req.response_mode != "diff":
+        if fixed_entry is not None:
+            fixed_code = manifest.text(fixed_entry).strip()  # Normalize whitespace
+        else:
+            # Return entire updated directory
+            fixed_code = manifest.contents(project_files)
+        return {"original_code": original_code, "fixed_code": fixed_code}
+
+    changed = manifest.changed()
+    changes = {}
+    for rel_path in changed:
+        before = manifest.original_text(rel_path) or ""
+        after = manifest.text(rel_path) or ""
+        changes[rel_path] = "".join(difflib.unified_diff(
+            before.splitlines(keepends=True),
+            after.splitlines(keepends=True),
+            fromfile=f"a/{rel_path}",
+            tofile=f"b/{rel_path}",
+        ))
+    unchanged = {
+        rel_path: manifest.entries[rel_path].sha256
+        for rel_path in project_files
+        if rel_path not in changes and rel_path in manifest.entries
+    }
+    return {"changes": changes, "unchanged": unchanged, "files_url": f"/runs/{run_id}/files"}
+
+
+@timed("output.compare")
+def is_expected(req: RepairRequest, ret: int, out: str) -> bool:
+    return ret == 0 and (req.expected_output is None or out.strip() == req.expected_output.strip())
 
-        # Build LLM prompt for single file repair
-        if single_file:
-            prompt = f"""
+
+def build_llm_project_payload(original_code: dict) -> str:
+    """
+    Convert {relative_path: source_code} into an LLM-friendly payload.
+    """
+    chunks = []
+
+    for rel_path, code in original_code.items():
+        chunks.append(
+            f"===== FILE: {rel_path} =====\n"
+            f"{code}\n"
+            f"===== END FILE {rel_path} =====\n"
+        )
+
+    return "\n".join(chunks)
+
+
+def build_repair_prompt(req: RepairRequest, entry_file: str, single_file: bool, original_code: dict, ret: int, err: str,
+                        context: ProjectContext | None = None) -> tuple:
+    """
+    -> (prefix, suffix). The prefix only depends on the request and the files
+    shown, so consecutive attempts share it (see llm_session.py); the suffix
+    holds this attempt's error.
+    """
+    # Build LLM prompt for single file repair
+    if single_file:
+        return f"""
 You are a code auto-repair tool.
 
 RULES:
@@ -601,20 +1245,28 @@ INPUT FILE NAME: {entry_file}
 CURRENT CODE:
 {original_code[entry_file]}
 
+EXPECTED OUTPUT:
+{req.expected_output}
+""", f"""
 STDERR:
 {err}
 
 EXIT CODE:
 {ret}
 
-EXPECTED OUTPUT:
-{req.expected_output}
-
 RETURN ONLY THE FULL FIXED CODE BELOW NOTHING ELSE:
 """
-        # Build LLM prompt for multi-file repair
-        else:
-            prompt = f"""
+
+    # Build LLM prompt for multi-file repair
+    if context is not None:
+        project_payload = context.payload
+        log.info("LLM project context built (%d/%d tokens)", context.tokens_used, context.budget)
+        log.debug("LLM project payload:\n%s", project_payload)
+    else:
+        project_payload = build_llm_project_payload(original_code)
+        log.debug("LLM project payload:\n%s", project_payload)
+
+    return f"""
 You are a code auto-repair tool.
 
 CRITICAL: Your response MUST be ONLY a valid JSON object. No explanations, no markdown, no extra text.
@@ -630,8 +1282,9 @@ CRITICAL RULES:
 2. PRESERVE ALL import statements (they are needed for dependencies between files)
 3. PRESERVE ALL function and class definitions exactly as they are
 4. If a function is called but has a typo in the call, fix ONLY the call, not the imports
+5. Files marked '===== SUMMARY: <path> =====' only show declarations; NEVER return them
 
-Below is the full project directory.
+Below are the project files most relevant to the error.
 Each file is marked with '===== FILE: <path> ====='.
 
 {project_payload}
@@ -641,7 +1294,7 @@ Fix the error to match the expected output. The error is shown in STDERR below.
 
 Expected output:
 {req.expected_output}
-
+""", f"""
 STDERR:
 {err}
 
@@ -651,135 +1304,450 @@ EXIT CODE:
 REMEMBER: Return ONLY the JSON object with filename keys and fixed code values. Make minimal changes.
 """
 
-        # Call LLM to fix
+
+def build_patch_prompt(req: RepairRequest, entry_file: str, single_file: bool, original_code: dict, ret: int, err: str,
+                       context: ProjectContext | None = None) -> tuple:
+    """Like build_repair_prompt, but the answer is a unified diff rather than whole files."""
+    if single_file:
+        project_payload = (
+            f"===== FILE: {entry_file} =====\n"
+            f"{original_code[entry_file]}\n"
+            f"===== END FILE {entry_file} =====\n"
+        )
+    elif context is not None:
+        project_payload = context.payload
+        log.info("LLM project context built (%d/%d tokens)", context.tokens_used, context.budget)
+        log.debug("LLM project payload:\n%s", project_payload)
+    else:
+        project_payload = build_llm_project_payload(original_code)
+        log.debug("LLM project payload:\n%s", project_payload)
+
+    return f"""
+You are a code auto-repair tool.
+
+CRITICAL: Your response MUST be ONLY a unified diff inside one ```diff block. No explanations, no other text.
+
+OUTPUT FORMAT (this is the ONLY acceptable output):
+```diff
+--- a/{entry_file}
++++ b/{entry_file}
+@@ -12,3 +12,3 @@
+ unchanged line before the fix
+-broken line
++fixed line
+ unchanged line after the fix
+```
+
+CRITICAL RULES:
+1. Change ONLY what is necessary to fix the error - do not refactor or improve code
+2. Copy 2-3 unchanged lines around every change exactly as they appear, prefixed with a space
+3. Start the changes to each file with its own '--- a/<path>' and '+++ b/<path>' lines
+4. NEVER repeat the whole file
+5. Files marked '===== SUMMARY: <path> =====' only show declarations; NEVER patch them
+
+Below are the project files most relevant to the error.
+Each file is marked with '===== FILE: <path> ====='.
+
+{project_payload}
+
+TASK:
+Fix the error to match the expected output. The error is shown in STDERR below.
+
+Expected output:
+{req.expected_output}
+""", f"""
+STDERR:
+{err}
+
+EXIT CODE:
+{ret}
+
+REMEMBER: Return ONLY the diff. Make minimal changes.
+"""
+
+
+@dataclass
+class RepairPrompt:
+    """A prompt together with how its answer is read."""
+    text: str
+    format: str | None  # "json" makes Ollama constrain the answer to JSON
+    parse: Callable[[str], dict]  # raw answer -> {relative_path: new_contents}
+    fallback: "RepairPrompt | None" = None  # asked instead when a patch answer doesn't apply
+    tier: Tier = DEFAULT_TIER  # model and num_ctx it is sent with
+    prefix: str = ""  # start of text shared with the other attempts of the repair
+    session: LLMSession | None = None  # the repair's backend state, reused across attempts
+
+
+@timed("prompt.build")
+def make_prompt(req: RepairRequest, entry_file: str, single_file: bool, original_code: dict, ret: int, err: str,
+                context: ProjectContext | None = None, protected=(), edit_mode: str = "full",
+                tier: Tier = DEFAULT_TIER, session: LLMSession | None = None) -> RepairPrompt:
+    prefix, suffix = build_repair_prompt(req, entry_file, single_file, original_code, ret, err, context)
+    whole_files = RepairPrompt(
+        text=prefix + suffix,
         # For multi-file mode, force JSON output format
-        raw = call_llm(prompt, format="json" if not single_file else None)
-        print(f"LLM RAW OUTPUT:\n{raw}")
+        format=None if single_file else "json",
+        parse=lambda raw: parse_candidate(raw, single_file, entry_file, protected),
+        tier=tier,
+        prefix=prefix,
+        session=session,
+    )
+    if edit_mode != "patch":
+        return whole_files
+    prefix, suffix = build_patch_prompt(req, entry_file, single_file, original_code, ret, err, context)
+    return RepairPrompt(
+        text=prefix + suffix,
+        format=None,
+        parse=lambda raw: parse_patch(raw, original_code, entry_file, protected),
+        fallback=whole_files,
+        tier=tier,
+        prefix=prefix,
+        session=session,
+    )
 
-        if single_file:
 
-            # Extract and save fixed code
-            new_code = extract_code_only(raw)
-            print(f"CLEANED CODE:\n{new_code}")
+def parse_patch(raw: str, original_code: dict, entry_file: str, protected=()) -> dict:
+    """
+    Apply a unified diff from the LLM to the original files -> {relative_path:
+    new_contents} of the files it touches. Raises PatchError if it doesn't apply.
+    """
+    files = apply_patch(original_code, raw, entry_file)
+    for rel_path in set(files) & set(protected):
+        log.info("Ignoring patch to %s: the model only saw its summary", rel_path)
+        del files[rel_path]
+    if not files:
+        raise PatchError("the patch only touches files the model did not see")
+    log.debug("Patched files: %s", sorted(files))
+    return files
 
-            with open(os.path.join(run_dir, entry_file), "w") as f:
-                f.write(new_code)
 
-            # Verify the fix by running again
-            if req.language == "python":
-                ret, out, err = run_python(run_id, entry_file)
-                print(f"VERIFICATION RUN {attempt} - RET: {ret}, OUT:\n{out}\nERR:\n{err}")
-            else:
-                ret, out, err = run_java(run_id, entry_file)
-                print(f"VERIFICATION RUN {attempt} - RET: {ret}, OUT:\n{out}\nERR:\n{err}")
-
-            # Check if fix was successful
-            if ret == 0 and (req.expected_output is None or out.strip() == req.expected_output.strip()):
-                # Read the fixed code
-                with open(os.path.join(run_dir, entry_file)) as f:
-                    fixed_code = f.read().strip()  # Normalize whitespace
-
-                return {
-                    "status": "success",
-                    "iterations": attempt,
-                    "output": out,
-                    "message": f"Fixed after {attempt} attempt(s)",
-                    "original_code": original_code,
-                    "fixed_code": fixed_code
-                }
-    
-        else:
-            # MULTI-FILE MODE
+def read_answer(prompt: RepairPrompt, raw: str, use_cache: bool, options: dict | None = None):
+    """
+    Files from an answer to prompt -> (files, extra_llm_seconds). A patch that
+    doesn't apply is asked for again as whole files within the same attempt.
+    """
+    try:
+        return prompt.parse(raw), 0.0
+    except PatchError as e:
+        if prompt.fallback is None:
+            raise HTTPException(status_code=500, detail=f"LLM patch does not apply: {e}\nRaw Output:\n{raw}")
+        log.info("Patch does not apply (%s); asking for whole files instead", e)
+        raw, llm_seconds = generate_candidate(prompt.fallback, use_cache, options)
+        return prompt.fallback.parse(raw), llm_seconds
 
-            # The LLM MUST return JSON like:
-            # { "file1.py": "new contents", "dir/utils.py": "new contents" }
 
-            try:
-                cleaned_json = extract_json(raw)
-                cleaned_json = normalize_llm_json(cleaned_json)
-                print(f"CLEANED JSON:\n{cleaned_json}")
-                fixes = json.loads(cleaned_json)
-                if not isinstance(fixes, dict):
-                    raise ValueError("LLM JSON must be an object mapping filename → content")
-            except Exception as e:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"LLM output is not valid JSON: {e}\nRaw Output:\n{raw}"
-                )
+def parse_candidate(raw: str, single_file: bool, entry_file: str, protected=()) -> dict:
+    """Turn an LLM answer into {relative_path: new_contents}, ignoring files in protected."""
+    if single_file:
+        # Extract fixed code
+        new_code = extract_code_only(raw)
+        log.debug("Cleaned code:\n%s", new_code)
+        return {entry_file: new_code}
 
-            # Apply changes
-            for rel_path, new_contents in fixes.items():
-                abs_path = os.path.join(run_dir, rel_path)
+    # MULTI-FILE MODE
 
-                # prevent escaping the project dir
-                if not os.path.commonpath([run_dir, abs_path]).startswith(run_dir):
-                    raise HTTPException(
-                        400,
-                        f"LLM attempted to write outside project: {rel_path}"
-                    )
+    # The LLM MUST return JSON like:
+    # { "file1.py": "new contents", "dir/utils.py": "new contents" }
 
-                # ensure directory exists
-                os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    try:
+        cleaned_json = extract_json(raw)
+        cleaned_json = normalize_llm_json(cleaned_json)
+        log.debug("Cleaned JSON:\n%s", cleaned_json)
+        fixes = json.loads(cleaned_json)
+        if not isinstance(fixes, dict):
+            raise ValueError("LLM JSON must be an object mapping filename → content")
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"LLM output is not valid JSON: {e}\nRaw Output:\n{raw}"
+        )
+    for rel_path in set(fixes) & set(protected):
+        log.info("Ignoring rewrite of %s: the model only saw its summary", rel_path)
+        del fixes[rel_path]
+    return fixes
 
-                with open(abs_path, "w") as f:
-                    f.write(new_contents)
 
-            # Verify fix
-            if req.language == "python":
-                ret, out, err = run_python(run_id, entry_file)
-            else:
-                ret, out, err = run_java(run_id, entry_file)
-
-            print(f"VERIFICATION RUN {attempt} - RET: {ret}, OUT:\n{out}\nERR:\n{err}")
-
-            # If successful, return entire updated directory
-            if ret == 0 and (req.expected_output is None or out.strip() == req.expected_output.strip()):
-                fixed_code_map = {}
-
-                for f in project_files:
-                    name = os.path.basename(f).lower()
-
-                    # Skip junk files
-                    if (
-                        name.startswith("__") or
-                        name.endswith(".zip") or
-                        name == ".ds_store" or
-                        name.startswith("._")
-                    ):
-                        continue
-
-                    abs_path = os.path.join(run_dir, f)
-
-                    try:
-                        with open(abs_path, "r", encoding="utf-8") as fp:
-                            fixed_code_map[f] = fp.read().strip()
-                    except Exception as e:
-                        print(f"Skipping non-text file {f}: {e}")
-                        continue
-
-
-                return {
-                    "status": "success",
-                    "iterations": attempt,
-                    "output": out,
-                    "message": f"Fixed after {attempt} attempt(s)",
-                    "original_code": original_code,
-                    "fixed_code": fixed_code_map
-                }
-    # If neither branch succeeded, we fall through to here:
-    # FINAL FAILURE RETURN
-    fixed_on_disk = {
-        f: open(os.path.join(run_dir, f)).read().strip()
-        for f in project_files
-    }
+def write_candidate(target_dir: str, files: dict):
+    """Apply {relative_path: contents} inside target_dir."""
+    for rel_path, new_contents in files.items():
+        abs_path = os.path.join(target_dir, rel_path)
 
-    return {
-        "status": "failed",
-        "iterations": max_attempts,
-        "last_output": out,
-        "last_error": err,
-        "last_exit_code": ret,
-        "message": f"Could not fix after {max_attempts} attempts",
-        "original_code": original_code,
-        "fixed_code": fixed_on_disk
-    }
+        # prevent escaping the project dir
+        if not os.path.commonpath([target_dir, abs_path]).startswith(target_dir):
+            raise HTTPException(
+                400,
+                f"LLM attempted to write outside project: {rel_path}"
+            )
+
+        # ensure directory exists
+        os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+
+        # Replace rather than truncate: the file may be a hard link shared
+        # with the run directory (candidate workspaces)
+        if os.path.exists(abs_path):
+            os.remove(abs_path)
+
+        with open(abs_path, "w") as f:
+            f.write(new_contents)
+
+
+def precheck(req: RepairRequest, run_dir: str, files: dict, entry_file: str, history: CandidateHistory):
+    """
+    Static checks for a candidate before it is executed -> (digest, result).
+    result is None when the candidate should run; otherwise it is the
+    (returncode, stdout, stderr) to use instead, with a synthetic stderr.
+    """
+    digest = history.digest(files)
+    if not STATIC_CHECKS:
+        return digest, None
+
+    manifest = get_manifest(run_dir)
+    problem = check_candidate(req.language, files, manifest.paths(), manifest.text, entry_file)
+    if problem is not None:
+        reason, stderr = problem
+        result = (1, "", stderr)
+    else:
+        new, previous = history.claim(digest)
+        if new:
+            STATIC_CHECK_STATS.record(None)
+            return digest, None
+        # Same code as an earlier run: repeat its outcome with a nudge
+        ret, out, err = previous or (1, "", "")
+        note = "This exact code was already run" if previous else "An identical candidate is being run"
+        reason, stderr = "duplicate", f"{note}; it needs a different fix.\n{err}"
+        result = (ret or 1, out, stderr)
+
+    STATIC_CHECK_STATS.record(reason)
+    log.info("Candidate rejected without running (%s)", reason)
+    log.debug("Static check output:\n%s", stderr)
+    return digest, result
+
+
+def apply_to_run(run_dir: str, files: dict):
+    """Write an accepted candidate into the run directory and its manifest."""
+    manifest = get_manifest(run_dir)
+    manifest.keep_originals(files)
+    write_candidate(run_dir, files)
+    manifest.update(files)
+
+
+def generate_candidate(prompt: RepairPrompt, use_cache: bool, options: dict | None = None,
+                       cancel: threading.Event | None = None):
+    """Call the LLM with the prompt's model tier -> (raw_output, llm_seconds)."""
+    extra = {}
+    if cancel is not None:
+        extra["cancel"] = cancel
+    options = {**prompt.tier.options(), **(options or {})}
+    if options:
+        extra["options"] = options
+    if prompt.tier.model:
+        extra["model"] = prompt.tier.model
+    llm_started = time.monotonic()
+    with span("llm.generate", prompt_chars=len(prompt.text), tier=prompt.tier.name), \
+            session_turn(prompt.session, prompt.prefix):
+        raw = call_llm(prompt.text, format=prompt.format, use_cache=use_cache, **extra)
+    llm_seconds = time.monotonic() - llm_started
+    log.debug("Prompt:\n%s", prompt.text)
+    log.debug("LLM raw output:\n%s", raw)
+    return raw, llm_seconds
+
+
+def run_in_workspace(run_id: str, workspace: str, req: RepairRequest, files: dict, entry_file: str):
+    """Run the project with files applied, in a hard-linked copy of the run directory."""
+    # Unique per call: an abandoned candidate may still be running in an older workspace
+    workspace = f"{workspace}.{uuid.uuid4().hex[:8]}"
+    workspace_dir = os.path.join(WORKDIR, workspace)
+    try:
+        # Hard links: only the files this candidate rewrites take new space
+        link_tree(os.path.join(WORKDIR, run_id), workspace_dir)
+        write_candidate(workspace_dir, files)
+        return run_program(req.language, workspace, entry_file)
+    finally:
+        shutil.rmtree(workspace_dir, ignore_errors=True)
+
+
+def try_quick_fixes(run_id: str, req: RepairRequest, manifest: Manifest, entry_file: str, err: str,
+                    history: CandidateHistory):
+    """
+    Verify the rule-based candidates for err one by one. A candidate that
+    gets past the first error to a different one is kept as the base for
+    further rules (programs often have more than one mechanical bug). The
+    first candidate with the expected result is applied -> (fix, stdout);
+    None leaves the run directory untouched for the LLM.
+    """
+    run_dir = os.path.join(WORKDIR, run_id)
+    frontier = [({}, err)]  # (changes so far, the error they produce)
+    runs = 0
+    while frontier and runs < QUICK_FIX_MAX_RUNS:
+        changes, base_err = frontier.pop(0)
+        texts = {p: manifest.text(p) for p in manifest.paths()}
+        texts = {**{p: t for p, t in texts.items() if t is not None}, **changes}
+        for fix in propose_fixes(req.language, texts, entry_file, base_err,
+                                 guesses=req.expected_output is not None):
+            if runs >= QUICK_FIX_MAX_RUNS:
+                break
+            files = {**changes, **fix.files}
+            digest, rejected = precheck(req, run_dir, files, entry_file, history)
+            if rejected is not None:
+                continue
+
+            runs += 1
+            started = time.monotonic()
+            ret, out, new_err = run_in_workspace(run_id, f"{run_id}.quick", req, files, entry_file)
+            history.record(digest, (ret, out, new_err))
+            log.info("Quick fix %s (%s) exited with %s", fix.rule, fix.description, ret)
+            log.debug("Quick fix output:\n%s\nERR:\n%s", out, new_err)
+            report(
+                "quick_fix",
+                iterationId=f"{run_id}-0",
+                rule=fix.rule,
+                description=fix.description,
+                exit_code=ret,
+                run_seconds=time.monotonic() - started
+            )
+
+            if is_expected(req, ret, out):
+                apply_to_run(run_dir, files)
+                history.advance(files)
+                return fix, out
+            if error_signature(ret, out, new_err) != error_signature(1, "", base_err):
+                frontier.append((files, new_err))
+    return None
+
+
+def try_candidate(run_id: str, req: RepairRequest, prompt: RepairPrompt, attempt: int, entry_file: str,
+                  use_cache: bool, history: CandidateHistory):
+    """One LLM sample, written into the run directory and verified there."""
+    raw, llm_seconds = generate_candidate(prompt, use_cache)
+    report(
+        "iteration_update",
+        iterationId=f"{run_id}-{attempt}",
+        status="verifying",
+        reasoning=raw,
+        llm_seconds=llm_seconds,
+        answer_tokens=estimate_tokens(raw)
+    )
+
+    # Don't spend a sandbox run if the client gave up while the LLM was busy
+    check_cancelled()
+
+    files, fallback_seconds = read_answer(prompt, raw, use_cache)
+    llm_seconds += fallback_seconds
+    run_dir = os.path.join(WORKDIR, run_id)
+
+    digest, rejected = precheck(req, run_dir, files, entry_file, history)
+    if rejected is not None:
+        ret, out, err = rejected
+        report_run(run_id, attempt, ret, out, err, 0.0, llm_seconds, rejected=True)
+        return ret, out, err, raw
+
+    apply_to_run(run_dir, files)
+    history.advance(files)
+
+    # Verify the fix by running again
+    started = time.monotonic()
+    ret, out, err = run_program(req.language, run_id, entry_file)
+    history.record(digest, (ret, out, err))
+    log.info("Verification run %d exited with %s", attempt, ret)
+    log.debug("Verification run %d output:\n%s\nERR:\n%s", attempt, out, err)
+    report_run(run_id, attempt, ret, out, err, time.monotonic() - started, llm_seconds)
+    return ret, out, err, raw
+
+
+def try_candidates_in_parallel(run_id: str, req: RepairRequest, prompt: RepairPrompt, attempt: int, entry_file: str,
+                               count: int, use_cache: bool, history: CandidateHistory):
+    """
+    Ask for `count` candidate fixes at once, each with its own temperature and
+    seed, and verify every candidate in its own hard-linked workspace as soon
+    as it arrives. The first candidate that produces the expected output is
+    written to the run directory and the rest are abandoned. If none does, the
+    first candidate to finish is kept so the next prompt sees its error.
+    """
+    run_dir = os.path.join(WORKDIR, run_id)
+    job = current_job()
+    stop = threading.Event()
+
+    def attempt_one(k: int):
+        options = {
+            "temperature": CANDIDATE_TEMPERATURES[k % len(CANDIDATE_TEMPERATURES)],
+            "seed": attempt * count + k,
+        }
+        try:
+            # A candidate that loses the race stops generating and frees its gateway slot
+            raw, llm_seconds = generate_candidate(prompt, use_cache, options, cancel=stop)
+        except LLMCancelled:
+            return None
+        report(
+            "iteration_update",
+            iterationId=f"{run_id}-{attempt}",
+            candidate=k,
+            status="verifying",
+            reasoning=raw,
+            llm_seconds=llm_seconds,
+            answer_tokens=estimate_tokens(raw)
+        )
+
+        try:
+            files, fallback_seconds = read_answer(prompt, raw, use_cache, options)
+            llm_seconds += fallback_seconds
+        except HTTPException as e:
+            return k, None, 1, "", e.detail, raw
+
+        digest, rejected = precheck(req, run_dir, files, entry_file, history)
+        if rejected is not None:
+            ret, out, err = rejected
+            report_run(run_id, attempt, ret, out, err, 0.0, llm_seconds, candidate=k, rejected=True)
+            return k, None, ret, out, err, raw
+
+        # Another candidate already won or the client cancelled
+        if stop.is_set() or (job is not None and job.cancel_requested.is_set()):
+            return None
+
+        started = time.monotonic()
+        ret, out, err = run_in_workspace(run_id, f"{run_id}.cand{k}", req, files, entry_file)
+        history.record(digest, (ret, out, err))
+
+        log.info("Verification run %d.%d exited with %s", attempt, k, ret)
+        log.debug("Verification run %d.%d output:\n%s\nERR:\n%s", attempt, k, out, err)
+        report_run(run_id, attempt, ret, out, err, time.monotonic() - started, llm_seconds, candidate=k)
+        return k, files, ret, out, err, raw
+
+    executor = ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"candidates-{run_id[:8]}")
+    # copy_context keeps current_job() working inside the candidate threads
+    futures = [executor.submit(contextvars.copy_context().run, attempt_one, k) for k in range(count)]
+    first = None
+    first_error = None
+    try:
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                log.warning("Candidate failed: %s", e)
+                first_error = first_error or e
+                continue
+            if outcome is None:
+                continue
+
+            k, files, ret, out, err, raw = outcome
+            if files is not None and is_expected(req, ret, out):
+                log.info("Candidate %d fixed the program; cancelling the others", k)
+                stop.set()
+                apply_to_run(run_dir, files)
+                history.advance(files)
+                return ret, out, err, raw
+            # Prefer a candidate that actually ran over one rejected before running
+            if first is None or (first[1] is None and files is not None):
+                first = outcome
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    check_cancelled()
+    if first is None:
+        raise first_error or RuntimeError("No candidate could be generated")
+
+    k, files, ret, out, err, raw = first
+    if files is not None:
+        apply_to_run(run_dir, files)
+        history.advance(files)
+    return ret, out, err, raw
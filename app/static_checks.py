@@ -0,0 +1,351 @@
+"""
+Local checks that run before a candidate fix reaches the sandbox.
+
+A candidate that doesn't parse, imports something that can't exist in the
+runner, or leaves the project exactly as an earlier run already had it
+would only spend a container run (seconds) to learn what a local check
+tells in milliseconds. Such candidates get a synthetic stderr in the same
+format the runner would print, so it feeds straight into the next prompt.
+Checks are conservative: anything they can't decide is left to the run.
+"""
+import ast
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import traceback
+
+# Modules installed in python-runner beyond the standard library
+EXTRA_MODULES = {m.strip() for m in os.getenv("STATIC_CHECK_MODULES", "").split(",") if m.strip()}
+
+
+# ================================
+# PYTHON
+# ================================
+
+def _python_modules(paths: list, entry_file: str) -> dict:
+    """Importable module name -> project path, as seen from the entry file's directory."""
+    base = os.path.dirname(entry_file)
+    modules = {}
+    for rel in paths:
+        if not rel.endswith(".py"):
+            continue
+        if base:
+            if not rel.startswith(base + "/"):
+                continue
+            rel_to_base = rel[len(base) + 1:]
+        else:
+            rel_to_base = rel
+        name = rel_to_base[:-3].replace("/", ".")
+        if name.endswith(".__init__"):
+            name = name[:-len(".__init__")]
+        modules[name] = rel
+    return modules
+
+
+def _defined_names(tree: ast.Module) -> set | None:
+    """Names a module defines at import time; None when that can't be known statically."""
+    names = set()
+    stack = list(tree.body)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+            # `global` inside a function can add module names
+            if node.name == "__getattr__" or any(isinstance(n, ast.Global) for n in ast.walk(node)):
+                return None
+            continue
+        if isinstance(node, ast.ImportFrom) and any(a.name == "*" for a in node.names):
+            return None
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((a.asname or a.name).split(".")[0] for a in node.names)
+            continue
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store):
+            names.add(node.id)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        stack.extend(ast.iter_child_nodes(node))
+    return names
+
+
+def _import_error(path: str, node: ast.stmt, source: str, message: str) -> tuple:
+    line = source.splitlines()[node.lineno - 1].strip() if node.lineno <= len(source.splitlines()) else ""
+    return "imports", (
+        "Traceback (most recent call last):\n"
+        f'  File "{path}", line {node.lineno}, in <module>\n'
+        f"    {line}\n"
+        f"{message}\n"
+    )
+
+
+def _top_level_imports(tree: ast.Module) -> list:
+    """Unconditional module-level imports (ones in try/if blocks may be optional)."""
+    return [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+
+
+def check_python(files: dict, paths: list, read, entry_file: str) -> tuple | None:
+    """
+    (reason, synthetic stderr) for the first problem in the candidate files,
+    or None. read(path) returns the current text of any project file.
+    """
+    trees = {}
+    for path, code in files.items():
+        if not path.endswith(".py"):
+            continue
+        try:
+            compile(code, path, "exec", dont_inherit=True)
+        except (SyntaxError, ValueError) as e:
+            return "syntax", "".join(traceback.format_exception_only(type(e), e))
+        trees[path] = ast.parse(code)
+
+    modules = _python_modules(sorted(set(paths) | set(files)), entry_file)
+    packages = {m.split(".")[0] for m in modules}
+    known = set(sys.stdlib_module_names) | EXTRA_MODULES | packages
+
+    def source(path):
+        return files[path] if path in files else read(path)
+
+    # The entry file runs first, so its imports matter even if it wasn't rewritten
+    if entry_file.endswith(".py") and entry_file not in trees:
+        code = source(entry_file)
+        try:
+            trees[entry_file] = ast.parse(code or "")
+        except SyntaxError:
+            pass
+
+    for path, tree in trees.items():
+        code = source(path)
+        for node in _top_level_imports(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    top = alias.name.split(".")[0]
+                    if top not in known:
+                        return _import_error(path, node, code, f"ModuleNotFoundError: No module named '{top}'")
+                continue
+
+            if node.level or not node.module:
+                continue  # relative imports are left to the run
+            top = node.module.split(".")[0]
+            if top not in known:
+                return _import_error(path, node, code, f"ModuleNotFoundError: No module named '{top}'")
+            target = modules.get(node.module)
+            if target is None:
+                continue
+            try:
+                defined = _defined_names(ast.parse(source(target) or ""))
+            except SyntaxError:
+                continue
+            if defined is None:
+                continue
+            for alias in node.names:
+                if alias.name not in defined and f"{node.module}.{alias.name}" not in modules:
+                    return _import_error(
+                        path, node, code,
+                        f"ImportError: cannot import name '{alias.name}' from '{node.module}' ({target})"
+                    )
+    return None
+
+
+# ================================
+# JAVA
+# ================================
+
+_CLOSERS = {")": "(", "]": "[", "}": "{"}
+_JAVA_START = re.compile(
+    r"(package|import|public|private|protected|abstract|final|static|sealed|non-sealed|strictfp"
+    r"|class|interface|enum|record)\b|@"
+)
+_JAVA_PUBLIC_TYPE = re.compile(r"\bpublic\s+(?:(?:abstract|final|sealed|strictfp)\s+)*(?:class|interface|enum|record)\s+(\w+)")
+_JAVA_IMPORT = re.compile(r"^\s*import\s+(?!static)([\w.]+)\.(\w+)\s*;", re.M)
+
+
+def _java_error(path: str, line: int, message: str, code: str, reason: str = "syntax") -> tuple:
+    lines = code.splitlines()
+    source = lines[line - 1] if 0 < line <= len(lines) else ""
+    return reason, f"{path}:{line}: error: {message}\n{source}\n1 error\n"
+
+
+def _strip_java(code: str):
+    """Code with comments and literals blanked out -> (cleaned, error or None)."""
+    out = []
+    i, n, line = 0, len(code), 1
+    while i < n:
+        c = code[i]
+        if code.startswith("//", i):
+            end = code.find("\n", i)
+            end = n if end == -1 else end
+            out.append(" " * (end - i))
+            i = end
+        elif code.startswith("/*", i):
+            end = code.find("*/", i + 2)
+            if end == -1:
+                return None, (line, "unclosed comment")
+            chunk = code[i:end + 2]
+            out.append(re.sub(r"[^\n]", " ", chunk))
+            line += chunk.count("\n")
+            i = end + 2
+        elif code.startswith('"""', i):
+            end = code.find('"""', i + 3)
+            if end == -1:
+                return None, (line, "unclosed text block")
+            chunk = code[i:end + 3]
+            out.append(re.sub(r"[^\n]", " ", chunk))
+            line += chunk.count("\n")
+            i = end + 3
+        elif c in "\"'":
+            j = i + 1
+            while j < n and code[j] != c and code[j] != "\n":
+                j += 2 if code[j] == "\\" else 1
+            if j >= n or code[j] != c:
+                kind = "string" if c == '"' else "character"
+                return None, (line, f"unclosed {kind} literal")
+            out.append(" " * (j + 1 - i))
+            i = j + 1
+        else:
+            if c == "\n":
+                line += 1
+            out.append(c)
+            i += 1
+    return "".join(out), None
+
+
+def check_java(files: dict, paths: list) -> tuple | None:
+    """(reason, javac-style stderr) for the first problem in the candidate files, or None."""
+    all_paths = set(paths) | set(files)
+    packages = {os.path.dirname(p) for p in all_paths if p.endswith(".java")}
+
+    for path, code in files.items():
+        if not path.endswith(".java"):
+            continue
+        cleaned, problem = _strip_java(code)
+        if problem:
+            return _java_error(path, problem[0], problem[1], code)
+
+        first = next(((i, l) for i, l in enumerate(cleaned.splitlines(), 1) if l.strip()), None)
+        if first is None:
+            return _java_error(path, 1, "compilation unit is empty", code)
+        if not _JAVA_START.match(first[1].strip()):
+            return _java_error(path, first[0], "class, interface, enum, or record expected", code)
+
+        stack = []
+        braces = 0
+        depth_at = []  # brace depth at every character
+        line = 1
+        for c in cleaned:
+            depth_at.append(braces)
+            if c == "\n":
+                line += 1
+            elif c in "([{":
+                stack.append(c)
+                braces += c == "{"
+            elif c in _CLOSERS:
+                if not stack:
+                    return _java_error(path, line, "class, interface, enum, or record expected", code)
+                opener = stack.pop()
+                braces -= opener == "{"
+                if opener != _CLOSERS[c]:
+                    expected = {"(": ")", "[": "]", "{": "}"}[opener]
+                    return _java_error(path, line, f"'{expected}' expected", code)
+        if stack:
+            return _java_error(path, line, "reached end of file while parsing", code)
+
+        name = os.path.splitext(os.path.basename(path))[0]
+        for match in _JAVA_PUBLIC_TYPE.finditer(cleaned):
+            if depth_at[match.start()] == 0 and match.group(1) != name:
+                decl_line = cleaned.count("\n", 0, match.start()) + 1
+                return _java_error(
+                    path, decl_line,
+                    f"class {match.group(1)} is public, should be declared in a file named {match.group(1)}.java",
+                    code
+                )
+
+        for match in _JAVA_IMPORT.finditer(cleaned):
+            package, cls = match.group(1), match.group(2)
+            package_dir = package.replace(".", "/")
+            # Only packages that are part of the project can be checked
+            if package_dir in packages and f"{package_dir}/{cls}.java" not in all_paths:
+                decl_line = cleaned.count("\n", 0, match.start(1)) + 1
+                return _java_error(
+                    path, decl_line,
+                    f"cannot find symbol\n  symbol:   class {cls}\n  location: package {package}",
+                    code, reason="imports"
+                )
+    return None
+
+
+def check_candidate(language: str, files: dict, paths: list, read, entry_file: str) -> tuple | None:
+    """(reason, stderr) when the candidate would fail before doing anything, else None."""
+    if language == "python":
+        return check_python(files, paths, read, entry_file)
+    return check_java(files, paths)
+
+
+# ================================
+# DUPLICATES
+# ================================
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class CandidateHistory:
+    """Project states already executed during one repair, keyed by content digest."""
+
+    def __init__(self, files: dict):
+        # {path: text} of the project as it is before the first candidate
+        self._state = {path: _hash(text) for path, text in files.items()}
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def digest(self, files: dict) -> str:
+        with self._lock:
+            state = dict(self._state)
+        state.update({path: _hash(text) for path, text in files.items()})
+        return hashlib.sha256(json.dumps(sorted(state.items())).encode()).hexdigest()
+
+    def advance(self, files: dict) -> None:
+        """files were written to the run directory."""
+        with self._lock:
+            self._state.update({path: _hash(text) for path, text in files.items()})
+
+    def claim(self, digest: str):
+        """(True, None) the first time digest is seen, else (False, its result if known)."""
+        with self._lock:
+            if digest in self._results:
+                return False, self._results[digest]
+            self._results[digest] = None
+            return True, None
+
+    def record(self, digest: str, result: tuple) -> None:
+        with self._lock:
+            self._results[digest] = result
+
+
+# ================================
+# STATS
+# ================================
+
+class StaticCheckStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.rejected = {"syntax": 0, "imports": 0, "duplicate": 0}
+
+    def record(self, reason: str | None) -> None:
+        with self._lock:
+            self.checked += 1
+            if reason:
+                self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "rejected": dict(self.rejected),
+                "runs_avoided": sum(self.rejected.values()),
+            }
+
+
+STATIC_CHECK_STATS = StaticCheckStats()
@@ -0,0 +1,262 @@
+"""
+Logging, metrics and trace spans for the repair pipeline.
+
+Every stage (upload, file collection, prompt build, LLM call, container
+steps, result assembly, ...) runs inside span(stage), which records its
+duration in the cici_stage_seconds histogram and, when OpenTelemetry is
+installed and OTEL_EXPORTER_OTLP_ENDPOINT is set, exports it as a trace
+span. Metrics are kept in-process and rendered in the Prometheus text
+format by GET /metrics. Prompts, payloads and raw LLM answers are logged
+at DEBUG only (LOG_LEVEL), so they cost nothing at the default INFO.
+"""
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+log = logging.getLogger(__name__)
+
+
+def configure_logging() -> None:
+    """Root logging from LOG_LEVEL (default INFO), unless something configured it already."""
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(level=level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    logging.getLogger().setLevel(level)
+
+
+# ================================
+# METRICS
+# ================================
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    pairs = [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(labels.get(n, "") for n in self.labels), 0.0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [(self.name + _label_text(self.labels, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    type = "histogram"
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(labels.get(n, "") for n in self.labels)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(labels.get(n, "") for n in self.labels))
+        return series[-1] if series else 0
+
+    def snapshot(self) -> dict:
+        """{label values: (count, sum)} for every series."""
+        with self._lock:
+            return {key: (series[-1], series[-2]) for key, series in self._series.items()}
+
+    def samples(self) -> list:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append((f"{self.name}_bucket" + _label_text(self.labels, key, f'le="{bound:g}"'), cumulative))
+                lines.append((f"{self.name}_bucket" + _label_text(self.labels, key, 'le="+Inf"'), series[-1]))
+                lines.append((f"{self.name}_sum" + _label_text(self.labels, key), series[-2]))
+                lines.append((f"{self.name}_count" + _label_text(self.labels, key), series[-1]))
+        return lines
+
+
+class CallbackMetric:
+    """
+    A value read from a callback when /metrics is scraped, for numbers other
+    modules already keep (queue depth, cache hits, ...). Cumulative ones are
+    exposed with type "counter".
+    """
+
+    def __init__(self, name: str, help: str, read, labels: tuple = (), type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.type = type
+        self.read = read  # () -> number, or {label values tuple: number}
+
+    def samples(self) -> list:
+        try:
+            value = self.read()
+        except Exception as e:
+            log.warning("Metric %s failed: %s", self.name, e)
+            return []
+        if isinstance(value, dict):
+            return [(self.name + _label_text(self.labels, key), v) for key, v in sorted(value.items())]
+        return [(self.name, value)]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # Re-registering (module reloads in tests) keeps the first instance
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = Histogram.DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, read, labels: tuple = (), type: str = "gauge") -> CallbackMetric:
+        with self._lock:
+            # Callbacks are replaced so they always read the current objects
+            self._metrics[name] = CallbackMetric(name, help, read, labels, type)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        """Prometheus text exposition format 0.0.4."""
+        out = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.type}")
+            for name, value in metric.samples():
+                out.append(f"{name} {float(value):g}")
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("cici_stage_seconds", "Duration of each repair pipeline stage", ("stage",))
+STAGE_ERRORS = REGISTRY.counter("cici_stage_errors_total", "Stages that ended with an exception", ("stage",))
+LLM_TOKENS = REGISTRY.counter("cici_llm_tokens_total", "Tokens processed by the LLM", ("kind",))
+LLM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "cici_llm_tokens_per_second", "Generation speed of each LLM answer",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 200),
+)
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram("cici_llm_first_token_seconds", "Time until the first streamed token")
+REPAIRS = REGISTRY.counter("cici_repairs_total", "Finished repairs", ("language", "status"))
+
+
+def observe_generation(result) -> None:
+    """Token counts and speed of one llm_client.GenerationResult."""
+    stats = result.stats or {}
+    if stats.get("prompt_eval_count"):
+        LLM_TOKENS.inc(stats["prompt_eval_count"], kind="prompt")
+    if stats.get("eval_count"):
+        LLM_TOKENS.inc(stats["eval_count"], kind="completion")
+        # Ollama reports eval_duration in nanoseconds; fall back to wall clock
+        seconds = stats.get("eval_duration", 0) / 1e9 or result.seconds
+        if seconds > 0:
+            LLM_TOKENS_PER_SECOND.observe(stats["eval_count"] / seconds)
+    if result.first_token_seconds is not None:
+        LLM_FIRST_TOKEN_SECONDS.observe(result.first_token_seconds)
+
+
+# ================================
+# TRACING
+# ================================
+
+_tracer = None
+_tracer_ready = False
+_tracer_lock = threading.Lock()
+
+
+def _get_tracer():
+    """OpenTelemetry tracer exporting over OTLP, or None when disabled or not installed."""
+    global _tracer, _tracer_ready
+    if _tracer_ready:
+        return _tracer
+    with _tracer_lock:
+        if _tracer_ready:
+            return _tracer
+        _tracer_ready = True
+        if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+            return None
+        try:
+            from opentelemetry import trace
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            log.warning("OTEL_EXPORTER_OTLP_ENDPOINT is set but opentelemetry-sdk is not installed; not tracing")
+            return None
+        provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "cici-api")}))
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("cici")
+        return _tracer
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    """Time a pipeline stage; attributes are attached to the trace span."""
+    tracer = _get_tracer()
+    context = tracer.start_as_current_span(stage, attributes={
+        k: v for k, v in attributes.items() if isinstance(v, (str, int, float, bool))
+    }) if tracer else nullcontext()
+    started = time.perf_counter()
+    with context:
+        try:
+            yield
+        except BaseException:
+            STAGE_ERRORS.inc(stage=stage)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            STAGE_SECONDS.observe(elapsed, stage=stage)
+            log.debug("%s took %.3fs %s", stage, elapsed, attributes or "")
+
+
+def timed(stage: str):
+    """Decorator form of span() for functions that are a stage on their own."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,105 @@
+"""
+Bounded, streaming handling of /upload.
+
+Uploaded bytes are copied to disk in chunks instead of being read into
+memory in one go, and zip archives are extracted entry by entry against
+caps on upload size, entry count, total uncompressed size and compression
+ratio, so a zip bomb or an oversized project is rejected early with a
+4xx instead of filling memory or disk.
+"""
+import os
+import zipfile
+from dataclasses import dataclass
+
+from manifest import is_junk
+
+CHUNK_SIZE = 1 << 20
+
+
+class UploadRejected(Exception):
+    """The upload breaks one of the limits or is malformed; status_code is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class UploadLimits:
+    max_upload_bytes: int = 50 * 1024 * 1024
+    max_files: int = 2000
+    max_uncompressed_bytes: int = 200 * 1024 * 1024
+    max_ratio: float = 100.0  # uncompressed / compressed, per entry
+
+    @classmethod
+    def from_env(cls) -> "UploadLimits":
+        return cls(
+            max_upload_bytes=int(os.getenv("UPLOAD_MAX_BYTES", str(50 * 1024 * 1024))),
+            max_files=int(os.getenv("UPLOAD_MAX_FILES", "2000")),
+            max_uncompressed_bytes=int(os.getenv("UPLOAD_MAX_UNCOMPRESSED", str(200 * 1024 * 1024))),
+            max_ratio=float(os.getenv("UPLOAD_MAX_RATIO", "100")),
+        )
+
+
+def safe_join(root: str, rel: str) -> str:
+    """root/rel, refusing absolute paths and .. components that escape root."""
+    target = os.path.normpath(os.path.join(root, rel))
+    if os.path.isabs(rel) or not target.startswith(os.path.normpath(root) + os.sep):
+        raise UploadRejected(400, f"Illegal path in upload: {rel}")
+    return target
+
+
+def save_upload(src, dest: str, max_bytes: int) -> int:
+    """Copy an uploaded file object to dest chunk by chunk; returns the byte count."""
+    written = 0
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with open(dest, "wb") as out:
+        while True:
+            chunk = src.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            written += len(chunk)
+            if written > max_bytes:
+                out.close()
+                os.remove(dest)
+                raise UploadRejected(413, f"Upload exceeds {max_bytes} bytes")
+            out.write(chunk)
+    return written
+
+
+def extract_zip(zip_path: str, dest: str, limits: UploadLimits) -> list:
+    """
+    Extract zip_path into dest entry by entry and return [(rel_path, size)]
+    for every extracted file. Sizes are counted while copying, so a forged
+    header can't slip past the caps.
+    """
+    extracted = []
+    total = 0
+    try:
+        with zipfile.ZipFile(zip_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or is_junk(info.filename):
+                    continue
+                if len(extracted) >= limits.max_files:
+                    raise UploadRejected(413, f"Archive has more than {limits.max_files} files")
+                if info.compress_size and info.file_size / info.compress_size > limits.max_ratio:
+                    raise UploadRejected(413, f"Suspicious compression ratio for {info.filename}")
+
+                target = safe_join(dest, info.filename)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                size = 0
+                with archive.open(info) as src, open(target, "wb") as out:
+                    while True:
+                        chunk = src.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        size += len(chunk)
+                        total += len(chunk)
+                        if total > limits.max_uncompressed_bytes:
+                            raise UploadRejected(413, f"Archive expands to more than {limits.max_uncompressed_bytes} bytes")
+                        out.write(chunk)
+                extracted.append((os.path.relpath(target, dest), size))
+    except zipfile.BadZipFile:
+        raise UploadRejected(400, "Uploaded file is not a valid zip archive")
+    return extracted
@@ -0,0 +1,69 @@
+"""
+Copy-free project workspaces for the runner containers.
+
+In "mount" mode a run directory is bind-mounted read-only into a fresh
+runner at /src and copied from there into a tmpfs /work where the program
+runs, so nothing is streamed through `docker cp`. The program can rewrite
+its own files as it could after `docker cp`, and whatever it writes stays
+in the container. Candidate workspaces are hard-link farms of
+the run directory, so creating one costs a link per file and only the files
+an LLM rewrites take new space.
+"""
+import os
+import shutil
+import subprocess
+
+# A real copy, not symlinks: writes through a link into /src would fail with EROFS
+MOUNT_SCRIPT = 'cp -a /src/. /work/ && exec "$@"'
+
+
+def host_path(path: str, workdir: str, host_workdir: str | None) -> str:
+    """
+    Map a path under the API's WORKDIR to the same path as the docker daemon
+    sees it (the API itself runs in a container with /repair_data mounted).
+    """
+    if not host_workdir:
+        return path
+    rel = os.path.relpath(path, workdir)
+    return os.path.join(host_workdir, rel)
+
+
+def link_tree(src: str, dst: str, skip=("upload.zip",)) -> None:
+    """Recreate src at dst with hard links, falling back to copies across devices."""
+    for root, dirs, files in os.walk(src):
+        rel_root = os.path.relpath(root, src)
+        target_root = os.path.normpath(os.path.join(dst, rel_root))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            if name in skip:
+                continue
+            source = os.path.join(root, name)
+            target = os.path.join(target_root, name)
+            try:
+                os.link(source, target)
+            except OSError:
+                shutil.copy2(source, target)
+
+
+def mounted_run_command(image: str, src: str, argv: list, tmpfs_size: str = "256m") -> list:
+    """docker run command executing argv against a read-only mount of src."""
+    return [
+        "docker", "run", "--rm",
+        "--network", "none",
+        "-v", f"{src}:/src:ro",
+        "--tmpfs", f"/work:rw,exec,size={tmpfs_size}",
+        "-w", "/work",
+        "-e", "PYTHONDONTWRITEBYTECODE=1",
+        image,
+        "sh", "-c", MOUNT_SCRIPT, "sh",
+    ] + list(argv)
+
+
+def run_mounted(image: str, src: str, argv: list):
+    """Run argv in a one-off container with src mounted -> (returncode, stdout, stderr)."""
+    proc = subprocess.run(
+        mounted_run_command(image, src, argv),
+        capture_output=True,
+        text=True
+    )
+    return proc.returncode, proc.stdout, proc.stderr
@@ -0,0 +1,28 @@
+import time
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Tests fake the runners and the LLM with different results for identical inputs
+    from app.server import EXEC_CACHE, LLM_CACHE
+    EXEC_CACHE.clear()
+    LLM_CACHE.clear()
+    yield
+    EXEC_CACHE.clear()
+    LLM_CACHE.clear()
+
+
+@pytest.fixture
+def wait_for_job():
+    """Poll GET /jobs/{id} until the repair job has succeeded or failed."""
+    def wait(client, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = client.get(f"/jobs/{job_id}").json()
+            if job["status"] in ("succeeded", "failed"):
+                return job
+            time.sleep(0.01)
+        raise AssertionError(f"job {job_id} did not finish")
+    return wait
@@ -0,0 +1,70 @@
+import json
+from argparse import Namespace
+
+import app.server as server
+from bench import bench_e2e, bench_extract, compare, main, percentiles
+from fakes import Catalog, FakeLLM, FakeRunner
+from workloads import example_projects, generated_project
+
+
+def settings(**overrides):
+    defaults = dict(workloads=["examples", "large"], clients=[1, 3], requests=7, modules=3, functions=2,
+                    llm_latency=0.0, llm_tokens_per_second=0.0, llm_misses=0, run_latency=0.0,
+                    poll=0.005, timeout=10.0, url=None)
+    return Namespace(**{**defaults, **overrides})
+
+
+def test_fakes_follow_the_project_marker(tmp_path):
+    catalog = Catalog()
+    project = generated_project("big", modules=2, functions=1).renamed("big-7")
+    catalog.add(project)
+    for path, text in project.files.items():
+        (tmp_path / "run" / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / "run" / path).write_text(text)
+    runner = FakeRunner(catalog, str(tmp_path))
+    assert runner("run", "main.py") == project.failure
+
+    llm = FakeLLM(catalog, misses=1)
+    prompt = "fix this\n" + project.files["main.py"]
+    assert "# attempt 1" in json.loads(llm(prompt, format="json"))["main.py"]
+    fixed = json.loads(llm(prompt, format="json"))["main.py"]
+    (tmp_path / "run" / "main.py").write_text(fixed)
+    assert runner("run", "main.py") == (0, "checksum ok\n", "")
+
+
+def test_every_workload_is_repaired_in_process():
+    results = bench_e2e(settings(), server)
+    assert set(results) == {"e2e.examples.c1", "e2e.examples.c3", "e2e.large.c1", "e2e.large.c3"}
+    for summary in results.values():
+        assert summary["succeeded"] == 7 and summary["failed"] == 0
+        assert summary["latency_seconds"]["p50"] <= summary["latency_seconds"]["p99"]
+        assert "sandbox.run" in summary["stages"]
+    # The working example needs no LLM; every other project one answer
+    examples = results["e2e.examples.c1"]
+    assert examples["llm_calls"] <= 7 - 1
+
+    misses = bench_e2e(settings(workloads=["large"], clients=[2], requests=2, llm_misses=1), server)
+    assert misses["e2e.large.c2"]["iterations_mean"] == 2
+
+
+def test_corpus_covers_the_examples():
+    names = {p.name for p in example_projects()}
+    assert {"syntax_error", "division_error", "working_example"} <= names
+    assert bench_extract([(5, 100)], repeats=1)["extract.5x100"]["files"] == 5
+
+
+def test_compare_flags_regressions(tmp_path, capsys):
+    assert percentiles([3, 1, 2, 4]) == {"p50": 2, "p90": 4, "p99": 4, "max": 4, "mean": 2.5}
+
+    baseline = {"results": {"e2e.x.c1": {"latency_seconds": {"p50": 0.5}, "throughput_per_second": 10.0,
+                                         "failed": 0, "requests": 8}}}
+    current = {"results": {"e2e.x.c1": {"latency_seconds": {"p50": 0.8}, "throughput_per_second": 9.0,
+                                        "failed": 0, "requests": 8}}}
+    changes = {metric: regressed for metric, _, _, regressed in compare(baseline, current)}
+    assert changes == {"e2e.x.c1.latency_seconds.p50": True, "e2e.x.c1.throughput_per_second": False}
+
+    (tmp_path / "a.json").write_text(json.dumps(baseline))
+    (tmp_path / "b.json").write_text(json.dumps(current))
+    assert main(["compare", str(tmp_path / "a.json"), str(tmp_path / "b.json")]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+    assert main(["compare", str(tmp_path / "a.json"), str(tmp_path / "a.json")]) == 0
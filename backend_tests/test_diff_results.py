@@ -0,0 +1,59 @@
+import json
+
+from fastapi.testclient import TestClient
+from app.server import app
+
+
+def setup_project(monkeypatch, tmp_path):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("from util import f\nprint(f())\n")
+    (run_dir / "util.py").write_text("def f():\n    return 1/0\n")
+    for i in range(20):
+        (run_dir / f"untouched{i}.py").write_text("# filler\n" * 200)
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+
+    fix = {"util.py": "def f():\n    return 1\n"}
+    monkeypatch.setattr("app.server.call_llm", lambda *a, **k: json.dumps(fix))
+
+    def run_python(run_id, entry):
+        code = (tmp_path / run_id / "util.py").read_text()
+        return (0, "1\n", "") if "1/0" not in code else (1, "", "ZeroDivisionError")
+
+    monkeypatch.setattr("app.server.run_python", run_python)
+    return run_dir
+
+
+def test_diff_mode_returns_only_changed_files(monkeypatch, tmp_path, wait_for_job):
+    setup_project(monkeypatch, tmp_path)
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={"language": "python", "entry_file": "main.py", "response_mode": "diff"})
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+
+    assert result["status"] == "success"
+    assert "fixed_code" not in result and "original_code" not in result
+    assert list(result["changes"]) == ["util.py"]
+    assert "-    return 1/0\n+    return 1\n" in result["changes"]["util.py"]
+    assert len(result["unchanged"]) == 21
+
+    # Full contents on demand, before and after the fix
+    fixed = client.get("/runs/proj/files", params={"path": "util.py"}).json()
+    original = client.get("/runs/proj/files", params={"path": "util.py", "version": "original"}).json()
+    assert fixed["content"] == "def f():\n    return 1\n"
+    assert original["content"] == "def f():\n    return 1/0\n"
+    assert client.get("/runs/proj/files").json()["util.py"]["changed"] is True
+    assert client.get("/runs/..%2F/files").status_code == 404
+
+
+def test_full_mode_is_gzipped_when_large(monkeypatch, tmp_path, wait_for_job):
+    setup_project(monkeypatch, tmp_path)
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={"language": "python", "entry_file": "main.py"})
+    job_id = resp.json()["job_id"]
+    wait_for_job(client, job_id)
+
+    resp = client.get(f"/jobs/{job_id}", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert len(resp.json()["result"]["fixed_code"]) == 22
@@ -0,0 +1,64 @@
+import time
+
+from app.exec_cache import ExecutionCache, execution_key, tree_digest
+
+
+def test_tree_digest_changes_with_content_and_ignores_upload_zip(tmp_path):
+    (tmp_path / "main.py").write_text("print(1)")
+    before = tree_digest(str(tmp_path))
+
+    (tmp_path / "upload.zip").write_bytes(b"PK")
+    assert tree_digest(str(tmp_path)) == before
+
+    (tmp_path / "main.py").write_text("print(2)")
+    assert tree_digest(str(tmp_path)) != before
+
+
+def test_lru_eviction_and_ttl():
+    cache = ExecutionCache(max_entries=2, ttl=60)
+    cache.put("a", (0, "a", ""))
+    cache.put("b", (0, "b", ""))
+    cache.get("a")
+    cache.put("c", (0, "c", ""))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == (0, "a", "")
+    assert cache.stats()["evictions"] == 1
+
+    expired = ExecutionCache(ttl=0)
+    expired.put("a", (0, "", ""))
+    time.sleep(0.01)
+    assert expired.get("a") is None
+
+
+def test_disk_backend_survives_new_instance(tmp_path):
+    key = execution_key("python", "main.py", "files", "sha256:img")
+    ExecutionCache(disk_dir=str(tmp_path)).put(key, (1, "", "Traceback"))
+
+    fresh = ExecutionCache(disk_dir=str(tmp_path))
+    assert fresh.get(key) == (1, "", "Traceback")
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_run_program_serves_identical_tree_from_cache(monkeypatch, tmp_path):
+    run_dir = tmp_path / "abc"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("print('hi')")
+    calls = []
+
+    def fake_run_python(run_id, entry):
+        calls.append(entry)
+        return 0, "hi\n", ""
+
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.image_digest", lambda image: "sha256:runner")
+    monkeypatch.setattr("app.server.run_python", fake_run_python)
+
+    from app.server import run_program
+    assert run_program("python", "abc", "main.py") == (0, "hi\n", "")
+    assert run_program("python", "abc", "main.py") == (0, "hi\n", "")
+    assert len(calls) == 1
+
+    (run_dir / "main.py").write_text("print('changed')")
+    run_program("python", "abc", "main.py")
+    assert len(calls) == 2
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.git_mirror import RepoMirrors
+
+
+def git(cwd, *args):
+    subprocess.run(["git", "-C", str(cwd), *args], check=True, capture_output=True)
+
+
+@pytest.fixture
+def origin(tmp_path):
+    repo = tmp_path / "origin" / "demo"
+    (repo / "src").mkdir(parents=True)
+    (repo / "src" / "main.py").write_text("print('hi')\n")
+    (repo / "src" / "util.py").write_text("X = 1\n")
+    (repo / "App.java").write_text("class App {}\n")
+    (repo / "logo.png").write_bytes(b"\x89PNG\x00\xff\xfe")
+    git(repo, "init", "-q", "-b", "main")
+    git(repo, "-c", "user.email=t@t", "-c", "user.name=t", "add", ".")
+    git(repo, "-c", "user.email=t@t", "-c", "user.name=t", "commit", "-q", "-m", "init")
+    return repo
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    from app.server import app
+    mirrors = RepoMirrors(str(tmp_path / "cache"), refresh=0)
+    monkeypatch.setattr("app.server.REPO_MIRRORS", mirrors)
+    monkeypatch.setattr("app.server.GITHUB_URL_PREFIXES", ("file://",))
+    return TestClient(app), mirrors
+
+
+def test_clone_is_served_from_mirror_and_refetched_incrementally(client, origin):
+    client, mirrors = client
+    url = f"file://{origin}"
+
+    first = client.post("/github-clone", json={"url": url}).json()
+    assert sorted(f["path"] for f in first["files"]) == ["App.java", "src/main.py", "src/util.py"]
+    assert first["detected_language"] == "python"
+    assert mirrors.clones == 1
+
+    # Same commit: fetch finds nothing new and the checkout is reused
+    second = client.post("/github-clone", json={"url": url}).json()
+    assert second["commit"] == first["commit"]
+    assert mirrors.clones == 1 and mirrors.fetches == 1 and mirrors.checkout_hits == 1
+
+    (origin / "src" / "util.py").write_text("X = 2\n")
+    git(origin, "-c", "user.email=t@t", "-c", "user.name=t", "commit", "-qam", "change")
+    third = client.post("/github-clone", json={"url": url}).json()
+    assert third["commit"] != first["commit"]
+    assert {f["path"]: f["content"] for f in third["files"]}["src/util.py"] == "X = 2\n"
+    assert mirrors.clones == 1
+
+
+def test_language_filter_pagination_and_lazy_contents(client, origin):
+    client, _ = client
+    resp = client.post("/github-clone", json={
+        "url": f"file://{origin}", "language": "python",
+        "page": 2, "page_size": 1, "include_content": False,
+    }).json()
+
+    assert resp["total_files"] == 2 and resp["total_pages"] == 2
+    assert resp["files"] == [{"name": "util.py", "path": "src/util.py", "content": None, "size": 6}]
+    # Language detection still sees the whole tree
+    assert resp["detected_language"] == "python"
+
+    content = client.get(f"/github-clone/{resp['repo_id']}/files", params={"path": "src/util.py"}).json()
+    assert content["content"] == "X = 1\n"
+    assert client.get(f"/github-clone/{resp['repo_id']}/files", params={"path": "App.java"}).status_code == 404
+    assert client.get(f"/github-clone/{resp['repo_id']}/files", params={"path": "../x"}).status_code == 400
+
+
+def test_rejects_non_github_urls():
+    from app.server import app
+    resp = TestClient(app).post("/github-clone", json={"url": "https://example.com/a/b"})
+    assert resp.status_code == 400
+
+
+def test_eviction_waits_for_readers_and_forgets_locks(tmp_path, origin):
+    mirrors = RepoMirrors(str(tmp_path / "cache"), max_checkouts=1)
+    mirror, commit = mirrors.sync(f"file://{origin}")
+    python_only = os.path.basename(mirrors.checkout(mirror, commit, ["*.py"]))
+
+    with mirrors.reading(python_only) as checkout:
+        # A second checkout pushes the first one out of the cache, but not mid-read
+        other = threading.Thread(target=mirrors.checkout, args=(mirror, commit, ["*.java"]))
+        other.start()
+        other.join(0.3)
+        assert other.is_alive()
+        assert os.listdir(os.path.join(checkout, "src")) != []
+
+    other.join(5)
+    with mirrors.reading(python_only) as checkout:
+        assert checkout is None
+    assert mirrors._locks == {}
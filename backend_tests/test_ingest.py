@@ -0,0 +1,46 @@
+from app.ingest import GitIgnore, ingest_tree, looks_binary
+
+
+def test_looks_binary_sniffs_prefix():
+    assert not looks_binary("héllo wörld\n".encode())
+    # A multi-byte character cut at the sniff boundary is still text
+    assert not looks_binary("abcé".encode()[:-1])
+    assert looks_binary(b"\x89PNG\r\n\x1a\n\x00\x00")
+    assert looks_binary(b"\xff\xfe\xfd")
+    assert not looks_binary(b"")
+
+
+def test_gitignore_rules(tmp_path):
+    (tmp_path / ".gitignore").write_text("*.log\n/build/\n!keep.log\ndocs/**/*.tmp\n")
+    ignore = GitIgnore().extend("", str(tmp_path / ".gitignore"))
+
+    assert ignore.ignored("a/b/debug.log", is_dir=False)
+    assert not ignore.ignored("keep.log", is_dir=False)
+    assert ignore.ignored("build", is_dir=True)
+    assert not ignore.ignored("src/build", is_dir=True)
+    assert ignore.ignored("docs/x/y/z.tmp", is_dir=False)
+    assert not ignore.ignored("z.tmp", is_dir=False)
+
+
+def test_ingest_tree_single_pass(tmp_path):
+    (tmp_path / "pkg").mkdir()
+    (tmp_path / "out").mkdir()
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / ".gitignore").write_text("out/\n")
+    (tmp_path / "pkg" / ".gitignore").write_text("secret.py\n")
+    (tmp_path / "main.py").write_text("print(1)\n")
+    (tmp_path / "pkg" / "util.py").write_text("X = 1\n")
+    (tmp_path / "pkg" / "secret.py").write_text("KEY = 1\n")
+    (tmp_path / "out" / "gen.py").write_text("")
+    (tmp_path / "node_modules" / "x.js").write_text("")
+    (tmp_path / "img.png").write_bytes(b"\x89PNG\x00" * 10)
+    (tmp_path / "huge.txt").write_text("x" * 200)
+
+    result = ingest_tree(str(tmp_path), ignore_dirs={"node_modules"}, ignore_patterns={".gitignore"}, max_size=100)
+
+    assert [(f.path, f.content) for f in result.files] == [("main.py", "print(1)\n"), ("pkg/util.py", "X = 1\n")]
+    assert result.skipped == {"pkg/secret.py": "gitignored", "img.png": "binary", "huge.txt": "too large"}
+    assert result.extension_counts == {".py": 2, ".png": 1, ".txt": 1}
+
+    listed = ingest_tree(str(tmp_path), read_content=False)
+    assert all(f.content is None for f in listed.files)
@@ -0,0 +1,202 @@
+import re
+
+from app.java_engine import JavaSession, main_class_name
+
+
+class FakeDocker:
+    """Records docker invocations; javac fails on sources containing BROKEN."""
+
+    def __init__(self, host_dir, compile_server=True, run=(0, "hello\n", "")):
+        self.host_dir = host_dir
+        self.compile_server = compile_server
+        self.run = run
+        self.calls = []
+        self.compiled = []
+        self.classes = set()
+
+    def _pulled_in(self, sources):
+        """sources plus the project sources they mention, as -sourcepath would find them."""
+        found, todo = set(sources), list(sources)
+        while todo:
+            text = (self.host_dir / todo.pop()).read_text()
+            for path in self.host_dir.glob("*.java"):
+                if path.name not in found and re.search(rf"\b{path.stem}\b", text):
+                    found.add(path.name)
+                    todo.append(path.name)
+        return found
+
+    def __call__(self, args):
+        self.calls.append(args)
+        if args[:2] == ["exec", "-w"] and ("javac" in args or "bash" in args):
+            sources = [a[len("/work/"):] for a in args if a.startswith("/work/")]
+            self.compiled.append(sorted(sources))
+            built = self._pulled_in(sources)
+            broken = sorted(s for s in built if "BROKEN" in (self.host_dir / s).read_text())
+            if broken:
+                diagnostics = f"{broken[0]}:1: error: ';' expected\n"
+                return (0, f"1\n{diagnostics}", "") if "bash" in args else (1, "", diagnostics)
+            self.classes |= {s[:-len(".java")] for s in built}
+            return (0, "0\n", "") if "bash" in args else (0, "", "")
+        if args[:1] == ["exec"] and "java" in args and "-cp" in args and "/classes:/work" in args:
+            return self.run
+        if "find" in args and "/classes" in args:
+            return 0, "".join(f"/classes/{c}.class\n" for c in sorted(self.classes)), ""
+        if "rm -rf /classes && mkdir -p /classes" in args:
+            self.classes = set()
+        if args[:3] == ["exec", args[1], "test"]:
+            return (0, "", "") if self.compile_server else (1, "", "")
+        return 0, "", ""
+
+
+def make_project(tmp_path):
+    (tmp_path / "Main.java").write_text("public class Main { void f() { Util.go(); } }")
+    (tmp_path / "Util.java").write_text("public class Util { static void go() {} }")
+    (tmp_path / "Other.java").write_text("public class Other {}")
+    return tmp_path
+
+
+def test_only_changed_sources_and_their_dependents_are_recompiled(tmp_path):
+    project = make_project(tmp_path)
+    docker = FakeDocker(project)
+    session = JavaSession(str(project), docker=docker)
+
+    assert session.run("Main.java") == (0, "hello\n", "")
+    # Like `javac Main.java`: Util is pulled in through -sourcepath, Other is never built
+    assert docker.compiled == [["Main.java"]]
+    assert set(session.compiled) == {"Main.java", "Util.java"}
+
+    # Nothing changed: no compilation, no copies
+    copies_before = sum(1 for c in docker.calls if c[0] == "cp")
+    session.run("Main.java")
+    assert len(docker.compiled) == 1
+    assert sum(1 for c in docker.calls if c[0] == "cp") == copies_before
+
+    # Util changed: Main mentions Util and is rebuilt too; Other isn't part of the build
+    (project / "Util.java").write_text("public class Util { static void go(int x) {} }")
+    (project / "Other.java").write_text("public class Other { BROKEN }")
+    assert session.run("Main.java")[0] == 0
+    assert docker.compiled[-1] == ["Main.java", "Util.java"]
+    assert ["cp", str(project / "Util.java"), f"{session.name}:/work/Util.java"] in docker.calls
+
+    assert len(session.timings) == 3
+    assert [t["compiled_files"] for t in session.timings] == [1, 0, 2]
+
+
+def test_compile_error_returns_diagnostics_and_retries_file(tmp_path):
+    project = make_project(tmp_path)
+    (project / "Util.java").write_text("BROKEN Util")
+    docker = FakeDocker(project)
+    session = JavaSession(str(project), docker=docker)
+
+    ret, out, err = session.run("Main.java")
+    assert ret == 1
+    assert "Util.java:1: error: ';' expected" in err
+    assert session.timings[0]["run_seconds"] is None
+
+    # Nothing was recorded as compiled, so the next run rebuilds from the entry
+    (project / "Util.java").write_text("public class Util { static void go() {} }")
+    assert session.run("Main.java")[0] == 0
+    assert docker.compiled[-1] == ["Main.java"]
+
+
+def test_unrelated_broken_source_does_not_fail_the_build(tmp_path):
+    project = make_project(tmp_path)
+    (project / "Other.java").write_text("BROKEN")
+    session = JavaSession(str(project), docker=FakeDocker(project))
+    assert session.run("Main.java") == (0, "hello\n", "")
+
+
+def test_run_is_killed_after_the_timeout(tmp_path):
+    project = make_project(tmp_path)
+    docker = FakeDocker(project, run=(124, "partial\n", ""))
+    session = JavaSession(str(project), docker=docker, run_timeout=5)
+
+    assert session.run("Main.java") == (124, "partial\n", "\nTimed out after 5s\n")
+    [run] = [c for c in docker.calls if "/classes:/work" in c]
+    assert run[4:8] == ["timeout", "-k", "2", "5"]
+
+
+def test_deleted_source_forces_clean_rebuild(tmp_path):
+    project = make_project(tmp_path)
+    docker = FakeDocker(project)
+    session = JavaSession(str(project), docker=docker)
+    session.run("Main.java")
+
+    # Removing a source of the build starts over from the entry
+    (project / "Main.java").write_text("public class Main {}")
+    (project / "Util.java").unlink()
+    session.run("Main.java")
+
+    assert ["exec", session.name, "rm", "-f", "/work/Util.java"] in docker.calls
+    assert docker.compiled[-1] == ["Main.java"]
+    assert set(session.compiled) == {"Main.java"}
+
+
+def test_falls_back_to_javac_without_compile_server(tmp_path):
+    project = make_project(tmp_path)
+    docker = FakeDocker(project, compile_server=False)
+    session = JavaSession(str(project), docker=docker)
+
+    assert session.run("Main.java")[0] == 0
+    assert any("javac" in c for c in docker.calls)
+    assert not any(c[:2] == ["exec", "-d"] for c in docker.calls)
+
+    session.close()
+    assert docker.calls[-1] == ["rm", "-f", session.name]
+
+
+def test_main_class_name_uses_package():
+    assert main_class_name("package com.acme;\npublic class App {}", "src/App.java") == "com.acme.App"
+    assert main_class_name("public class App {}", "App.java") == "App"
+
+
+def test_repair_result_reports_java_timings(monkeypatch, tmp_path, wait_for_job):
+    from fastapi.testclient import TestClient
+    from app import server
+
+    run_dir = tmp_path / "jrun"
+    run_dir.mkdir()
+    (run_dir / "Main.java").write_text("public class Main {}")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.JAVA_ENGINE", "session")
+    monkeypatch.setattr("app.server.image_digest", lambda image: None)
+
+    sessions = []
+
+    def fake_open_session(run_id, host_dir, run_timeout=None):
+        session = JavaSession(host_dir, docker=FakeDocker(run_dir))
+        sessions.append(session)
+        monkeypatch.setattr("app.server.get_session", lambda rid: session if rid == run_id else None)
+        return session
+
+    monkeypatch.setattr("app.server.open_session", fake_open_session)
+    monkeypatch.setattr("app.server.close_session", lambda run_id: sessions[0].close())
+
+    client = TestClient(server.app)
+    resp = client.post("/repair/jrun", json={"language": "java", "expected_output": "hello"})
+    job = wait_for_job(client, resp.json()["job_id"])
+
+    assert job["status"] == "succeeded"
+    timings = job["result"]["timings"]
+    assert len(timings) == 1
+    assert timings[0]["compiled_files"] == 1
+    assert not sessions[0].started
+
+
+def test_one_off_runner_is_killed_after_the_timeout(monkeypatch):
+    import subprocess
+    from app.server import start_attached
+
+    commands = []
+
+    def fake_run(cmd, **kwargs):
+        commands.append(cmd)
+        if cmd[:2] == ["docker", "start"]:
+            raise subprocess.TimeoutExpired(cmd, kwargs["timeout"], output=b"partial\n")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr("app.server.RUN_TIMEOUT", 2.0)
+    monkeypatch.setattr("subprocess.run", fake_run)
+
+    assert start_attached("java_runner_x") == (124, "partial\n", "Timed out after 2s\n")
+    assert commands[-1] == ["docker", "kill", "java_runner_x"]
@@ -0,0 +1,126 @@
+import threading
+
+import pytest
+from app.job_queue import JobQueue, QueueFull
+
+
+def test_job_runs_in_background_and_records_result():
+    jobs = JobQueue(workers=1)
+    job = jobs.submit(lambda a, b: a + b, 2, b=3)
+
+    done = jobs.wait(job.id, timeout=5)
+
+    assert done.status == "succeeded"
+    assert done.result == 5
+    assert done.to_dict()["run_seconds"] >= 0
+
+
+def test_failed_job_keeps_error_and_status_code():
+    class Boom(Exception):
+        status_code = 500
+        detail = "LLM output is not valid JSON"
+
+    def fail():
+        raise Boom()
+
+    jobs = JobQueue(workers=1)
+    done = jobs.wait(jobs.submit(fail).id, timeout=5)
+
+    assert done.status == "failed"
+    assert done.error == "LLM output is not valid JSON"
+    assert done.error_status == 500
+    assert jobs.stats()["failed"] == 1
+
+
+def test_concurrency_is_bounded_and_queue_depth_reported():
+    release = threading.Event()
+    running = []
+
+    def block():
+        running.append(1)
+        release.wait(5)
+
+    jobs = JobQueue(workers=2, max_queue=10)
+    submitted = [jobs.submit(block) for _ in range(4)]
+
+    while len(running) < 2:
+        pass
+    stats = jobs.stats()
+    assert stats["running"] == 2
+    assert stats["queue_depth"] == 2
+
+    release.set()
+    for job in submitted:
+        assert jobs.wait(job.id, timeout=5).status == "succeeded"
+    assert jobs.stats()["wait_seconds"]["count"] == 4
+
+
+def test_submit_rejected_when_queue_full():
+    release = threading.Event()
+    jobs = JobQueue(workers=1, max_queue=1)
+    first = jobs.submit(release.wait, 5)
+    while jobs.get(first.id).status != "running":
+        pass
+    jobs.submit(release.wait, 5)
+
+    with pytest.raises(QueueFull):
+        jobs.submit(release.wait, 5)
+    assert jobs.stats()["rejected"] == 1
+    release.set()
+
+
+def test_cancel_queued_job_never_runs():
+    release = threading.Event()
+    ran = []
+    jobs = JobQueue(workers=1)
+    jobs.submit(release.wait, 5)
+    queued = jobs.submit(lambda: ran.append(1))
+
+    assert jobs.cancel(queued.id).status == "cancelled"
+    release.set()
+    jobs.wait(jobs.submit(lambda: None).id, timeout=5)
+
+    assert ran == []
+    assert jobs.stats()["cancelled"] == 1
+
+
+def test_cancelled_jobs_free_their_place_in_the_queue():
+    release = threading.Event()
+    jobs = JobQueue(workers=1, max_queue=1)
+    first = jobs.submit(release.wait, 5)
+    while jobs.get(first.id).status != "running":
+        pass
+    jobs.cancel(jobs.submit(release.wait, 5).id)
+
+    assert jobs.stats()["queue_depth"] == 0
+    # Not rejected: the cancelled job is still in the FIFO but no longer waiting
+    last = jobs.submit(lambda: "done")
+    assert jobs.stats()["queue_depth"] == 1
+    release.set()
+    assert jobs.wait(last.id, timeout=5).result == "done"
+    assert jobs.stats()["queue_depth"] == 0
+
+
+def test_running_job_emits_events_and_stops_on_cancel():
+    from app.job_queue import current_job
+
+    started = threading.Event()
+    proceed = threading.Event()
+
+    def work():
+        job = current_job()
+        job.emit("iteration_start", {"attempt": 1})
+        started.set()
+        proceed.wait(5)
+        job.check_cancelled()
+        job.emit("iteration_start", {"attempt": 2})
+
+    jobs = JobQueue(workers=1)
+    job = jobs.submit(work)
+    assert started.wait(5)
+    jobs.cancel(job.id)
+    proceed.set()
+
+    done = jobs.wait(job.id, timeout=5)
+    assert done.status == "cancelled"
+    assert [e["data"]["attempt"] for e in done.events] == [1]
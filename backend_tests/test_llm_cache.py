@@ -0,0 +1,124 @@
+import threading
+
+from app.llm_cache import LLMCache, llm_cache_key
+
+
+def test_key_depends_on_model_options_format_and_prompt():
+    base = llm_cache_key("codellama:7b-instruct", "fix this", {"num_ctx": 2048}, None)
+    assert base == llm_cache_key("codellama:7b-instruct", "fix this", {"num_ctx": 2048}, None)
+    assert base != llm_cache_key("codellama:13b-instruct", "fix this", {"num_ctx": 2048}, None)
+    assert base != llm_cache_key("codellama:7b-instruct", "fix this", {"num_ctx": 4096}, None)
+    assert base != llm_cache_key("codellama:7b-instruct", "fix this", {"num_ctx": 2048}, "json")
+    assert base != llm_cache_key("codellama:7b-instruct", "fix that", {"num_ctx": 2048}, None)
+
+
+def test_memory_hit_and_bypass():
+    cache = LLMCache(max_entries=4)
+    answers = iter(["first", "second"])
+
+    assert cache.get_or_generate("k", lambda: next(answers)) == "first"
+    assert cache.get_or_generate("k", lambda: next(answers)) == "first"
+    assert cache.get_or_generate("k", lambda: next(answers), bypass=True) == "second"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bypassed"] == 1
+
+
+def test_sqlite_tier_persists(tmp_path):
+    db = str(tmp_path / "llm.sqlite3")
+    LLMCache(max_entries=4, db_path=db).put("k", "cached answer")
+
+    fresh = LLMCache(max_entries=4, db_path=db)
+    assert fresh.get("k") == "cached answer"
+    assert fresh.stats()["disk_hits"] == 1
+
+
+def test_concurrent_identical_prompts_generate_once():
+    cache = LLMCache(max_entries=4)
+    release = threading.Event()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_generate("k", generate)))
+               for _ in range(3)]
+    for t in threads:
+        t.start()
+    while cache.stats()["deduplicated"] < 2:
+        pass
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert results == ["answer"] * 3
+    assert len(calls) == 1
+
+
+def test_call_llm_uses_cache(monkeypatch):
+    import llm_client
+
+    prompts = []
+
+    class FakeClient:
+        model = "codellama:7b-instruct"
+
+        def generate(self, prompt, format=None, options=None):
+            prompts.append(prompt)
+            return llm_client.GenerationResult(text="print('ok')")
+
+    monkeypatch.setattr(llm_client, "get_client", lambda: FakeClient())
+    monkeypatch.setattr(llm_client, "LLM_CACHE", LLMCache(max_entries=4))
+
+    assert llm_client.call_llm("prompt") == "print('ok')"
+    assert llm_client.call_llm("prompt") == "print('ok')"
+    assert llm_client.call_llm("prompt", use_cache=False) == "print('ok')"
+    assert len(prompts) == 2
+
+
+def test_cancelled_caller_stops_waiting_for_identical_prompt(monkeypatch):
+    import llm_client
+
+    entered = threading.Event()
+    release = threading.Event()
+
+    class SlowClient:
+        model = "codellama:7b-instruct"
+
+        def generate(self, prompt, format=None, options=None, cancel=None):
+            entered.set()
+            release.wait(5)
+            return llm_client.GenerationResult(text="print('ok')")
+
+    monkeypatch.setattr(llm_client, "get_client", lambda: SlowClient())
+    monkeypatch.setattr(llm_client, "LLM_CACHE", LLMCache(max_entries=4))
+
+    first = threading.Thread(target=llm_client.call_llm, args=("prompt",))
+    first.start()
+    assert entered.wait(5)
+
+    cancel = threading.Event()
+    errors = []
+
+    def waiter():
+        try:
+            llm_client.call_llm("prompt", cancel=cancel)
+        except llm_client.LLMCancelled as e:
+            errors.append(e)
+
+    second = threading.Thread(target=waiter)
+    second.start()
+    while llm_client.LLM_CACHE.stats()["deduplicated"] < 1:
+        pass
+    cancel.set()
+    second.join(2)
+
+    # The waiter gave up while the first generation is still running
+    assert len(errors) == 1 and first.is_alive()
+    release.set()
+    first.join(5)
@@ -0,0 +1,162 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from app.llm_client import AsyncOllamaClient, LLMError, OllamaClient, answer_is_complete
+
+
+class OllamaStub:
+    """
+    Tiny /api/generate server streaming scripted NDJSON chunks. Once the
+    scripts run out every request gets `default`; `delay` holds each answer
+    back and `healthy` decides what /api/tags returns.
+    """
+
+    def __init__(self, scripts, default=None, delay=0.0):
+        self.scripts = list(scripts)
+        self.default = default
+        self.delay = delay
+        self.healthy = True
+        self.requests = []
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.send_response(200 if stub.healthy else 503)
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"{}")
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                with stub.lock:
+                    stub.requests.append(json.loads(body))
+                    status, chunks = stub.scripts.pop(0) if stub.scripts else stub.default
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                try:
+                    time.sleep(stub.delay)
+                    self.answer(status, chunks)
+                finally:
+                    with stub.lock:
+                        stub.active -= 1
+
+            def answer(self, status, chunks):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                try:
+                    for chunk in chunks:
+                        data = (json.dumps(chunk) + "\n").encode()
+                        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                        self.wfile.flush()
+                    self.wfile.write(b"0\r\n\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+
+
+def tokens(*parts, done=True):
+    chunks = [{"response": p, "done": False} for p in parts]
+    if done:
+        chunks.append({"response": "", "done": True, "eval_count": len(parts)})
+    return chunks
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def make(*scripts, **kwargs):
+        server = OllamaStub(scripts, **kwargs)
+        servers.append(server)
+        return server
+
+    yield make
+    for server in servers:
+        server.close()
+
+
+def test_streams_tokens_and_keeps_final_stats(stub):
+    server = stub((200, tokens("print(", "'hi')")))
+    client = OllamaClient(base_url=server.url)
+
+    result = client.generate("fix it")
+
+    assert result.text == "print('hi')"
+    assert result.stats["eval_count"] == 2
+    assert not result.stopped_early
+    assert server.requests[0]["stream"] is True
+    assert server.requests[0]["options"]["num_ctx"] == 2048
+
+
+def test_stops_after_closing_fence(stub):
+    server = stub((200, tokens("```python\n", "print(1)\n", "```", "\nThis fixes", " the bug.", done=False)))
+    result = OllamaClient(base_url=server.url).generate("fix it")
+
+    assert result.stopped_early
+    assert result.text == "```python\nprint(1)\n```"
+
+
+def test_stops_after_complete_json_object(stub):
+    server = stub((200, tokens('{"main.py": "x = {', '}"}', "\n\n\n", "\n", done=False)))
+    result = OllamaClient(base_url=server.url).generate("fix it", format="json")
+
+    assert result.stopped_early
+    assert json.loads(result.text) == {"main.py": "x = {}"}
+
+
+def test_retries_server_errors_then_gives_up(stub):
+    server = stub((503, []), (200, tokens("ok")))
+    client = OllamaClient(base_url=server.url, backoff=0)
+    assert client.generate("p").text == "ok"
+    assert len(server.requests) == 2
+
+    failing = stub((500, []), (500, []))
+    with pytest.raises(LLMError):
+        OllamaClient(base_url=failing.url, retries=1, backoff=0).generate("p")
+
+
+def test_error_chunk_raises(stub):
+    server = stub((200, [{"error": "model 'x' not found"}]))
+    with pytest.raises(LLMError, match="not found"):
+        OllamaClient(base_url=server.url, backoff=0).generate("p")
+    assert len(server.requests) == 1
+
+
+def test_async_client_stops_early(stub):
+    server = stub((200, tokens("```\n", "x = 1\n", "```", " trailing", done=False)))
+
+    async def run():
+        client = AsyncOllamaClient(base_url=server.url)
+        try:
+            return await client.generate("fix it")
+        finally:
+            await client.aclose()
+
+    result = asyncio.run(run())
+    assert result.stopped_early
+    assert result.text == "```\nx = 1\n```"
+
+
+def test_answer_is_complete_ignores_braces_in_strings():
+    assert not answer_is_complete('{"a.py": "print(\\"}\\")"', "json")
+    assert answer_is_complete('{"a.py": "print(\\"}\\")"}', "json")
+    assert not answer_is_complete("```python\nprint(1)\n", None)
@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+# The gateway's own (flat) llm_client, so exceptions match
+from app.llm_gateway import (
+    CLOSED, HALF_OPEN, OPEN, Backend, GatewaySettings, LLMCancelled, LLMClientError, LLMError, LLMGateway,
+    OllamaClient, parse_backends,
+)
+from test_llm_client import stub, tokens  # noqa: F401  (fixture)
+
+OK = (200, tokens("ok"))
+
+
+@pytest.fixture
+def gateway():
+    gateways = []
+
+    def make(servers, limits=None, **settings):
+        limits = limits or [1] * len(servers)
+        backends = [
+            Backend(OllamaClient(base_url=s.url, retries=0, backoff=0), limit) for s, limit in zip(servers, limits)
+        ]
+        g = LLMGateway(backends, GatewaySettings(health_interval=0, **settings))
+        gateways.append(g)
+        return g
+
+    yield make
+    for g in gateways:
+        g.close()
+
+
+def run_concurrently(gateway, count):
+    results = []
+
+    def call():
+        results.append(gateway.generate("p").text)
+
+    threads = [threading.Thread(target=call) for _ in range(count)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_parse_backends():
+    assert parse_backends("http://a:11434*2, http://b:11434/", 4) == [("http://a:11434", 2), ("http://b:11434", 4)]
+
+
+def test_slots_limit_concurrency_per_backend(stub, gateway):
+    server = stub(default=OK, delay=0.1)
+    g = gateway([server], limits=[2])
+
+    assert run_concurrently(g, 6) == ["ok"] * 6
+    assert server.max_active == 2
+    assert g.stats()["backends"][0]["in_flight"] == 0
+
+
+def test_least_loaded_spreads_requests(stub, gateway):
+    a, b = stub(default=OK, delay=0.1), stub(default=OK, delay=0.1)
+    g = gateway([a, b])
+
+    run_concurrently(g, 4)
+    assert len(a.requests) == 2 and len(b.requests) == 2
+
+
+def test_fastest_routing_prefers_lower_latency(stub, gateway):
+    a, b = stub(default=OK), stub(default=OK)
+    g = gateway([a, b], routing="fastest")
+    g.backends[0].latency, g.backends[1].latency = 3.0, 1.0
+
+    g.generate("p")
+    assert len(b.requests) == 1 and not a.requests
+
+
+def test_failing_backend_is_skipped_until_healthy(stub, gateway):
+    broken, good = stub(default=(500, [])), stub(default=OK)
+    g = gateway([broken, good], breaker_failures=1, retries=1)
+    bad = g.backends[0]
+
+    assert g.generate("p").text == "ok"
+    assert bad.state == OPEN and len(broken.requests) == 1
+
+    # Open circuit: requests go straight to the healthy backend
+    g.generate("p")
+    assert len(broken.requests) == 1 and len(good.requests) == 2
+
+    # A health check lets it back in for one trial, which fails again
+    g.check_health()
+    assert bad.state == HALF_OPEN
+    assert g.generate("p").text == "ok"
+    assert bad.state == OPEN and len(broken.requests) == 2
+
+    broken.default = OK
+    g.check_health()
+    g.generate("p")
+    assert bad.state == CLOSED
+
+    down = stub(default=(500, []))
+    with pytest.raises(LLMError):
+        gateway([down], retries=1).generate("p")
+
+
+def test_rejected_request_does_not_trip_the_breaker(stub, gateway):
+    server = stub((404, [{"error": "model 'nope' not found"}]), (200, [{"error": "model 'nope' not found"}]),
+                  default=OK)
+    g = gateway([server], breaker_failures=1, retries=2)
+
+    for _ in range(2):
+        with pytest.raises(LLMClientError):
+            g.generate("p", model="nope")
+    # Not retried, and the backend stays in service
+    assert len(server.requests) == 2
+    assert g.backends[0].state == CLOSED and g.backends[0].failures == 0
+    assert g.generate("p").text == "ok"
+
+
+def test_cancelled_request_frees_its_slot(stub, gateway):
+    server = stub(default=OK)
+    g = gateway([server], breaker_failures=1)
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(LLMCancelled):
+        g.generate("p", cancel=cancel)
+    assert not server.requests
+    assert g.backends[0].in_flight == 0 and g.backends[0].state == CLOSED
+    assert g.generate("p").text == "ok"
+
+
+def test_hedged_request_takes_the_faster_answer(stub, gateway):
+    slow = stub(default=(200, tokens("slow")), delay=1.0)
+    fast = stub(default=(200, tokens("fast")))
+    g = gateway([slow, fast], hedge_after=0.1)
+
+    started = time.monotonic()
+    assert g.generate("p").text == "fast"
+    assert time.monotonic() - started < 0.8
+    stats = g.stats()
+    assert stats["hedged"] == 1 and stats["backends"][1]["hedges_won"] == 1
@@ -0,0 +1,80 @@
+import llm_client
+from fastapi.testclient import TestClient
+from app.server import app
+from app.llm_session import FOLLOW_UP, LLMSession
+from test_llm_client import stub, tokens  # noqa: F401  (fixture)
+from test_llm_gateway import OK, gateway  # noqa: F401  (fixture)
+
+PREFIX = "RULES...\nCURRENT CODE:\nprint(agee)\n"
+
+
+def answer(text, context):
+    chunks = tokens(text)
+    chunks[-1]["context"] = context
+    return 200, chunks
+
+
+def test_session_stays_on_its_backend(stub, gateway):
+    a, b = stub(default=OK), stub(default=OK)
+    g = gateway([a, b])
+    session = LLMSession("run")
+
+    session.generate(g, PREFIX + "STDERR: 1", PREFIX)
+    session.generate(g, PREFIX + "STDERR: 2", PREFIX)
+    assert len(a.requests) == 2 and not b.requests
+    assert session.stats() == {"backend": a.url, "context": 0, "prefix": 1, "new": 1}
+
+    # Without a session the idle backend is next
+    g.generate("p")
+    assert len(b.requests) == 1
+
+
+def test_session_continues_from_context(stub, gateway):
+    server = stub(default=answer("ok", [1, 2, 3]))
+    g = gateway([server])
+    session = LLMSession("run", use_context=True)
+
+    session.generate(g, PREFIX + "STDERR: 1", PREFIX)
+    session.generate(g, PREFIX + "STDERR: 2", PREFIX)
+    first, second = server.requests
+    assert first["prompt"] == PREFIX + "STDERR: 1" and "context" not in first
+    assert second["prompt"] == FOLLOW_UP + "STDERR: 2" and second["context"] == [1, 2, 3]
+
+    # Other files in the prompt, or a context that would crowd out the answer, start over
+    session.generate(g, "OTHER\nSTDERR: 3", "OTHER\n")
+    session.context = list(range(1800))
+    session.generate(g, "OTHER\nSTDERR: 4", "OTHER\n", num_ctx=2048)
+    assert [r["prompt"] for r in server.requests[2:]] == ["OTHER\nSTDERR: 3", "OTHER\nSTDERR: 4"]
+    assert not any("context" in r for r in server.requests[2:])
+
+
+def test_repair_attempts_share_a_session(monkeypatch, tmp_path, stub, gateway, wait_for_job):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("print(agee)\n")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.LLM_SESSION_CONTEXT", True)
+
+    runs = iter([
+        (1, "", "NameError: name 'agee' is not defined"),
+        (1, "", "NameError: name 'age' is not defined"),
+        (0, "ok", ""),
+    ])
+    monkeypatch.setattr("app.server.run_python", lambda *a: next(runs))
+    a = stub(answer("print(age)", [7, 8]), answer("print('ok')", [7, 8, 9]))
+    b = stub(default=OK)
+    monkeypatch.setattr(llm_client, "_client", gateway([a, b]))
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={"language": "python", "quick_fixes": False})
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+
+    assert result["status"] == "success" and result["iterations"] == 2
+    first, second = a.requests
+    assert not b.requests
+    assert "NameError: name 'agee'" in first["prompt"] and "context" not in first
+    # The second attempt only sends the new error after the first prompt and answer
+    assert second["context"] == [7, 8]
+    assert second["prompt"].startswith(FOLLOW_UP) and "print(agee)" not in second["prompt"]
+    assert "NameError: name 'age'" in second["prompt"]
+    assert client.get("/llm/stats").json()["sessions"]["context"] >= 1
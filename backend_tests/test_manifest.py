@@ -0,0 +1,59 @@
+import os
+
+from app.manifest import Manifest, get_manifest
+
+
+def make_run(tmp_path):
+    run_dir = tmp_path / "run"
+    (run_dir / "pkg").mkdir(parents=True)
+    (run_dir / "main.py").write_text("import pkg.util\n")
+    (run_dir / "pkg" / "__init__.py").write_text("")
+    (run_dir / "pkg" / "util.py").write_text("X = 1\n")
+    (run_dir / "logo.png").write_bytes(b"\x89PNG\0\0data")
+    (run_dir / "._main.py").write_text("junk")
+    (run_dir / "upload.zip").write_bytes(b"PK")
+    (run_dir / ".git").mkdir()
+    (run_dir / ".git" / "HEAD").write_text("ref: refs/heads/main\n")
+    (run_dir / "pkg" / "fixtures.zip").write_bytes(b"PK\x03\x04\0\0")
+    return run_dir
+
+
+def test_build_indexes_text_and_binary_and_skips_junk(tmp_path):
+    run_dir = make_run(tmp_path)
+    manifest = Manifest.build(str(run_dir))
+
+    # A zip inside the project is project data; only the upload itself is skipped
+    assert manifest.paths() == ["logo.png", "main.py", "pkg/__init__.py", "pkg/fixtures.zip", "pkg/util.py"]
+    assert manifest.entries["main.py"].content == "import pkg.util\n"
+    assert not manifest.entries["logo.png"].is_text
+    # Binaries are listed but never handed to the prompt or the result
+    assert manifest.contents() == {"main.py": "import pkg.util", "pkg/__init__.py": "", "pkg/util.py": "X = 1"}
+
+
+def test_update_is_persisted_and_served_without_reading_disk(tmp_path):
+    run_dir = make_run(tmp_path)
+    manifest = Manifest.build(str(run_dir))
+    manifest.save()
+    old_hash = manifest.entries["pkg/util.py"].sha256
+
+    (run_dir / "pkg" / "util.py").write_text("X = 2\n")
+    manifest.update({"pkg/util.py": "X = 2\n"})
+
+    loaded = Manifest.load(str(run_dir))
+    assert loaded.entries["pkg/util.py"].sha256 != old_hash
+    assert loaded.text("pkg/util.py") == "X = 2\n"
+
+    # Cached content is what callers get, even if the file is gone
+    os.remove(run_dir / "pkg" / "util.py")
+    assert loaded.text("pkg/util.py") == "X = 2\n"
+
+
+def test_get_manifest_builds_once_and_saves(tmp_path):
+    run_dir = make_run(tmp_path)
+    first = get_manifest(str(run_dir))
+
+    assert os.path.exists(str(run_dir) + ".manifest.json")
+    # A file created behind the manifest's back isn't picked up by another walk
+    (run_dir / "new.py").write_text("")
+    assert get_manifest(str(run_dir)) is first
+    assert "new.py" not in first.paths()
@@ -0,0 +1,85 @@
+from fastapi.testclient import TestClient
+from app.server import app
+from app.model_cascade import CascadeSettings, CascadeStats, ModelCascade, Tier, error_class, parse_cascade
+
+
+def test_parse_tiers():
+    assert parse_cascade("small=qwen2.5-coder:1.5b@2048, codellama:7b-instruct") == [
+        Tier("small", "qwen2.5-coder:1.5b", 2048), Tier("codellama:7b-instruct", "codellama:7b-instruct", None)
+    ]
+    assert Tier.parse("@8192") == Tier("@8192", None, 8192)
+    assert Tier.parse("@8192").options() == {"num_ctx": 8192}
+
+
+def test_error_class():
+    assert error_class("python", 1, "", "  File \"main.py\", line 1\nSyntaxError: expected ':'") == "syntax"
+    assert error_class("python", 1, "", "NameError: name 'agee' is not defined") == "name"
+    assert error_class("python", 1, "", "ZeroDivisionError: division by zero") == "runtime"
+    assert error_class("python", 0, "Sum: 3", "") == "wrong_output"
+    assert error_class("java", 1, "", "Main.java:3: error: ';' expected\n1 error") == "syntax"
+    assert error_class("java", 1, "", "Main.java:5: error: cannot find symbol\n1 error") == "name"
+    assert error_class("java", 1, "", "Exception in thread \"main\" java.lang.NullPointerException") == "runtime"
+
+
+def test_cascade_escalates_after_failures():
+    tiers = parse_cascade("a,b,c")
+    cheap = ModelCascade(tiers, "syntax", failures_per_tier=2)
+    assert cheap.tier.name == "a"
+    assert not cheap.failed()
+    assert cheap.failed() and cheap.tier.name == "b"
+
+    # Harder errors skip the first tier; the last tier is kept for good
+    hard = ModelCascade(tiers, "runtime")
+    assert hard.tier.name == "b"
+    assert hard.failed() and not hard.failed()
+    assert hard.summary() == {"error_class": "runtime", "tier": "c", "tiers_tried": ["b", "c"]}
+
+    assert ModelCascade([Tier("only")], "runtime").tier.name == "only"
+
+    settings = CascadeSettings(default=parse_cascade("x"), languages={"java": parse_cascade("y")})
+    assert settings.tiers_for("java")[0].name == "y"
+    assert settings.tiers_for("python", ["z@1024"])[0] == Tier("z@1024", "z", 1024)
+
+    stats = CascadeStats()
+    stats.record("python", cheap, solved=True)
+    assert stats.stats() == [{"language": "python", "error_class": "syntax", "tier": "b", "attempts": 1, "solved": 1}]
+
+
+def test_repair_moves_up_the_cascade(monkeypatch, tmp_path, wait_for_job):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("print(agee)\n")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+
+    calls = []
+
+    def fake_llm(prompt, format=None, use_cache=True, options=None, model=None):
+        calls.append((model, (options or {}).get("num_ctx")))
+        return f"print('attempt {len(calls)}')"
+
+    runs = iter([
+        (1, "", "NameError: name 'agee' is not defined"),  # initial run
+        (1, "", "NameError: name 'agee' is not defined"),  # the small model's fix fails
+        (0, "ok", ""),
+    ])
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    monkeypatch.setattr("app.server.run_python", lambda *a: next(runs))
+    monkeypatch.setattr("app.server.CASCADE_SETTINGS", CascadeSettings(models=frozenset({"tiny-coder", "big-coder"})))
+    client = TestClient(app)
+
+    for cascade, problem in [(["x@abc"], "whole number"), (["other-model"], "not available"),
+                             (["big-coder@100000"], "num_ctx")]:
+        resp = client.post("/repair/proj", json={"language": "python", "cascade": cascade})
+        assert resp.status_code == 400 and problem in resp.json()["detail"]
+
+    resp = client.post("/repair/proj", json={
+        "language": "python", "quick_fixes": False,
+        "cascade": ["small=tiny-coder@2048", "large=big-coder@8192"],
+    })
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+
+    assert result["status"] == "success"
+    assert calls == [("tiny-coder", 2048), ("big-coder", 8192)]
+    assert result["cascade"] == {"error_class": "name", "tier": "large", "tiers_tried": ["small", "large"]}
+    solved = [s for s in client.get("/llm/stats").json()["cascade"] if s["solved"]]
+    assert {"language": "python", "error_class": "name", "tier": "large", "attempts": 1, "solved": 1} in solved
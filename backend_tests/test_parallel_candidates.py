@@ -0,0 +1,139 @@
+import os
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from app.server import LLMCancelled, app, get_manifest
+
+
+def setup_run(monkeypatch, tmp_path, content="broken"):
+    run_dir = tmp_path / "abc"
+    run_dir.mkdir()
+    (run_dir / "test.py").write_text(content)
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    return run_dir
+
+
+def fake_runner(tmp_path, runs):
+    def run_python(run_id, entry):
+        code = (tmp_path / run_id / entry).read_text()
+        runs.append((run_id, code))
+        if code == "print('ok')":
+            return 0, "ok\n", ""
+        return 1, "", f"failed: {code}"
+    return run_python
+
+
+def test_first_passing_candidate_wins(monkeypatch, tmp_path, wait_for_job):
+    run_dir = setup_run(monkeypatch, tmp_path)
+    runs = []
+    seeds = []
+
+    def fake_llm(prompt, format=None, use_cache=True, options=None, cancel=None):
+        seeds.append(options["seed"])
+        # Only the third sample is right
+        return "print('ok')" if options["temperature"] == 0.8 else "print('nope')"
+
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    monkeypatch.setattr("app.server.run_python", fake_runner(tmp_path, runs))
+
+    client = TestClient(app)
+    resp = client.post("/repair/abc", json={"language": "python", "candidates": 3})
+    job = wait_for_job(client, resp.json()["job_id"])
+
+    assert job["result"]["status"] == "success"
+    assert job["result"]["iterations"] == 1
+    assert job["result"]["fixed_code"] == "print('ok')"
+    assert sorted(seeds) == [3, 4, 5]
+    assert (run_dir / "test.py").read_text() == "print('ok')"
+    # Candidates ran in their own workspaces, which are gone again
+    assert {r[0].rsplit(".", 1)[0] for r in runs[1:]} <= {"abc.cand0", "abc.cand1", "abc.cand2"}
+    assert sorted(os.listdir(tmp_path)) == ["abc", "abc.manifest.json"]
+
+
+def test_slow_candidates_are_abandoned(monkeypatch, tmp_path, wait_for_job):
+    setup_run(monkeypatch, tmp_path)
+    runs = []
+    abandoned = threading.Event()
+
+    def fake_llm(prompt, format=None, use_cache=True, options=None, cancel=None):
+        if options["temperature"] == 0.2:
+            return "print('ok')"
+        # Like the streaming client: stop generating once the answer is no longer needed
+        if cancel.wait(5):
+            abandoned.set()
+            raise LLMCancelled("answer no longer needed")
+        return "print('late')"
+
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    monkeypatch.setattr("app.server.run_python", fake_runner(tmp_path, runs))
+
+    client = TestClient(app)
+    started = time.monotonic()
+    job = wait_for_job(client, client.post("/repair/abc", json={"language": "python", "candidates": 2}).json()["job_id"])
+    elapsed = time.monotonic() - started
+
+    assert job["result"]["status"] == "success"
+    assert elapsed < 4
+    # The losing generation was told to stop instead of running to the end
+    assert abandoned.wait(1)
+    time.sleep(0.1)
+    # The late candidate is never executed
+    assert [code for _, code in runs] == ["broken", "print('ok')"]
+
+
+def test_failed_attempt_keeps_a_candidate_error_for_next_prompt(monkeypatch, tmp_path, wait_for_job):
+    setup_run(monkeypatch, tmp_path)
+    runs = []
+    prompts = []
+
+    def fake_llm(prompt, format=None, use_cache=True, options=None, cancel=None):
+        prompts.append(prompt)
+        if len(prompts) <= 2:
+            return "print('nope')"
+        return "print('ok')"
+
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    monkeypatch.setattr("app.server.run_python", fake_runner(tmp_path, runs))
+    monkeypatch.setattr("app.server.MAX_CANDIDATES", 2)
+
+    client = TestClient(app)
+    job = wait_for_job(client, client.post("/repair/abc", json={"language": "python", "candidates": 5}).json()["job_id"])
+
+    assert job["result"]["iterations"] == 2
+    assert "failed: print('nope')" in prompts[2]
+
+
+def test_abandoned_candidate_keeps_its_own_workspace(monkeypatch, tmp_path, wait_for_job):
+    run_dir = setup_run(monkeypatch, tmp_path)
+    intact = []
+
+    def fake_llm(prompt, format=None, use_cache=True, options=None, cancel=None):
+        return "print('ok')" if options["temperature"] == 0.2 else "print('slow')"
+
+    def run_python(run_id, entry):
+        path = tmp_path / run_id / entry
+        code = path.read_text()
+        if code == "print('ok')":
+            return 0, "ok\n", ""
+        if code == "broken":
+            return 1, "", "failed"
+        # The loser is still in the sandbox when its repair has already succeeded
+        time.sleep(0.5)
+        intact.append(path.exists())
+        return 1, "", "slow"
+
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    monkeypatch.setattr("app.server.run_python", run_python)
+
+    client = TestClient(app)
+    for _ in range(2):
+        (run_dir / "test.py").write_text("broken")
+        get_manifest(str(run_dir)).update({"test.py": "broken"})
+        job_id = client.post("/repair/abc", json={"language": "python", "candidates": 2}).json()["job_id"]
+        assert wait_for_job(client, job_id, timeout=10)["result"]["status"] == "success"
+    deadline = time.monotonic() + 5
+    while len(intact) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    # The first repair's loser must not clean up the second repair's workspace
+    assert intact == [True, True]
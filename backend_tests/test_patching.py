@@ -0,0 +1,172 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.server import app
+from app.patching import PatchError, apply_patch, parse_unified_diff
+
+CODE = "def add(a, b):\n    return a - b\n\n\ndef main():\n    print(add(1, 2))\n\n\nmain()\n"
+
+
+def test_exact_hunk_applies():
+    patch = """```diff
+--- a/main.py
++++ b/main.py
+@@ -1,2 +1,2 @@
+ def add(a, b):
+-    return a - b
++    return a + b
+```"""
+    assert apply_patch({"main.py": CODE}, patch, "main.py")["main.py"] == CODE.replace("a - b", "a + b")
+
+
+def test_wrong_line_numbers_and_whitespace_are_tolerated():
+    # Header points at the wrong line, no file header, context lost its indent
+    patch = """Here is the fix:
+@@ -40,3 +40,3 @@
+def add(a, b):
+-  return a - b
++    return a + b
+"""
+    assert parse_unified_diff(patch, "main.py")["main.py"][0].old_start == 40
+    assert apply_patch({"main.py": CODE}, patch, "main.py")["main.py"] == CODE.replace("a - b", "a + b")
+
+
+def test_fuzzy_context_and_missing_header_numbers():
+    patch = """--- main.py
++++ main.py
+@@ @@
+ def main():
+-    print(add(1, 2)))
++    print(add(2, 2))
+"""
+    assert "print(add(2, 2))" in apply_patch({"main.py": CODE}, patch, "main.py")["main.py"]
+
+
+def test_multiple_files_and_hunks():
+    util = "A = 1\nB = 2\nC = 3\nD = 4\n"
+    patch = """--- a/main.py
++++ b/main.py
+@@ -2 +2 @@
+-    return a - b
++    return a + b
+--- a/util.py
++++ b/util.py
+@@ -1 +1 @@
+-A = 1
++A = 10
+@@ -4 +4 @@
+-D = 4
++D = 40
+"""
+    patched = apply_patch({"main.py": CODE, "util.py": util}, patch, "main.py")
+    assert patched["util.py"] == "A = 10\nB = 2\nC = 3\nD = 40\n"
+    assert "a + b" in patched["main.py"]
+
+
+def test_lines_starting_with_dashes_inside_a_hunk():
+    usage = 'USAGE = """\n-- verbose: print more\n++ counter\n"""\n'
+    patch = """--- a/cli.py
++++ b/cli.py
+@@ -1,4 +1,4 @@
+ USAGE = \"\"\"
+--- verbose: print more
++-- verbose: print everything
+ ++ counter
+ \"\"\"
+--- a/main.py
++++ b/main.py
+@@ -2 +2 @@
+-    return a - b
++    return a + b
+"""
+    hunks = parse_unified_diff(patch, "main.py")
+    assert hunks["cli.py"][0].old == ['USAGE = """', "-- verbose: print more", "++ counter", '"""']
+    patched = apply_patch({"cli.py": usage, "main.py": CODE}, patch, "main.py")
+    assert patched["cli.py"] == usage.replace("print more", "print everything")
+    assert "a + b" in patched["main.py"]
+
+
+def test_over_claimed_counts_stop_at_the_next_file():
+    util = "A = 1\nB = 2\n"
+    patch = """--- a/main.py
++++ b/main.py
+@@ -1,6 +1,6 @@
+ def add(a, b):
+-    return a - b
++    return a + b
+--- a/util.py
++++ b/util.py
+@@ -1,2 +1,2 @@
+-A = 1
++A = 10
+ B = 2
+"""
+    patched = apply_patch({"main.py": CODE, "util.py": util}, patch, "main.py")
+    assert patched["main.py"] == CODE.replace("a - b", "a + b")
+    assert patched["util.py"] == "A = 10\nB = 2\n"
+
+
+def test_insertion_without_context_goes_after_the_stated_line():
+    util = "A = 1\nB = 2\nC = 3\nD = 4\n"
+    patch = "--- a/util.py\n+++ b/util.py\n@@ -3,0 +4,1 @@\n+X = 0\n"
+    assert apply_patch({"util.py": util}, patch, "util.py")["util.py"] == "A = 1\nB = 2\nC = 3\nX = 0\nD = 4\n"
+
+
+def test_unplaceable_hunk_raises():
+    patch = "@@ -1 +1 @@\n-completely different line\n+x = 1\n"
+    with pytest.raises(PatchError):
+        apply_patch({"main.py": CODE}, patch, "main.py")
+    with pytest.raises(PatchError):
+        apply_patch({"main.py": CODE}, "def add(a, b):\n    return a + b\n", "main.py")
+
+
+def setup_project(monkeypatch, tmp_path, answers):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text(CODE)
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+
+    prompts = []
+
+    def fake_llm(prompt, format=None, **kwargs):
+        prompts.append((prompt, format))
+        return answers.pop(0)
+
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+
+    def run_python(run_id, entry):
+        code = (tmp_path / run_id / "main.py").read_text()
+        return (0, "3\n", "") if "a + b" in code else (0, "-1\n", "")
+
+    monkeypatch.setattr("app.server.run_python", run_python)
+    return prompts
+
+
+def test_patch_mode_repair(monkeypatch, tmp_path, wait_for_job):
+    prompts = setup_project(monkeypatch, tmp_path, ["@@ -2 +2 @@\n-    return a - b\n+    return a + b\n"])
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={
+        "language": "python", "entry_file": "main.py", "expected_output": "3", "edit_mode": "patch"
+    })
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+
+    assert result["status"] == "success"
+    assert "a + b" in result["fixed_code"] and "main()" in result["fixed_code"]
+    assert len(prompts) == 1
+    assert "unified diff" in prompts[0][0] and prompts[0][1] is None
+
+
+def test_patch_mode_falls_back_to_whole_files(monkeypatch, tmp_path, wait_for_job):
+    fixed = CODE.replace("a - b", "a + b")
+    prompts = setup_project(monkeypatch, tmp_path, ["@@ -1 +1 @@\n-nothing like this\n+x\n", fixed])
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={
+        "language": "python", "entry_file": "main.py", "expected_output": "3", "edit_mode": "patch"
+    })
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+
+    assert result["status"] == "success"
+    assert result["iterations"] == 1
+    assert "unified diff" in prompts[0][0]
+    assert "RETURN ONLY THE FULL FIXED CODE" in prompts[1][0]
@@ -0,0 +1,96 @@
+from app.prompt_context import build_context, import_graph, parse_frames, summarize
+
+PY_FILES = {
+    "main.py": "from app.service import run\n\nrun()\n",
+    "app/__init__.py": "",
+    "app/service.py": "from .models import Order\n\ndef run():\n    return Order().total()\n",
+    "app/models.py": "class Order:\n    def total(self):\n        return 1 / 0\n",
+    "tools/report.py": "def report(rows, *, width=80):\n    '''Pretty print.'''\n" + "    print(rows)\n" * 200,
+    "tools/unused.py": "X = 1\n" * 300,
+}
+
+PY_ERR = """Traceback (most recent call last):
+  File "/work/main.py", line 3, in <module>
+    run()
+  File "/tmp/job_x/work/app/service.py", line 4, in run
+    return Order().total()
+  File "/work/app/models.py", line 3, in total
+    return 1 / 0
+ZeroDivisionError: division by zero
+"""
+
+
+def test_parse_python_and_java_frames():
+    frames = parse_frames(PY_ERR, list(PY_FILES))
+    assert [f.path for f in frames] == ["main.py", "app/service.py", "app/models.py"]
+
+    java_err = (
+        "Exception in thread \"main\" java.lang.NullPointerException\n"
+        "\tat com.acme.Repo.load(Repo.java:12)\n"
+        "\tat Main.main(Main.java:5)\n"
+    )
+    frames = parse_frames(java_err, ["Main.java", "com/acme/Repo.java"])
+    assert [(f.path, f.line) for f in frames] == [("Main.java", 5), ("com/acme/Repo.java", 12)]
+
+    javac_err = "Util.java:3: error: ';' expected\n"
+    assert parse_frames(javac_err, ["Main.java", "Util.java"])[0].path == "Util.java"
+
+
+def test_import_graph_resolves_relative_and_package_imports():
+    graph = import_graph(PY_FILES, "python")
+    assert graph["main.py"] == {"app/service.py"}
+    assert graph["app/service.py"] == {"app/models.py"}
+
+    java = {"Main.java": "class Main { Repo r; }", "Repo.java": "class Repo {}", "Other.java": "class Other {}"}
+    assert import_graph(java, "java")["Main.java"] == {"Repo.java"}
+
+
+def test_context_prefers_trace_files_and_summarizes_the_rest():
+    budget = 200
+    context = build_context(PY_FILES, "main.py", PY_ERR, "python", budget)
+
+    assert context.full[:3] == ["app/models.py", "app/service.py", "main.py"]
+    assert "tools/report.py" in context.summarized
+    assert "def report(rows, *, width=80):" in context.payload
+    assert "print(rows)" not in context.payload
+    assert context.tokens_used <= budget
+    assert context.omitted == ["tools/unused.py"]
+
+
+def test_summarize_java():
+    code = "package a;\nimport java.util.List;\npublic class Repo {\n    public List<String> load(int id) {\n        return null;\n    }\n}\n"
+    assert summarize("a/Repo.java", code) == "package a;\nimport java.util.List;\npublic class Repo\n    public List<String> load(int id)"
+
+
+def test_multi_file_repair_never_overwrites_summarized_files(monkeypatch, tmp_path, wait_for_job):
+    import json
+    from fastapi.testclient import TestClient
+    from app.server import app
+
+    run_dir = tmp_path / "proj"
+    for rel, code in PY_FILES.items():
+        (run_dir / rel).parent.mkdir(parents=True, exist_ok=True)
+        (run_dir / rel).write_text(code)
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.PROMPT_CONTEXT_TOKENS", 200)
+
+    prompts = []
+
+    def fake_llm(prompt, *a, **k):
+        prompts.append(prompt)
+        return json.dumps({"app/models.py": "class Order:\n    def total(self):\n        return 1\n",
+                           "tools/report.py": "oops"})
+
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    monkeypatch.setattr("app.server.run_python", lambda run_id, entry: (
+        (0, "", "") if "return 1\n" in (tmp_path / run_id / "app/models.py").read_text() else (1, "", PY_ERR)
+    ))
+
+    client = TestClient(app)
+    resp = client.post("/repair/proj", json={"language": "python", "entry_file": "main.py"})
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+
+    assert result["status"] == "success"
+    assert result["prompt_tokens"] and result["prompt_tokens"][0] <= 200
+    assert "===== OTHER FILES (not shown) =====\ntools/unused.py" in prompts[0]
+    assert (run_dir / "tools/report.py").read_text() == PY_FILES["tools/report.py"]
@@ -0,0 +1,174 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from app.python_worker import ForkWorker, PythonWorkerPool, WorkerError, WorkerLimits
+
+WORKER = os.path.join(os.path.dirname(__file__), "..", "runners", "fork_worker.py")
+
+
+@pytest.fixture
+def worker():
+    w = ForkWorker([sys.executable, WORKER], WorkerLimits(timeout=5, max_output=2000, memory_mb=256))
+    yield w
+    w.close()
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+    return path
+
+
+def test_runs_entry_as_main_with_project_imports(worker, tmp_path):
+    write(tmp_path / "pkg" / "util.py", "def greet(n):\n    return f'hi {n}'\n")
+    write(tmp_path / "main.py", "import sys\nfrom pkg.util import greet\nif __name__ == '__main__':\n    print(greet('bob'))\n    print('warn', file=sys.stderr)\n")
+
+    assert worker.run(str(tmp_path), "main.py") == (0, "hi bob\n", "warn\n")
+
+
+def test_exit_codes_and_traceback_look_like_plain_python(worker, tmp_path):
+    write(tmp_path / "exit.py", "import sys\nsys.exit(3)\n")
+    assert worker.run(str(tmp_path), "exit.py")[0] == 3
+
+    write(tmp_path / "boom.py", "x = 1\nraise ValueError('bad')\n")
+    ret, out, err = worker.run(str(tmp_path), "boom.py")
+    assert ret == 1
+    assert err.startswith("Traceback")
+    assert 'boom.py", line 2' in err
+    assert "runpy" not in err and "fork_worker" not in err
+
+    write(tmp_path / "syntax.py", "def f(:\n")
+    ret, _, err = worker.run(str(tmp_path), "syntax.py")
+    assert ret == 1 and "SyntaxError" in err
+
+
+def test_children_are_isolated_from_the_source_and_each_other(worker, tmp_path):
+    write(tmp_path / "main.py", "open('out.txt', 'w').write('x')\nimport json\njson.dumps = None\n")
+    write(tmp_path / "check.py", "import json, os\nprint(json.dumps([1]), os.path.exists('out.txt'))\n")
+
+    assert worker.run(str(tmp_path), "main.py")[0] == 0
+    assert not (tmp_path / "out.txt").exists()
+    assert worker.run(str(tmp_path), "check.py")[1] == "[1] False\n"
+
+
+def test_project_module_shadows_preloaded_stdlib(worker, tmp_path):
+    write(tmp_path / "random.py", "VALUE = 'mine'\n")
+    write(tmp_path / "main.py", "import random\nprint(random.VALUE)\n")
+    assert worker.run(str(tmp_path), "main.py")[1] == "mine\n"
+
+
+def test_module_next_to_a_nested_entry_shadows_preloaded_stdlib(worker, tmp_path):
+    write(tmp_path / "app" / "json.py", "def dumps(x):\n    return 'mine'\n")
+    write(tmp_path / "app" / "main.py", "import json\nprint(json.dumps([1]))\n")
+    assert worker.run(str(tmp_path), "app/main.py")[1] == "mine\n"
+
+
+def test_atexit_hooks_and_threads_finish_like_plain_python(worker, tmp_path):
+    write(tmp_path / "main.py",
+          "import atexit, sys, threading, time\n"
+          "def late():\n"
+          "    time.sleep(0.2)\n"
+          "    print('thread done', flush=True)\n"
+          "atexit.register(lambda: print('atexit ran'))\n"
+          "threading.Thread(target=late).start()\n"
+          "print('main done')\n"
+          "sys.exit(2)\n")
+    plain = subprocess.run([sys.executable, "main.py"], cwd=tmp_path, capture_output=True, text=True)
+    assert worker.run(str(tmp_path), "main.py") == (plain.returncode, plain.stdout, plain.stderr)
+    assert plain.stdout == "main done\nthread done\natexit ran\n"
+
+
+def test_limits_are_enforced(tmp_path):
+    w = ForkWorker([sys.executable, WORKER], WorkerLimits(timeout=0.5, max_output=400, memory_mb=256))
+    try:
+        write(tmp_path / "loop.py", "while True:\n    pass\n")
+        ret, _, err = w.run(str(tmp_path), "loop.py")
+        assert ret == 124 and "Timed out" in err
+
+        write(tmp_path / "loud.py", "print('x' * 2000)\n")
+        ret, out, _ = w.run(str(tmp_path), "loud.py")
+        assert ret == 0 and out.endswith("[output truncated]\n") and len(out) < 500
+
+        write(tmp_path / "hog.py", "data = bytearray(1024 * 1024 * 1024)\n")
+        ret, _, err = w.run(str(tmp_path), "hog.py")
+        assert ret == 1 and "MemoryError" in err
+
+        # The worker survives all of the above
+        write(tmp_path / "ok.py", "print('ok')\n")
+        assert w.run(str(tmp_path), "ok.py") == (0, "ok\n", "")
+    finally:
+        w.close()
+
+
+def test_processes_left_running_are_killed(worker, tmp_path):
+    mark = tmp_path / "mark"
+    cmd = f"import time; time.sleep(0.5); open({str(mark)!r}, 'w')"
+    write(tmp_path / "spawn.py",
+          "import subprocess, sys\n"
+          f"subprocess.Popen([sys.executable, '-c', {cmd!r}])\n"
+          f"subprocess.Popen([sys.executable, '-c', {cmd!r}], start_new_session=True)\n"
+          "print('spawned')\n")
+    assert worker.run(str(tmp_path), "spawn.py") == (0, "spawned\n", "")
+    time.sleep(1.0)
+    assert not mark.exists()
+
+
+def test_hung_worker_times_out(monkeypatch, tmp_path):
+    monkeypatch.setattr("app.python_worker.REPLY_GRACE", 0.2)
+    w = ForkWorker([sys.executable, "-c", "import time; time.sleep(30)"], WorkerLimits(timeout=0.1))
+    started = time.monotonic()
+    try:
+        with pytest.raises(WorkerError):
+            w.run(str(tmp_path), "main.py")
+        assert time.monotonic() - started < 2
+        w.proc.wait(timeout=2)
+        assert not w.alive
+    finally:
+        w.close()
+
+
+def test_garbled_reply_replaces_the_worker(monkeypatch, tmp_path):
+    garbled = [sys.executable, "-c", "import sys\nfor _ in sys.stdin: print('not json', flush=True)"]
+    monkeypatch.setattr("app.python_worker.ForkWorker", lambda argv, limits: ForkWorker(garbled, limits))
+    pool = PythonWorkerPool(limits=WorkerLimits(processes=1), docker=lambda args: (0, "", ""))
+    pool.start()
+    errors = []
+
+    def run_twice():
+        for _ in range(2):
+            try:
+                pool.run(str(tmp_path), "main.py")
+            except ValueError as e:
+                errors.append(e)
+
+    try:
+        # Without a replacement the second run would wait for an idle worker forever
+        t = threading.Thread(target=run_twice, daemon=True)
+        t.start()
+        t.join(5)
+        assert len(errors) == 2
+        assert pool.stats()["processes"] == 1 and pool.stats()["idle"] == 1
+    finally:
+        pool.close()
+
+
+def test_run_python_uses_fork_engine(monkeypatch, tmp_path):
+    from app import server
+
+    run_dir = tmp_path / "r1"
+    write(run_dir / "main.py", "print('ok')\n")
+
+    class FakePool:
+        def run(self, src_dir, entry):
+            return 0, f"{os.path.basename(src_dir)}:{entry}", ""
+
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.PYTHON_ENGINE", "fork")
+    monkeypatch.setattr("app.server.get_python_workers", lambda: FakePool())
+
+    assert server.run_python("r1", "main.py") == (0, "r1:main.py", "")
@@ -0,0 +1,136 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+from app.server import app
+from app.quick_fixes import propose_fixes
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), "..", "app", "examples")
+
+
+def run_locally(tmp_path):
+    def run_python(run_id, entry):
+        proc = subprocess.run([sys.executable, entry], cwd=tmp_path / run_id, capture_output=True, text=True)
+        return proc.returncode, proc.stdout, proc.stderr
+    return run_python
+
+
+@pytest.mark.parametrize("example, rule, expected", [
+    ("syntax_error.py", "missing_colon", "Hello, World!"),
+    ("name_error.py", "undefined_name_stub", "Name: Alice\nAge: 25"),
+    ("type_error.py", "str_concatenation", "Name: Bob, Age: 30"),
+    ("index_error.py", "index_last_item", "First: apple, Last: cherry"),
+    ("division_error.py", "division_by_zero", "Average: 30.0"),
+])
+def test_bundled_examples_are_fixed_without_the_llm(monkeypatch, tmp_path, example, rule, expected, wait_for_job):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    shutil.copy(os.path.join(EXAMPLES, example), run_dir / "main.py")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.run_python", run_locally(tmp_path))
+
+    def no_llm(*args, **kwargs):
+        raise AssertionError("the LLM should not be called")
+
+    monkeypatch.setattr("app.server.call_llm", no_llm)
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={"language": "python", "expected_output": expected})
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+
+    assert result["status"] == "success"
+    assert result["quick_fix"] == rule
+    assert result["output"].strip() == expected
+    run = subprocess.run([sys.executable, "main.py"], cwd=run_dir, capture_output=True, text=True)
+    assert run.stdout.strip() == expected
+
+
+def test_guesses_need_an_expected_output(monkeypatch, tmp_path, wait_for_job):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    shutil.copy(os.path.join(EXAMPLES, "name_error.py"), run_dir / "main.py")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.run_python", run_locally(tmp_path))
+    monkeypatch.setattr("app.server.call_llm", lambda *a, **k: "print('from the llm')")
+    client = TestClient(app)
+
+    # Python hints at the builtin eval for email; neither it nor a stub for email is tried
+    result = wait_for_job(client, client.post("/repair/proj", json={"language": "python"}).json()["job_id"])["result"]
+    assert result["status"] == "success" and "quick_fix" not in result
+    assert result["fixed_code"] == "print('from the llm')"
+
+    err = 'Traceback (most recent call last):\n  File "/work/main.py", line 1, in <module>\n' \
+          "NameError: name 'email' is not defined. Did you mean: 'eval'?"
+    assert propose_fixes("python", {"main.py": "print(email)\n"}, "main.py", err) == []
+    guesses = propose_fixes("python", {"main.py": "print(email)\n"}, "main.py", err, guesses=True)
+    assert [fix.rule for fix in guesses] == ["undefined_name_stub"]
+
+    # Dividing by len(<parameter>) instead of 0 is a guess too
+    with open(os.path.join(EXAMPLES, "division_error.py")) as f:
+        code = f.read()
+    run = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert propose_fixes("python", {"main.py": code}, "main.py", run.stderr.replace("<string>", "main.py")) == []
+
+
+def test_expected_output_picks_among_candidates(monkeypatch, tmp_path, wait_for_job):
+    # The guard also runs, but only len(numbers) prints the expected average
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    shutil.copy(os.path.join(EXAMPLES, "division_error.py"), run_dir / "main.py")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.run_python", run_locally(tmp_path))
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={"language": "python", "expected_output": "Average: 30.0"})
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+    assert "len(numbers)" in result["fixed_code"]
+
+
+def test_falls_through_to_the_llm(monkeypatch, tmp_path, wait_for_job):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("def greet(name)\n    print(name)\n\ngreet('x')\n")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.run_python", run_locally(tmp_path))
+    monkeypatch.setattr("app.server.call_llm", lambda *a, **k: "print('hi')")
+    client = TestClient(app)
+
+    # The colon fix runs but doesn't print what is expected
+    resp = client.post("/repair/proj", json={"language": "python", "expected_output": "hi"})
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+    assert result["status"] == "success" and "quick_fix" not in result
+    assert result["fixed_code"] == "print('hi')"
+
+
+def test_rules_chain_across_errors():
+    code = "def greet(name)\n    print('Hi ' + nmae)\n\ngreet('x')\n"
+    err = 'File "/work/main.py", line 1\n    def greet(name)\n                   ^\nSyntaxError: expected \':\''
+    [colon] = propose_fixes("python", {"main.py": code}, "main.py", err)
+    fixed = colon.files["main.py"]
+    assert fixed.startswith("def greet(name):\n")
+
+    err = 'Traceback (most recent call last):\n  File "/work/main.py", line 2, in greet\n' \
+          "NameError: name 'nmae' is not defined. Did you mean: 'name'?"
+    fixes = propose_fixes("python", {"main.py": fixed}, "main.py", err)
+    assert fixes[0].files["main.py"].splitlines()[1] == "    print('Hi ' + name)"
+
+    # The same word inside a string is text, not the name
+    code = "name = 'x'\nprint('nmae:', nmae)\n"
+    err = err.replace("line 2, in greet", "line 2, in <module>")
+    fixes = propose_fixes("python", {"main.py": code}, "main.py", err)
+    assert fixes[0].files["main.py"].splitlines()[1] == "print('nmae:', name)"
+
+
+def test_java_rules():
+    code = "public class Main {\n    public static void main(String[] args) {\n        int count = 1\n" \
+           "        System.out.println(cuont);\n    }\n}\n"
+    [semicolon] = propose_fixes("java", {"Main.java": code}, "Main.java", "Main.java:3: error: ';' expected\n1 error")
+    assert "int count = 1;" in semicolon.files["Main.java"]
+
+    err = "/work/Main.java:4: error: cannot find symbol\n        System.out.println(cuont);\n" \
+          "                           ^\n  symbol:   variable cuont\n  location: class Main\n1 error"
+    fixes = propose_fixes("java", {"Main.java": code}, "Main.java", err)
+    assert "System.out.println(count);" in fixes[0].files["Main.java"]
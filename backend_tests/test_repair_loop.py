@@ -2,19 +2,19 @@ from fastapi.testclient import TestClient
 from app.server import app
 
 
-def test_repair_loops_until_fixed(monkeypatch, tmp_path):
+def test_repair_loops_until_fixed(monkeypatch, tmp_path, wait_for_job):
     responses = iter([
-        "Try running it like this...",
+        "Try running it like this...",  # doesn't parse: rejected without a run
         "print('ok')"   # success on 2nd attempt
     ])
 
     # Patch LLM call
     monkeypatch.setattr("app.server.call_llm",
-                        lambda *a: next(responses))
+                        lambda *a, **k: next(responses))
 
-    # Patch run_python to fail twice, succeed on third
+    # Patch run_python to fail on the initial run, succeed on the next
     run_results = iter([
-        (1, "", "error"),   # attempt 1 fail
+        (1, "", "error"),   # initial run fails
         (0, "ok", "")       # attempt 2 success
     ])
 
@@ -38,5 +38,47 @@ def test_repair_loops_until_fixed(monkeypatch, tmp_path):
     client = TestClient(app)
 
     resp = client.post(f"/repair/{run_id}", json={"language": "python"})
+    assert resp.status_code == 202
 
-    assert resp.json()["iterations"] == 1
\ No newline at end of file
+    job = wait_for_job(client, resp.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["result"]["iterations"] == 2
+
+
+def test_repair_rejects_unknown_entry_file_before_queueing(monkeypatch, tmp_path):
+    run_dir = tmp_path / "abc"
+    run_dir.mkdir()
+    (run_dir / "a.py").write_text("")
+    (run_dir / "b.py").write_text("")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+
+    client = TestClient(app)
+    resp = client.post("/repair/abc", json={"language": "python", "entry_file": "c.py"})
+
+    assert resp.status_code == 400
+    assert client.get("/jobs/stats").json()["queue_depth"] == 0
+
+def test_repeated_prompt_asks_for_fresh_sample(monkeypatch, tmp_path, wait_for_job):
+    seen = []
+
+    def fake_llm(prompt, format=None, use_cache=True):
+        seen.append(use_cache)
+        # A no-op "fix" keeps the file and the error unchanged
+        return "broken"
+
+    run_results = iter([(1, "", "error"), (1, "", "error"), (0, "ok", "")])
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    # Otherwise the no-op fix is rejected as a duplicate without running
+    monkeypatch.setattr("app.server.STATIC_CHECKS", False)
+    monkeypatch.setattr("app.server.run_python", lambda *a: next(run_results))
+
+    run_dir = tmp_path / "abc"
+    run_dir.mkdir()
+    (run_dir / "test.py").write_text("broken")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+
+    client = TestClient(app)
+    job = wait_for_job(client, client.post("/repair/abc", json={"language": "python"}).json()["job_id"])
+
+    assert job["result"]["iterations"] == 2
+    assert seen == [True, False]
@@ -0,0 +1,139 @@
+from fastapi.testclient import TestClient
+from app.server import app
+from app.repair_policy import (
+    ABORT, CONTINUE, ESCALATE, AdaptivePolicy, Attempt, PolicyLimits, RepairPolicy, Strategy, error_signature
+)
+
+
+def test_error_signature_ignores_locations():
+    a = 'Traceback:\n  File "/work/main.py", line 3, in <module>\nZeroDivisionError: division by zero'
+    b = 'Traceback:\n  File "/tmp/x/main.py", line 9, in f\nZeroDivisionError: division by zero'
+    c = 'Traceback:\n  File "/work/main.py", line 3, in <module>\nNameError: name \'x\' is not defined'
+    assert error_signature(1, "", a) == error_signature(1, "", b)
+    assert error_signature(1, "", a) != error_signature(1, "", c)
+    assert error_signature(1, "", "Main.java:4: error: ';' expected\n1 error") == \
+        error_signature(1, "", "Main.java:12: error: ';' expected\n1 error")
+    # Wrong output without an error: the output is the signature
+    assert error_signature(0, "Sum: 10", "") == error_signature(0, "Sum: 12", "")
+    assert error_signature(0, "Sum: 10", "") != error_signature(0, "Total: 10", "")
+
+
+def test_fixed_policy_only_counts_attempts():
+    policy = RepairPolicy(PolicyLimits(max_attempts=2), Strategy())
+    policy.observe(Attempt(1, "", "boom"))  # initial run
+    for _ in range(2):
+        assert policy.decide().action == CONTINUE
+        policy.observe(Attempt(1, "", "boom", answer="same"))
+    assert policy.decide().action == ABORT
+
+
+def test_stuck_repair_escalates_then_aborts():
+    policy = AdaptivePolicy(PolicyLimits(max_attempts=20, repeat_limit=2), Strategy(edit_mode="patch"), max_candidates=2)
+    policy.observe(Attempt(1, "", "IndexError: index 3 out of range"))
+    policy.observe(Attempt(1, "", "IndexError: index 4 out of range", answer="x = 1"))
+    assert policy.decide().action == CONTINUE
+    policy.observe(Attempt(1, "", "IndexError: index 5 out of range", answer="y = [0]"))
+
+    decision = policy.decide()
+    assert decision.action == ESCALATE and decision.strategy.edit_mode == "full"
+
+    # Different answers with a new error don't count as stuck
+    policy.observe(Attempt(1, "", "TypeError: nope", answer="completely different code"))
+    assert policy.decide().action == CONTINUE
+
+    # Near-identical answers do, even when the errors differ
+    policy.observe(Attempt(1, "", "ValueError: 1", answer="completely different code!"))
+    policy.observe(Attempt(1, "", "OSError: 2", answer="completely different code!!"))
+    decision = policy.decide()
+    assert decision.action == ESCALATE
+    assert decision.strategy.candidates == 1 and decision.strategy.fresh_samples
+
+    # Parallel samples come last, and only up to max_candidates
+    for _ in range(2):
+        policy.observe(Attempt(1, "", "OSError: 2", answer="y"))
+    decision = policy.decide()
+    assert decision.action == ESCALATE and decision.strategy.candidates == 2
+
+    for _ in range(2):
+        policy.observe(Attempt(1, "", "OSError: 2", answer="y"))
+    decision = policy.decide()
+    assert decision.action == ABORT and "same failure" in decision.reason
+    assert len(policy.stats()["escalations"]) == 3
+
+
+def test_parallel_escalation_fits_the_token_budget():
+    strategy = Strategy(fresh_samples=True, candidates=2)
+    policy = AdaptivePolicy(PolicyLimits(token_budget=1100, repeat_limit=2), strategy, max_candidates=8)
+    policy.observe(Attempt(1, "", "boom"))
+    for _ in range(3):
+        policy.observe(Attempt(1, "", "boom", answer="x", prompt_tokens=200, answer_tokens=40))
+    # 720 of 1100 tokens spent at 120 per candidate: three fit, doubling to four would not
+    decision = policy.decide()
+    assert decision.action == ESCALATE and decision.strategy.candidates == 3
+
+    # Without a budget the default is not to widen at all
+    policy = AdaptivePolicy(PolicyLimits(repeat_limit=2), Strategy(fresh_samples=True))
+    for _ in range(4):
+        policy.observe(Attempt(1, "", "boom", answer="x"))
+    assert policy.decide().action == ABORT
+
+
+def test_deadline_and_token_budget():
+    policy = AdaptivePolicy(PolicyLimits(deadline_seconds=5), Strategy(), started=0.0)
+    policy.observe(Attempt(1, "", "boom"))
+    assert policy.decide().action == ABORT
+
+    policy = AdaptivePolicy(PolicyLimits(token_budget=250), Strategy())
+    policy.observe(Attempt(1, "", "a"))
+    assert policy.decide().action == CONTINUE
+    policy.observe(Attempt(1, "", "b", answer="x", prompt_tokens=100, answer_tokens=20))
+    assert policy.decide().action == CONTINUE
+    policy.observe(Attempt(1, "", "c", answer="y", prompt_tokens=100, answer_tokens=20))
+    decision = policy.decide()
+    assert decision.action == ABORT and "token budget" in decision.reason
+
+
+def setup_hopeless_run(monkeypatch, tmp_path):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("print(1/0)\n")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+
+    calls = []
+
+    def fake_llm(prompt, format=None, use_cache=True, **kwargs):
+        calls.append(use_cache)
+        return f"print({len(calls)}/0)"
+
+    monkeypatch.setattr("app.server.call_llm", fake_llm)
+    monkeypatch.setattr("app.server.run_python",
+                        lambda *a: (1, "", 'File "main.py", line 1\nZeroDivisionError: division by zero'))
+    monkeypatch.setattr("app.server.MAX_CANDIDATES", 1)
+    return calls
+
+
+def test_hopeless_repair_stops_early(monkeypatch, tmp_path, wait_for_job):
+    calls = setup_hopeless_run(monkeypatch, tmp_path)
+    client = TestClient(app)
+
+    job = wait_for_job(client, client.post("/repair/proj", json={"language": "python"}).json()["job_id"])
+    result = job["result"]
+
+    assert result["status"] == "failed"
+    # Stuck after two attempts, stuck again after two with fresh samples, then given up
+    assert result["iterations"] == 4
+    assert "same failure" in result["stopped_because"]
+    assert result["policy"]["escalations"] == ["same failure 3 times in a row"]
+    assert calls[:2] == [True, True] and calls[2:] == [False, False]
+
+
+def test_fixed_policy_and_request_limits(monkeypatch, tmp_path, wait_for_job):
+    setup_hopeless_run(monkeypatch, tmp_path)
+    client = TestClient(app)
+
+    resp = client.post("/repair/proj", json={"language": "python", "policy": "fixed", "max_attempts": 3})
+    result = wait_for_job(client, resp.json()["job_id"])["result"]
+    assert result["iterations"] == 3
+    assert result["stopped_because"] == "used all 3 attempts"
+
+    assert client.post("/repair/proj", json={"language": "python", "policy": "nope"}).status_code == 400
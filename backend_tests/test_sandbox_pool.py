@@ -0,0 +1,153 @@
+import subprocess
+
+import pytest
+from app.sandbox_pool import TIMEOUT_EXIT, DockerBackend, FakeDockerBackend, PoolSettings, SandboxError, SandboxPool
+
+
+def make_pool(handler=None, **settings):
+    backend = FakeDockerBackend(handler)
+    opts = {"size": 2, "refill_interval": 60}
+    opts.update(settings)
+    pool = SandboxPool("python-runner", PoolSettings(**opts), backend=backend)
+    return pool, backend
+
+
+def test_first_run_is_miss_then_hits_after_refill(tmp_path):
+    (tmp_path / "main.py").write_text("print('hi')")
+    pool, backend = make_pool(lambda image, argv, files: (0, "hi\n", ""))
+
+    ret, out, err = pool.run(str(tmp_path), ["python", "main.py"])
+    assert (ret, out, err) == (0, "hi\n", "")
+    assert pool.stats()["misses"] == 1
+
+    pool.maintain()
+    assert pool.stats()["idle"] == 2
+
+    pool.run(str(tmp_path), ["python", "main.py"])
+    stats = pool.stats()
+    assert stats["hits"] == 1
+    assert stats["in_use"] == 0
+    pool.stop()
+
+
+def test_container_is_wiped_between_runs(tmp_path):
+    (tmp_path / "main.py").write_text("print('hi')")
+    seen = []
+
+    def handler(image, argv, files):
+        seen.append(sorted(files))
+        return 0, "", ""
+
+    pool, backend = make_pool(handler, size=1)
+    pool.run(str(tmp_path), ["python", "main.py"])
+
+    (tmp_path / "main.py").unlink()
+    (tmp_path / "other.py").write_text("pass")
+    pool.run(str(tmp_path), ["python", "other.py"])
+
+    assert seen == [["/work/main.py"], ["/work/other.py"]]
+    assert len(backend.containers) == 1
+    pool.stop()
+
+
+def test_reset_kills_leftovers_and_clears_tmp(tmp_path):
+    (tmp_path / "main.py").write_text("")
+    seen = []
+    pool, backend = make_pool(size=1)
+
+    def leave_a_mess(image, argv, files):
+        seen.append(sorted(files))
+        files["/tmp/scratch"] = "left behind"
+        files["/work/out.txt"] = "written"
+        for container in backend.containers.values():
+            container["processes"].append("sleep 60")
+        return 0, "", ""
+
+    backend.handler = leave_a_mess
+    pool.run(str(tmp_path), ["python", "main.py"])
+    [container] = backend.containers.values()
+    assert container == {"image": "python-runner", "files": {}, "processes": []}
+
+    pool.run(str(tmp_path), ["python", "main.py"])
+    assert seen == [["/work/main.py"], ["/work/main.py"]]
+    pool.stop()
+
+
+def test_timed_out_program_gets_a_fresh_container(tmp_path):
+    (tmp_path / "main.py").write_text("")
+    timed_out = (TIMEOUT_EXIT, "partial\n", "Timed out after 1s\n")
+    pool, backend = make_pool(lambda image, argv, files: timed_out, size=1, run_timeout=1)
+
+    assert pool.run(str(tmp_path), ["python", "main.py"]) == timed_out
+    assert pool.stats()["recycled"] == 1
+    assert backend.containers == {}
+    pool.stop()
+
+
+def test_docker_exec_stops_waiting_after_the_timeout(monkeypatch):
+    def slow_run(cmd, **kwargs):
+        raise subprocess.TimeoutExpired(cmd, kwargs["timeout"], output=b"partial\n")
+
+    monkeypatch.setattr("app.sandbox_pool.subprocess.run", slow_run)
+    result = DockerBackend().exec("runner", ["python", "main.py"], workdir="/work", timeout=2)
+    assert result == (TIMEOUT_EXIT, "partial\n", "Timed out after 2s\n")
+
+
+def test_docker_failure_is_retried_on_a_fresh_container(tmp_path):
+    (tmp_path / "main.py").write_text("")
+    results = iter([(125, "", "Error response from daemon: container is not running"), (0, "ok\n", "")])
+    pool, backend = make_pool(lambda image, argv, files: next(results), size=1)
+
+    assert pool.run(str(tmp_path), ["python", "main.py"]) == (0, "ok\n", "")
+    assert pool.stats()["recycled"] == 1
+
+    # A program that merely exits 125 is its own result
+    pool.backend.handler = lambda image, argv, files: (125, "", "boom")
+    assert pool.run(str(tmp_path), ["python", "main.py"]) == (125, "", "boom")
+
+    pool.backend.handler = lambda image, argv, files: (1, "", "Error response from daemon: No such container: x")
+    with pytest.raises(SandboxError):
+        pool.run(str(tmp_path), ["python", "main.py"])
+    assert pool.stats()["in_use"] == 0
+    pool.stop()
+
+
+def test_container_recycled_after_max_uses(tmp_path):
+    (tmp_path / "main.py").write_text("")
+    pool, backend = make_pool(size=1, max_uses=2)
+
+    pool.run(str(tmp_path), ["python", "main.py"])
+    pool.run(str(tmp_path), ["python", "main.py"])
+
+    assert pool.stats()["recycled"] == 1
+    assert backend.containers == {}
+    pool.stop()
+
+
+def test_idle_containers_are_evicted(tmp_path):
+    pool, backend = make_pool(size=1, max_idle=0)
+    pool.maintain()
+    first = list(backend.containers)
+
+    pool.maintain()
+
+    assert pool.stats()["recycled"] == 1
+    assert list(backend.containers) != first
+    assert len(backend.containers) == 1
+    pool.stop()
+
+
+def test_run_python_uses_pool_when_enabled(monkeypatch, tmp_path):
+    run_dir = tmp_path / "abc"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("print('pooled')")
+
+    pool, backend = make_pool(lambda image, argv, files: (0, "pooled\n", ""))
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.SANDBOX_POOL_SETTINGS", pool.settings)
+    monkeypatch.setattr("app.server.get_pool", lambda image, settings: pool)
+
+    from app.server import run_python
+    assert run_python("abc", "main.py") == (0, "pooled\n", "")
+    assert ("exec", next(iter(backend.containers)), ["python", "main.py"]) in backend.calls
+    pool.stop()
@@ -0,0 +1,112 @@
+from fastapi.testclient import TestClient
+from app.server import REPAIR_JOBS, app
+from app.static_checks import CandidateHistory, check_java, check_python
+from app.prompt_context import parse_frames
+
+PROJECT = {
+    "main.py": "from util import helper\nprint(helper())\n",
+    "util.py": "import os\n\nLIMIT = 3\n\n\ndef helper():\n    return LIMIT\n",
+}
+
+
+def check(files, entry="main.py"):
+    return check_python(files, list(PROJECT), PROJECT.get, entry)
+
+
+def test_python_syntax_error_reads_like_the_runner():
+    reason, err = check({"main.py": "Here is the fixed code:\nprint('ok')\n"})
+    assert reason == "syntax"
+    assert 'File "main.py", line 1' in err and "SyntaxError" in err
+    assert parse_frames(err, list(PROJECT))[0].path == "main.py"
+
+
+def test_python_imports_resolve_against_the_project():
+    assert check({"main.py": "import json\nfrom util import helper, LIMIT\nprint(helper())\n"}) is None
+
+    reason, err = check({"main.py": "from util import helpr\nprint(helpr())\n"})
+    assert reason == "imports"
+    assert "ImportError: cannot import name 'helpr' from 'util' (util.py)" in err
+
+    reason, err = check({"main.py": "import numpy\n"})
+    assert "No module named 'numpy'" in err
+
+    # Rewriting util.py so the untouched entry file's import breaks
+    reason, err = check({"util.py": "def other():\n    return 1\n"})
+    assert reason == "imports" and 'File "main.py", line 1' in err
+
+    # Optional imports and dynamic modules are left to the run
+    assert check({"main.py": "try:\n    import numpy\nexcept ImportError:\n    numpy = None\n"}) is None
+    assert check({"util.py": "def __getattr__(name):\n    return 1\n"}) is None
+
+
+def test_java_syntax_checks():
+    good = "public class Main {\n  public static void main(String[] a) {\n    System.out.println(\"}\");\n  }\n}\n"
+    assert check_java({"Main.java": good}, ["Main.java"]) is None
+
+    reason, err = check_java({"Main.java": good[:-2]}, ["Main.java"])
+    assert reason == "syntax" and "reached end of file while parsing" in err
+    assert err.startswith("Main.java:")
+
+    _, err = check_java({"Main.java": "Here is the fix:\n" + good}, ["Main.java"])
+    assert "Main.java:1: error: class, interface, enum, or record expected" in err
+
+    _, err = check_java({"Main.java": good.replace("class Main", "class Mian")}, ["Main.java"])
+    assert "class Mian is public" in err
+
+    _, err = check_java({"Main.java": good.replace("\"}\"", "\"}")}, ["Main.java"])
+    assert "unclosed string literal" in err
+
+
+def test_java_imports_of_project_packages():
+    code = "import com.acme.Util;\nimport java.util.List;\npublic class Main {}\n"
+    paths = ["Main.java", "com/acme/Helper.java"]
+    reason, err = check_java({"Main.java": code}, paths)
+    assert reason == "imports" and "symbol:   class Util" in err
+    assert check_java({"Main.java": code}, paths + ["com/acme/Util.java"]) is None
+
+
+def test_history_spots_repeated_project_states():
+    history = CandidateHistory(PROJECT)
+    assert history.claim(history.digest({})) == (True, None)
+    history.record(history.digest({}), (1, "", "boom"))
+
+    # Whitespace-only differences are the same program
+    same = {"util.py": PROJECT["util.py"] + "\n\n"}
+    assert history.claim(history.digest(same)) == (False, (1, "", "boom"))
+
+    changed = {"util.py": "LIMIT = 4\n"}
+    assert history.claim(history.digest(changed))[0] is True
+    history.advance(changed)
+    assert history.digest({}) == history.digest(changed)
+
+
+def test_rejected_candidates_skip_the_sandbox(monkeypatch, tmp_path, wait_for_job):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("print(1/0)\n")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+
+    answers = iter(["The fix is to not divide by zero.", "print(1/0)", "print(1)"])
+    monkeypatch.setattr("app.server.call_llm", lambda *a, **k: next(answers))
+    runs = []
+
+    def run_python(run_id, entry):
+        code = (tmp_path / run_id / entry).read_text()
+        runs.append(code)
+        return (0, "1\n", "") if code == "print(1)" else (1, "", "ZeroDivisionError: division by zero")
+
+    monkeypatch.setattr("app.server.run_python", run_python)
+    client = TestClient(app)
+    before = client.get("/sandbox/stats").json()["static_checks"]["runs_avoided"]
+
+    job_id = client.post("/repair/proj", json={"language": "python"}).json()["job_id"]
+    job = wait_for_job(client, job_id)
+
+    assert job["result"]["iterations"] == 3
+    # Only the initial run and the real fix were executed
+    assert runs == ["print(1/0)\n", "print(1)"]
+    stats = client.get("/sandbox/stats").json()["static_checks"]
+    assert stats["runs_avoided"] - before == 2
+    events = REPAIR_JOBS.get(job_id).events
+    rejected = [e for e in events if e["type"] == "iteration_complete" and e["data"].get("rejected")]
+    assert len(rejected) == 2
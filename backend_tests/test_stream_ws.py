@@ -0,0 +1,131 @@
+import threading
+import uuid
+
+from fastapi.testclient import TestClient
+from app.server import ISSUE_JOBS, REPAIR_JOBS, app
+
+
+def make_run(monkeypatch, tmp_path):
+    run_id = uuid.uuid4().hex
+    run_dir = tmp_path / run_id
+    run_dir.mkdir()
+    (run_dir / "test.py").write_text("broken")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    return run_id
+
+
+def receive_until_done(ws):
+    messages = []
+    while True:
+        msg = ws.receive_json()
+        messages.append(msg)
+        if msg["type"] in ("repair_complete", "error"):
+            return messages
+
+
+def test_stream_pushes_each_attempt(monkeypatch, tmp_path):
+    run_results = iter([(1, "", "NameError: x"), (0, "ok\n", "")])
+    monkeypatch.setattr("app.server.run_python", lambda *a: next(run_results))
+    monkeypatch.setattr("app.server.call_llm", lambda *a, **k: "print('ok')")
+    run_id = make_run(monkeypatch, tmp_path)
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/issues/issue-1/stream") as ws:
+        ws.send_json({"type": "start", "run_id": run_id, "language": "python"})
+        messages = receive_until_done(ws)
+
+    types = [m["type"] for m in messages]
+    assert types[0] == "iteration_start"
+    assert {"type": "output", "data": {"iterationId": f"{run_id}-0", "output": "NameError: x", "stream": "stderr"}} in messages
+    assert "iteration_update" in types
+
+    completed = [m["data"] for m in messages if m["type"] == "iteration_complete"]
+    assert [c["exit_code"] for c in completed] == [1, 0]
+    assert completed[1]["llm_seconds"] is not None
+
+    assert messages[-1]["type"] == "repair_complete"
+    assert messages[-1]["data"]["result"]["iterations"] == 1
+
+
+def test_cancel_stops_repair_before_next_sandbox_run(monkeypatch, tmp_path):
+    runs = []
+    llm_entered = threading.Event()
+    llm_release = threading.Event()
+
+    def fake_run(*a):
+        runs.append(a)
+        return 1, "", "error"
+
+    def slow_llm(*a, **k):
+        llm_entered.set()
+        llm_release.wait(5)
+        return "print('ok')"
+
+    monkeypatch.setattr("app.server.run_python", fake_run)
+    monkeypatch.setattr("app.server.call_llm", slow_llm)
+    run_id = make_run(monkeypatch, tmp_path)
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/issues/issue-2/stream") as ws:
+        ws.send_json({"type": "start", "run_id": run_id, "language": "python"})
+        assert llm_entered.wait(5)
+        ws.send_json({"type": "cancel"})
+
+        job = REPAIR_JOBS.get(ISSUE_JOBS["issue-2"])
+        assert job.cancel_requested.wait(5)
+        llm_release.set()
+        messages = receive_until_done(ws)
+
+    assert messages[-1] == {"type": "error", "data": {"message": "Repair cancelled", "code": "cancelled"}}
+    # Only the initial run happened; the candidate was never executed
+    assert len(runs) == 1
+
+
+def test_start_with_missing_entry_file_reports_error(monkeypatch, tmp_path):
+    run_id = make_run(monkeypatch, tmp_path)
+    (tmp_path / run_id / "other.py").write_text("")
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/issues/issue-3/stream") as ws:
+        ws.send_json({"type": "start", "run_id": run_id, "language": "python"})
+        msg = ws.receive_json()
+
+    assert msg["type"] == "error"
+    assert msg["data"]["code"] == "400"
+
+
+def test_reconnect_after_the_repair_finished_starts_fresh(monkeypatch, tmp_path):
+    llm_entered = threading.Event()
+    llm_release = threading.Event()
+
+    def slow_llm(*a, **k):
+        llm_entered.set()
+        llm_release.wait(5)
+        return "print('ok')"
+
+    runs = iter([(1, "", "error"), (0, "ok\n", ""), (1, "", "error"), (0, "ok\n", "")])
+    monkeypatch.setattr("app.server.run_python", lambda *a: next(runs))
+    monkeypatch.setattr("app.server.call_llm", slow_llm)
+    run_id = make_run(monkeypatch, tmp_path)
+
+    client = TestClient(app)
+    with client.websocket_connect("/ws/issues/issue-4/stream") as ws:
+        ws.send_json({"type": "start", "run_id": run_id, "language": "python"})
+        assert llm_entered.wait(5)
+    # The client went away mid-repair; the repair itself carries on
+    first = ISSUE_JOBS["issue-4"]
+    llm_release.set()
+    assert REPAIR_JOBS.wait(first, timeout=5).status == "succeeded"
+
+    # Any later connection forgets the finished repair
+    with client.websocket_connect("/ws/issues/issue-5/stream"):
+        pass
+    assert "issue-4" not in ISSUE_JOBS
+
+    with client.websocket_connect("/ws/issues/issue-4/stream") as ws:
+        ws.send_json({"type": "start", "run_id": run_id, "language": "python"})
+        messages = receive_until_done(ws)
+
+    assert messages[-1]["type"] == "repair_complete"
+    assert messages[-1]["data"]["jobId"] != first
+    assert "issue-4" not in ISSUE_JOBS
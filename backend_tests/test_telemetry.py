@@ -0,0 +1,69 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from app.server import app
+from app.llm_client import GenerationResult
+from app.telemetry import LLM_TOKENS, STAGE_ERRORS, STAGE_SECONDS, Registry, observe_generation, span
+
+
+def test_histogram_and_counter_render_in_prometheus_format():
+    registry = Registry()
+    hist = registry.histogram("t_seconds", "Test timings", ("stage",), buckets=(0.1, 1))
+    hist.observe(0.05, stage="a")
+    hist.observe(0.5, stage="a")
+    hist.observe(5, stage="a")
+    registry.counter("t_total", "Test count", ("kind",)).inc(3, kind='x"y')
+    registry.callback("t_depth", "Test gauge", lambda: 7)
+
+    text = registry.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="a"} 3' in text
+    assert 't_total{kind="x\\"y"} 3' in text
+    assert "t_depth 7" in text
+
+
+def test_span_times_stages_and_counts_errors():
+    before = STAGE_SECONDS.count(stage="test.stage")
+    with span("test.stage", run_id="r"):
+        pass
+    with pytest.raises(ValueError):
+        with span("test.stage"):
+            raise ValueError("boom")
+    assert STAGE_SECONDS.count(stage="test.stage") == before + 2
+    assert STAGE_ERRORS.value(stage="test.stage") >= 1
+
+
+def test_generation_stats_become_token_metrics():
+    before = LLM_TOKENS.value(kind="completion")
+    observe_generation(GenerationResult(text="x", seconds=2.0, stats={"prompt_eval_count": 10, "eval_count": 40,
+                                                                      "eval_duration": 2_000_000_000}))
+    assert LLM_TOKENS.value(kind="completion") == before + 40
+
+
+def test_repair_stages_show_up_in_metrics(monkeypatch, tmp_path, caplog, wait_for_job):
+    run_dir = tmp_path / "proj"
+    run_dir.mkdir()
+    (run_dir / "main.py").write_text("print(1/0)\n")
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.QUICK_FIXES", False)
+    monkeypatch.setattr("app.server.call_llm", lambda *a, **k: "print('SECRET ANSWER')")
+    runs = iter([(1, "", "ZeroDivisionError: division by zero"), (0, "SECRET ANSWER\n", "")])
+    monkeypatch.setattr("app.server.run_python", lambda *a: next(runs))
+    client = TestClient(app)
+
+    with caplog.at_level(logging.INFO):
+        job = wait_for_job(client, client.post("/repair/proj", json={"language": "python"}).json()["job_id"])
+    assert job["result"]["status"] == "success"
+    # Answers and program output are DEBUG-only
+    assert "SECRET ANSWER" not in caplog.text
+
+    text = client.get("/metrics").text
+    for stage in ("files.collect", "sandbox.run", "prompt.build", "llm.generate", "output.compare",
+                  "result.assemble", "repair"):
+        assert f'cici_stage_seconds_count{{stage="{stage}"}}' in text
+    assert 'cici_repairs_total{language="python",status="success"}' in text
+    assert "cici_repair_queue_depth 0" in text
@@ -0,0 +1,83 @@
+import io
+import os
+import zipfile
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.uploads import UploadLimits, UploadRejected, extract_zip
+
+
+def make_zip(path, entries):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, data in entries.items():
+            z.writestr(name, data)
+    return str(path)
+
+
+def test_extract_lists_files_and_skips_mac_junk(tmp_path):
+    archive = make_zip(tmp_path / "a.zip", {
+        "proj/main.py": "print(1)",
+        "proj/pkg/util.py": "X = 1",
+        "__MACOSX/proj/._main.py": "junk",
+        "proj/.DS_Store": "junk",
+        "proj/.git/HEAD": "junk",
+        "proj/data/samples.zip": "PK",
+    })
+    dest = tmp_path / "out"
+    dest.mkdir()
+
+    extracted = extract_zip(archive, str(dest), UploadLimits())
+
+    assert sorted(extracted) == [("proj/data/samples.zip", 2), ("proj/main.py", 8), ("proj/pkg/util.py", 5)]
+    assert not (dest / "__MACOSX").exists()
+
+
+@pytest.mark.parametrize("entries, limits, message", [
+    ({f"f{i}.py": "" for i in range(5)}, UploadLimits(max_files=3), "more than 3 files"),
+    ({"big.txt": "0" * 100_000}, UploadLimits(max_ratio=10), "compression ratio"),
+    ({"a.txt": os.urandom(3000).hex()}, UploadLimits(max_uncompressed_bytes=1000), "expands to more than"),
+    ({"../evil.py": "x"}, UploadLimits(), "Illegal path"),
+])
+def test_extract_enforces_limits(tmp_path, entries, limits, message):
+    archive = make_zip(tmp_path / "a.zip", entries)
+    dest = tmp_path / "out"
+    dest.mkdir()
+
+    with pytest.raises(UploadRejected) as e:
+        extract_zip(archive, str(dest), limits)
+    assert message in e.value.detail
+    assert not (tmp_path / "evil.py").exists()
+
+
+def test_upload_zip_endpoint_extracts_and_drops_archive(monkeypatch, tmp_path):
+    from app.server import app
+
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as z:
+        z.writestr("proj/main.py", "print(1)")
+        z.writestr("proj/.env", "SECRET=1")
+
+    resp = TestClient(app).post("/upload", files={"file": ("proj.zip", buf.getvalue())})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["files"] == ["proj/main.py"]
+    run_dir = tmp_path / body["run_id"]
+    assert not (run_dir / "upload.zip").exists()
+    assert (run_dir / "proj" / "main.py").read_text() == "print(1)"
+    # The manifest comes from the extraction listing
+    assert os.path.exists(str(run_dir) + ".manifest.json")
+
+
+def test_upload_rejects_oversized_file(monkeypatch, tmp_path):
+    from app.server import app
+
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.UPLOAD_LIMITS", UploadLimits(max_upload_bytes=10))
+
+    resp = TestClient(app).post("/upload", files={"file": ("main.py", b"x" * 100)})
+
+    assert resp.status_code == 413
+    assert os.listdir(tmp_path) == []
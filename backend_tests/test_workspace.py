@@ -0,0 +1,80 @@
+import os
+import subprocess
+import sys
+
+from app.workspace import MOUNT_SCRIPT, host_path, link_tree, mounted_run_command
+
+
+def test_link_tree_shares_inodes_and_skips_zip(tmp_path):
+    src = tmp_path / "run"
+    (src / "pkg").mkdir(parents=True)
+    (src / "main.py").write_text("import pkg.util")
+    (src / "pkg" / "util.py").write_text("X = 1")
+    (src / "upload.zip").write_bytes(b"PK")
+
+    dst = tmp_path / "run.cand0"
+    link_tree(str(src), str(dst))
+
+    assert os.stat(dst / "pkg" / "util.py").st_ino == os.stat(src / "pkg" / "util.py").st_ino
+    assert not (dst / "upload.zip").exists()
+
+
+def test_write_candidate_does_not_touch_linked_original(tmp_path):
+    from app.server import write_candidate
+
+    src = tmp_path / "run"
+    src.mkdir()
+    (src / "main.py").write_text("broken")
+    dst = tmp_path / "run.cand0"
+    link_tree(str(src), str(dst))
+
+    write_candidate(str(dst), {"main.py": "fixed"})
+
+    assert (dst / "main.py").read_text() == "fixed"
+    assert (src / "main.py").read_text() == "broken"
+
+
+def test_host_path_mapping():
+    assert host_path("/repair_data/abc", "/repair_data", None) == "/repair_data/abc"
+    assert host_path("/repair_data/abc", "/repair_data", "/home/me/repair_data") == "/home/me/repair_data/abc"
+
+
+def test_run_python_mount_mode_uses_read_only_bind_mount(monkeypatch, tmp_path):
+    (tmp_path / "abc").mkdir()
+    (tmp_path / "abc" / "main.py").write_text("print(1)")
+    commands = []
+
+    class Done:
+        returncode, stdout, stderr = 0, "1\n", ""
+
+    monkeypatch.setattr("app.server.WORKDIR", str(tmp_path))
+    monkeypatch.setattr("app.server.HOST_WORKDIR", "/host/repair_data")
+    monkeypatch.setattr("app.server.SANDBOX_WORKSPACE_MODE", "mount")
+    monkeypatch.setattr("subprocess.run", lambda cmd, **k: commands.append(cmd) or Done())
+
+    from app.server import run_python
+    assert run_python("abc", "main.py") == (0, "1\n", "")
+
+    assert len(commands) == 1
+    cmd = commands[0]
+    assert cmd[:3] == ["docker", "run", "--rm"]
+    assert "/host/repair_data/abc:/src:ro" in cmd
+    assert "cp" not in cmd[:cmd.index("python-runner")]
+    assert cmd[-2:] == ["python", "main.py"]
+    assert cmd == mounted_run_command("python-runner", "/host/repair_data/abc", ["python", "main.py"])
+
+
+def test_mounted_program_can_rewrite_its_own_files(tmp_path):
+    src, work = tmp_path / "src", tmp_path / "work"
+    (src / "data").mkdir(parents=True)
+    (src / "data" / "log.txt").write_text("old\n")
+    work.mkdir()
+    # The container's /src and /work, as plain directories
+    script = MOUNT_SCRIPT.replace("/src", str(src)).replace("/work", str(work))
+    program = "open('data/log.txt', 'a').write('new\\n'); print(open('data/log.txt').read(), end='')"
+
+    proc = subprocess.run(["sh", "-c", script, "sh", sys.executable, "-c", program],
+                          cwd=work, capture_output=True, text=True)
+
+    assert (proc.returncode, proc.stdout) == (0, "old\nnew\n")
+    assert (src / "data" / "log.txt").read_text() == "old\n"
@@ -0,0 +1,421 @@
+"""
+Benchmarks for the repair service.
+
+    python benchmarks/bench.py run --output results.json
+    python benchmarks/bench.py compare baseline.json results.json
+
+`run` measures, in process and with the fakes of fakes.py in place of
+Ollama and docker:
+  - e2e:     /upload -> /repair -> finished job latency percentiles and
+             throughput under N concurrent clients, for the app/examples
+             corpus and for generated multi-file projects
+  - extract: zip extraction speed against archive size
+  - clone:   /github-clone of a local repository, cold and from the mirror
+With --url only e2e runs, against that server and its real LLM and runners.
+
+Results are written as sorted JSON so two runs diff cleanly; `compare`
+prints the changes and exits with 1 when a timing got worse than the
+threshold allows.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# app/ modules import each other flat, as they do inside the API container
+for path in (HERE, os.path.join(HERE, "..", "app")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import Catalog, FakeLLM, FakeRunner, patched  # noqa: E402
+from workloads import example_projects, generated_project, local_repo, source_files, zip_bytes  # noqa: E402
+
+RESULTS_FORMAT = 1
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+
+# ================================
+# E2E LOAD
+# ================================
+
+class RemoteClient:
+    """The TestClient calls the load generator makes, against a running server."""
+
+    def __init__(self, url: str):
+        import requests
+        self.url = url.rstrip("/")
+        self.session = requests.Session()
+
+    def get(self, path: str, **kwargs):
+        return self.session.get(self.url + path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.session.post(self.url + path, **kwargs)
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def rank(p):
+        # Nearest-rank percentile
+        return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+    return {
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": ordered[-1],
+        "mean": statistics.fmean(ordered),
+    }
+
+
+def repair_once(client, project, poll: float, timeout: float) -> dict:
+    """Upload one project, repair it and wait for the job -> timings and outcome."""
+    started = time.perf_counter()
+    filename, data = project.upload()
+    resp = client.post("/upload", params={"language": "python"}, files={"file": (filename, data)})
+    if resp.status_code != 200:
+        return {"status": f"upload {resp.status_code}", "seconds": time.perf_counter() - started}
+    uploaded = time.perf_counter()
+
+    resp = client.post(f"/repair/{resp.json()['run_id']}", json=project.repair_request())
+    if resp.status_code != 202:
+        return {"status": f"repair {resp.status_code}", "seconds": time.perf_counter() - started}
+    job_id = resp.json()["job_id"]
+
+    deadline = started + timeout
+    while True:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in TERMINAL_STATES or time.perf_counter() > deadline:
+            break
+        time.sleep(poll)
+    result = job.get("result") or {}
+    return {
+        "status": result.get("status") or job["status"],
+        "seconds": time.perf_counter() - started,
+        "upload_seconds": uploaded - started,
+        "queue_seconds": job.get("wait_seconds"),
+        "iterations": result.get("iterations"),
+    }
+
+
+def run_load(client, projects: list, clients: int, poll: float = 0.01, timeout: float = 300.0,
+             catalog: Catalog | None = None) -> dict:
+    """
+    Repair every project with `clients` concurrent clients. Each request gets
+    its own renamed copy so no two requests share prompts or cached results.
+    """
+    counter = iter(range(len(projects)))
+    lock = threading.Lock()
+
+    def one(project):
+        with lock:
+            index = next(counter)
+        project = project.renamed(f"{project.name}-{index}")
+        if catalog is not None:
+            catalog.add(project)
+        return repair_once(client, project, poll, timeout)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        outcomes = list(pool.map(one, projects))
+    wall = time.perf_counter() - started
+
+    succeeded = [o for o in outcomes if o["status"] == "success"]
+    iterations = [o["iterations"] for o in succeeded if o.get("iterations") is not None]
+    return {
+        "clients": clients,
+        "requests": len(outcomes),
+        "succeeded": len(succeeded),
+        "failed": len(outcomes) - len(succeeded),
+        "throughput_per_second": len(outcomes) / wall if wall else 0.0,
+        "latency_seconds": percentiles([o["seconds"] for o in outcomes]),
+        "upload_seconds": percentiles([o["upload_seconds"] for o in outcomes if "upload_seconds" in o]),
+        "queue_seconds": percentiles([o["queue_seconds"] for o in outcomes if o.get("queue_seconds") is not None]),
+        "iterations_mean": statistics.fmean(iterations) if iterations else 0.0,
+    }
+
+
+def stage_means(before: dict, after: dict) -> dict:
+    """Mean seconds per pipeline stage between two cici_stage_seconds snapshots."""
+    means = {}
+    for key, (count, total) in after.items():
+        old_count, old_total = before.get(key, (0, 0.0))
+        if count > old_count:
+            means[key[0]] = (total - old_total) / (count - old_count)
+    return means
+
+
+def workload(name: str, requests: int, modules: int, functions: int) -> list:
+    if name == "examples":
+        corpus = example_projects()
+        return [corpus[i % len(corpus)] for i in range(requests)]
+    if name == "large":
+        return [generated_project("large", modules, functions)] * requests
+    raise ValueError(f"Unknown workload '{name}'")
+
+
+def bench_e2e(args, server=None) -> dict:
+    results = {}
+    for name in args.workloads:
+        projects = workload(name, args.requests, args.modules, args.functions)
+        for clients in args.clients:
+            if server is None:
+                summary = run_load(RemoteClient(args.url), projects, clients, args.poll, args.timeout)
+            else:
+                summary = run_in_process(server, projects, clients, args)
+            results[f"e2e.{name}.c{clients}"] = summary
+            print(f"e2e {name} x{clients}: p50 {summary['latency_seconds']['p50']:.3f}s "
+                  f"p99 {summary['latency_seconds']['p99']:.3f}s "
+                  f"{summary['throughput_per_second']:.1f} req/s, {summary['failed']} failed")
+    return results
+
+
+def run_in_process(server, projects: list, clients: int, args) -> dict:
+    from fastapi.testclient import TestClient
+    from telemetry import STAGE_SECONDS
+
+    catalog = Catalog()
+    workdir = tempfile.mkdtemp(prefix="cici-bench-")
+    llm = FakeLLM(catalog, args.llm_latency, args.llm_tokens_per_second, args.llm_misses)
+    runner = FakeRunner(catalog, workdir, args.run_latency)
+    try:
+        with patched(server, WORKDIR=workdir, call_llm=llm, run_python=runner, run_java=runner):
+            before = STAGE_SECONDS.snapshot()
+            summary = run_load(TestClient(server.app), projects, clients, args.poll, args.timeout, catalog)
+            summary["stages"] = stage_means(before, STAGE_SECONDS.snapshot())
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    summary["llm_calls"] = llm.calls
+    summary["sandbox_runs"] = runner.runs
+    return summary
+
+
+# ================================
+# EXTRACTION AND CLONES
+# ================================
+
+def bench_extract(sizes: list, repeats: int = 3) -> dict:
+    """Median extract_zip time for archives of count files x size bytes."""
+    from uploads import UploadLimits, extract_zip
+
+    limits = UploadLimits(max_upload_bytes=1 << 40, max_files=1 << 20, max_uncompressed_bytes=1 << 40,
+                          max_ratio=1e9)
+    results = {}
+    for count, size in sizes:
+        files = source_files(count, size)
+        data = zip_bytes(files)
+        uncompressed = sum(len(text) for text in files.values())
+        timings = []
+        for _ in range(repeats):
+            with tempfile.TemporaryDirectory(prefix="cici-bench-") as tmp:
+                archive = os.path.join(tmp, "upload.zip")
+                with open(archive, "wb") as f:
+                    f.write(data)
+                started = time.perf_counter()
+                extract_zip(archive, os.path.join(tmp, "out"), limits)
+                timings.append(time.perf_counter() - started)
+        seconds = statistics.median(timings)
+        results[f"extract.{count}x{size}"] = {
+            "files": count,
+            "archive_bytes": len(data),
+            "uncompressed_bytes": uncompressed,
+            "seconds": seconds,
+            "mb_per_second": uncompressed / seconds / 1e6 if seconds else 0.0,
+        }
+        print(f"extract {count} x {size}B: {seconds:.3f}s")
+    return results
+
+
+def bench_clone(server, files: int, size: int) -> dict:
+    """/github-clone of a local repository: first clone, repeat from the mirror, paged listing."""
+    from fastapi.testclient import TestClient
+    from git_mirror import RepoMirrors
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="cici-bench-") as tmp:
+        url = "file://" + local_repo(os.path.join(tmp, "origin"), files, size)
+        mirrors = RepoMirrors(os.path.join(tmp, "mirrors"), refresh=0)
+        with patched(server, REPO_MIRRORS=mirrors, GITHUB_URL_PREFIXES=("file://",)):
+            client = TestClient(server.app)
+            for name, body in (
+                ("cold", {"url": url}),
+                ("warm", {"url": url}),
+                ("listing", {"url": url, "include_content": False, "page_size": 100}),
+            ):
+                started = time.perf_counter()
+                resp = client.post("/github-clone", json=body)
+                seconds = time.perf_counter() - started
+                resp.raise_for_status()
+                results[f"clone.{name}"] = {"files": resp.json()["total_files"], "seconds": seconds}
+                print(f"clone {name} ({files} files): {seconds:.3f}s")
+    return results
+
+
+# ================================
+# RESULTS
+# ================================
+
+def rounded(value):
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {k: rounded(v) for k, v in value.items()}
+    return value
+
+
+def write_results(path: str, settings: dict, results: dict) -> None:
+    document = {
+        "format": RESULTS_FORMAT,
+        "environment": {"python": platform.python_version(), "cpus": os.cpu_count(), "machine": platform.machine()},
+        "settings": settings,
+        "results": rounded(results),
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def direction(metric: str) -> int:
+    """+1 when higher is better, -1 when lower is better, 0 for plain counts."""
+    if metric.endswith("per_second"):
+        return 1
+    if "seconds" in metric or metric.endswith(".failed"):
+        return -1
+    return 0
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.25, min_delta: float = 0.005) -> list:
+    """
+    [(metric, old, new, regressed)] for every metric that changed. A timing
+    regresses when it is worse by more than threshold (a fraction) and by
+    more than min_delta in absolute terms, so millisecond noise isn't flagged.
+    """
+    old, new = flatten(baseline["results"]), flatten(current["results"])
+    changes = []
+    for metric in sorted(set(old) | set(new)):
+        a, b = old.get(metric), new.get(metric)
+        if a == b:
+            continue
+        regressed = False
+        sign = direction(metric)
+        if a is not None and b is not None and sign:
+            worse = (a - b) if sign > 0 else (b - a)
+            if metric.endswith(".failed"):
+                regressed = worse > 0
+            else:
+                regressed = worse > abs(a) * threshold and (sign > 0 or worse > min_delta)
+        changes.append((metric, a, b, regressed))
+    return changes
+
+
+def print_comparison(changes: list) -> None:
+    for metric, a, b, regressed in changes:
+        if a is None or b is None:
+            print(f"  {metric}: {a} -> {b}")
+            continue
+        change = f" ({(b - a) / a:+.0%})" if a else ""
+        print(f"  {metric}: {a:g} -> {b:g}{change}{'  REGRESSION' if regressed else ''}")
+
+
+# ================================
+# CLI
+# ================================
+
+def parse_sizes(text: str) -> list:
+    """"10x2000,200x5000" -> [(10, 2000), (200, 5000)]"""
+    return [tuple(int(n) for n in item.split("x")) for item in text.split(",") if item]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="run the benchmarks and write a results file")
+    run.add_argument("--output", default="bench-results.json")
+    run.add_argument("--suites", default="e2e,extract,clone", help="comma-separated: e2e, extract, clone")
+    run.add_argument("--url", help="benchmark a running server instead (e2e only, no fakes)")
+    run.add_argument("--workloads", default="examples,large", help="comma-separated: examples, large")
+    run.add_argument("--clients", default="1,4,16", help="comma-separated concurrency levels")
+    run.add_argument("--requests", type=int, default=32, help="repairs per workload and concurrency level")
+    run.add_argument("--modules", type=int, default=40, help="helper modules per generated project")
+    run.add_argument("--functions", type=int, default=20, help="functions per generated module")
+    run.add_argument("--workers", type=int, help="REPAIR_WORKERS for the in-process server")
+    run.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM seconds per call")
+    run.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="fake LLM generation speed (0 = instant)")
+    run.add_argument("--llm-misses", type=int, default=0, help="wrong fake answers before the fix")
+    run.add_argument("--run-latency", type=float, default=0.02, help="fake runner seconds per execution")
+    run.add_argument("--extract-sizes", default="10x2000,200x5000,1000x20000", help="archives as FILESxBYTES")
+    run.add_argument("--clone-files", type=int, default=500)
+    run.add_argument("--poll", type=float, default=0.01, help="seconds between job status polls")
+    run.add_argument("--timeout", type=float, default=300.0, help="seconds before a repair counts as failed")
+
+    cmp = commands.add_parser("compare", help="compare two results files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.25, help="allowed relative slowdown")
+    cmp.add_argument("--min-delta", type=float, default=0.005, help="ignore slowdowns smaller than this (seconds)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        changes = compare(baseline, current, args.threshold, args.min_delta)
+        print_comparison(changes)
+        regressions = [c for c in changes if c[3]]
+        print(f"{len(changes)} changed, {len(regressions)} regressed")
+        return 1 if regressions else 0
+
+    args.workloads = [w for w in args.workloads.split(",") if w]
+    args.clients = [int(c) for c in args.clients.split(",") if c]
+    suites = [s for s in args.suites.split(",") if s]
+    settings = {k: v for k, v in vars(args).items() if k not in ("command", "output")}
+
+    server = None
+    if not args.url:
+        # The server reads these at import time
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        if args.workers:
+            os.environ["REPAIR_WORKERS"] = str(args.workers)
+        import server
+
+    results = {}
+    if "e2e" in suites:
+        results.update(bench_e2e(args, server))
+    if "extract" in suites and server is not None:
+        results.update(bench_extract(parse_sizes(args.extract_sizes)))
+    if "clone" in suites and server is not None:
+        results.update(bench_clone(server, args.clone_files, 2000))
+
+    write_results(args.output, settings, results)
+    print(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Deterministic stand-ins for the LLM and the sandbox runners.
+
+Both find the project they are working on through the marker line of
+workloads.py, so they need no state per run. FakeLLM answers with the
+project's fix after `misses` wrong answers per prompt; FakeRunner fails
+while the project's bug is present. Latencies are sleeps, so the numbers
+measure the service's own overhead plus whatever latency is configured.
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from workloads import MARKER
+
+_MARKER_RE = re.compile(re.escape(MARKER) + r"(\S+)")
+
+
+class Catalog:
+    """Projects by name, shared by the fakes and the load generator."""
+
+    def __init__(self):
+        self._projects = {}
+        self._lock = threading.Lock()
+
+    def add(self, project) -> None:
+        with self._lock:
+            self._projects[project.name] = project
+
+    def find(self, text: str):
+        match = _MARKER_RE.search(text)
+        return self._projects.get(match.group(1)) if match else None
+
+
+class FakeLLM:
+    """
+    call_llm replacement. latency is per call; tokens_per_second adds the
+    time a model would spend generating the answer (about 4 chars a token).
+    """
+
+    def __init__(self, catalog: Catalog, latency: float = 0.0, tokens_per_second: float = 0.0, misses: int = 0):
+        self.catalog = catalog
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.misses = misses
+        self.calls = 0
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str, format: str | None = None, use_cache: bool = True, **kwargs) -> str:
+        with self._lock:
+            self.calls += 1
+            count = self._seen[prompt] = self._seen.get(prompt, 0) + 1
+
+        project = self.catalog.find(prompt)
+        if project is None or project.bug is None:
+            answer_code = "print('no idea')"
+            path = project.entry if project else "main.py"
+        else:
+            path = project.bug_file
+            if count <= self.misses:
+                # A different wrong answer each time, so it isn't rejected as a duplicate
+                answer_code = project.files[path] + f"\n# attempt {count}\n"
+            else:
+                answer_code = project.fixed()
+        answer = json.dumps({path: answer_code}) if format == "json" else answer_code
+
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += len(answer) / 4 / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+        return answer
+
+
+class FakeRunner:
+    """run_python / run_java replacement reading the run directory under workdir."""
+
+    def __init__(self, catalog: Catalog, workdir: str, latency: float = 0.0):
+        self.catalog = catalog
+        self.workdir = workdir
+        self.latency = latency
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, run_id: str, entry_file: str):
+        with self._lock:
+            self.runs += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        base = os.path.join(self.workdir, run_id)
+        with open(os.path.join(base, entry_file)) as f:
+            project = self.catalog.find(f.readline())
+        if project is None:
+            return 1, "", f"{entry_file}: not a benchmark project"
+        if project.bug is not None:
+            with open(os.path.join(base, project.bug_file)) as f:
+                if project.bug in f.read():
+                    return project.failure
+        return 0, project.output, ""
+
+
+@contextmanager
+def patched(module, **attrs):
+    """Temporarily replace module attributes (the server's LLM, runners, workdir, ...)."""
+    saved = {name: getattr(module, name) for name in attrs}
+    for name, value in attrs.items():
+        setattr(module, name, value)
+    try:
+        yield module
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
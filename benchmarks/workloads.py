@@ -0,0 +1,182 @@
+"""
+Projects the benchmark uploads, and the archives and repositories it
+ingests.
+
+Every project carries a marker line naming it, so the fake runner and the
+fake LLM (see fakes.py) can tell which project a run directory or a prompt
+belongs to. Each project has one known bug: a string in bug_file that the
+fake runner fails on while it is present, and the replacement the fake LLM
+answers with. Contents are deterministic, so two benchmark runs send
+byte-identical uploads.
+"""
+import io
+import os
+import subprocess
+import zipfile
+from dataclasses import dataclass
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(__file__), "..", "app", "examples")
+MARKER = "# bench-project: "
+
+
+@dataclass
+class Project:
+    name: str
+    files: dict  # {relative_path: contents}
+    entry: str
+    bug_file: str
+    bug: str | None  # None: the project already works
+    fix: str = ""
+    failure: tuple = (1, "", "")  # (returncode, stdout, stderr) while the bug is present
+    output: str = ""  # stdout once fixed
+    expected_output: str | None = None
+
+    def fixed(self) -> str:
+        return self.files[self.bug_file].replace(self.bug, self.fix, 1)
+
+    def renamed(self, name: str) -> "Project":
+        """A copy under a unique name, so concurrent uploads never share prompts or cache entries."""
+        files = {
+            path: text.replace(MARKER + self.name + "\n", MARKER + name + "\n", 1)
+            for path, text in self.files.items()
+        }
+        return Project(name, files, self.entry, self.bug_file, self.bug, self.fix,
+                       self.failure, self.output, self.expected_output)
+
+    def upload(self) -> tuple:
+        """(filename, bytes) for /upload: the file itself, or a zip of a multi-file project."""
+        if len(self.files) == 1:
+            return self.entry, self.files[self.entry].encode()
+        return f"{self.name}.zip", zip_bytes(self.files)
+
+    def repair_request(self) -> dict:
+        body = {"language": "python", "expected_output": self.expected_output}
+        if len(self.files) > 1:
+            body["entry_file"] = self.entry
+        return body
+
+
+def _traceback(line: int, error: str) -> str:
+    return f'Traceback (most recent call last):\n  File "/work/main.py", line {line}, in <module>\n{error}'
+
+
+# (bug, fix, failure, fixed output, expected_output) per app/examples file
+EXAMPLE_BUGS = {
+    "division_error.py": ("count = 0  # Bug: should be len(numbers)", "count = len(numbers)",
+                          (1, "", _traceback(5, "ZeroDivisionError: division by zero")), "Average: 30.0\n", None),
+    "index_error.py": ("items[10]", "items[-1]",
+                       (1, "", _traceback(4, "IndexError: list index out of range")),
+                       "First: apple, Last: cherry\n", None),
+    "logic_error.py": ("total = 1", "total = 0", (0, "Sum: 151\n", ""), "Sum: 150\n", "Sum: 150"),
+    "name_error.py": ('print(f"Email: {email}")', 'print("Email: unknown")',
+                      (1, "Name: Alice\nAge: 25\n", _traceback(7, "NameError: name 'email' is not defined")),
+                      "Name: Alice\nAge: 25\nEmail: unknown\n", None),
+    "syntax_error.py": ("def greet(name)\n", "def greet(name):\n",
+                        (1, "", '  File "/work/main.py", line 3\n    def greet(name)\n'
+                                '                   ^\nSyntaxError: expected \':\''),
+                        "Hello, World!\n", None),
+    "type_error.py": ('", Age: " + age', '", Age: " + str(age)',
+                      (1, "", _traceback(3, 'TypeError: can only concatenate str (not "int") to str')),
+                      "Name: Bob, Age: 30\n", None),
+    "working_example.py": (None, "", (0, "", ""), "Fibonacci(10) = 55\n", None),
+}
+
+
+def example_projects() -> list:
+    """The app/examples corpus, one single-file project per example."""
+    projects = []
+    for filename, (bug, fix, failure, output, expected) in sorted(EXAMPLE_BUGS.items()):
+        with open(os.path.join(EXAMPLES_DIR, filename)) as f:
+            code = f.read()
+        name = filename[:-3]
+        projects.append(Project(
+            name=name,
+            files={filename: MARKER + name + "\n" + code},
+            entry=filename,
+            bug_file=filename,
+            bug=bug,
+            fix=fix,
+            failure=failure,
+            output=output,
+            expected_output=expected,
+        ))
+    return projects
+
+
+def generated_project(name: str, modules: int = 40, functions: int = 20) -> Project:
+    """
+    A multi-file project: main.py imports `modules` helper modules with
+    `functions` functions each and checks a result. The bug is in main.py;
+    the helpers only make the upload, the manifest and the prompt context large.
+    """
+    files = {}
+    for m in range(modules):
+        lines = [f'"""Helper module {m} of a generated benchmark project."""', ""]
+        for fn in range(functions):
+            lines += [
+                f"def step_{fn}(value):",
+                f"    # Mixes the value a little: step {fn} of module {m}",
+                f"    return (value * {fn + 3} + {m}) % 1000003",
+                "",
+            ]
+        lines += ["def run(value):"]
+        lines += [f"    value = step_{fn}(value)" for fn in range(functions)]
+        lines += ["    return value", ""]
+        files[f"pkg/mod_{m:03d}.py"] = "\n".join(lines)
+    files["pkg/__init__.py"] = ""
+    imports = "\n".join(f"from pkg import mod_{m:03d}" for m in range(modules))
+    calls = "\n".join(f"total = mod_{m:03d}.run(total)" for m in range(modules))
+    files["main.py"] = (
+        f"{MARKER}{name}\n{imports}\n\ntotal = 1\n{calls}\n"
+        "checksum = 0  # bench bug\n"
+        'assert checksum == total, "wrong checksum"\n'
+        'print("checksum ok")\n'
+    )
+    return Project(
+        name=name,
+        files=files,
+        entry="main.py",
+        bug_file="main.py",
+        bug="checksum = 0  # bench bug",
+        fix="checksum = total",
+        failure=(1, "", _traceback(modules + 4, "AssertionError: wrong checksum")),
+        output="checksum ok\n",
+    )
+
+
+def zip_bytes(files: dict) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for path, text in sorted(files.items()):
+            # Fixed timestamps keep the archive byte-identical between runs
+            archive.writestr(zipfile.ZipInfo(path, date_time=(2024, 1, 1, 0, 0, 0)), text,
+                             compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+def source_files(count: int, size: int) -> dict:
+    """count Python files of about size bytes each, compressible like real source."""
+    files = {}
+    for i in range(count):
+        lines = []
+        n = 0
+        while n < size:
+            line = f"value_{n % 97} = compute({i}, {n}, 'text {n * 7 % 13}')\n"
+            lines.append(line)
+            n += len(line)
+        files[f"src/part_{i // 100:02d}/file_{i:05d}.py"] = "".join(lines)
+    return files
+
+
+def local_repo(path: str, count: int, size: int) -> str:
+    """A git repository at path with one commit of source_files(count, size)."""
+    for rel, text in source_files(count, size).items():
+        target = os.path.join(path, rel)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w") as f:
+            f.write(text)
+    git = ["git", "-C", path, "-c", "user.email=bench@localhost", "-c", "user.name=bench"]
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True, capture_output=True)
+    subprocess.run(git + ["add", "."], check=True, capture_output=True)
+    subprocess.run(git + ["commit", "-q", "-m", "bench"], check=True, capture_output=True)
+    return path
@@ -20,6 +20,7 @@ import type {
 
 // Configuration
 const API_BASE_URL = import.meta.env.VITE_API_URL || "http://localhost:8000";
+const WS_BASE_URL = import.meta.env.VITE_WS_URL || "ws://localhost:8000";
 
 // Helper function for fetch with error handling
 
@@ -128,32 +129,35 @@ export class IterationWebSocket {
   }
 
   connect(
-    _onMessage: (data: unknown) => void,
-    _onError?: (error: Event) => void
+    onMessage: (data: unknown) => void,
+    onError?: (error: Event) => void
   ): void {
-    // TODO: Replace with actual WebSocket connection
-    // this.ws = new WebSocket(`${WS_BASE_URL}/ws/issues/${this.issueId}/stream`);
+    this.ws = new WebSocket(`${WS_BASE_URL}/ws/issues/${this.issueId}/stream`);
 
-    // Mock implementation
-    console.log(`WebSocket connecting to issue ${this.issueId}...`);
+    this.ws.onopen = () => {
+      console.log("WebSocket connected");
+    };
 
-    // this.ws.onopen = () => {
-    //   console.log('WebSocket connected');
-    // };
+    this.ws.onmessage = (event) => {
+      onMessage(JSON.parse(event.data));
+    };
 
-    // this.ws.onmessage = (event) => {
-    //   const data = JSON.parse(event.data);
-    //   this.onMessageCallback?.(data);
-    // };
+    this.ws.onerror = (error) => {
+      console.error("WebSocket error:", error);
+      onError?.(error);
+    };
 
-    // this.ws.onerror = (error) => {
-    //   console.error('WebSocket error:', error);
-    //   this.onErrorCallback?.(error);
-    // };
+    this.ws.onclose = () => {
+      console.log("WebSocket closed");
+    };
+  }
+
+  start(runId: string, request: RepairRequest): void {
+    this.send({ type: "start", run_id: runId, ...request });
+  }
 
-    // this.ws.onclose = () => {
-    //   console.log('WebSocket closed');
-    // };
+  cancel(): void {
+    this.send({ type: "cancel" });
   }
 
   disconnect(): void {
@@ -217,7 +221,27 @@ export async function uploadFile(file: File, language: string): Promise<UploadRe
   return response.json();
 }
 
+export interface RepairJob {
+  job_id: string;
+  status: "queued" | "running" | "succeeded" | "failed" | "cancelled";
+  result?: RepairResponse;
+  error?: string;
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
+export async function getRepairJob(jobId: string): Promise<RepairJob> {
+  const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`);
+
+  if (!response.ok) {
+    throw new Error(`Failed to fetch repair job: ${response.statusText}`);
+  }
+
+  return response.json();
+}
+
 export async function repairCode(runId: string, request: RepairRequest): Promise<RepairResponse> {
+  // The backend queues the repair and returns a job id; poll until it finishes
   const response = await fetch(`${API_BASE_URL}/repair/${runId}`, {
     method: "POST",
     headers: {
@@ -230,7 +254,21 @@ export async function repairCode(runId: string, request: RepairRequest): Promise
     throw new Error(`Repair failed: ${response.statusText}`);
   }
 
-  return response.json();
+  const { job_id } = await response.json();
+
+  for (;;) {
+    const job = await getRepairJob(job_id);
+    if (job.status === "succeeded" && job.result) {
+      return job.result;
+    }
+    if (job.status === "failed") {
+      throw new Error(`Repair failed: ${job.error ?? "unknown error"}`);
+    }
+    if (job.status === "cancelled") {
+      throw new Error("Repair cancelled");
+    }
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
 }
 
 // GitHub API
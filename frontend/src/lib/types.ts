@@ -110,6 +110,10 @@ export interface ReviewChangesRequest {
 export interface GitHubCloneRequest {
   url: string;
   token?: string;
+  language?: string;
+  page?: number;
+  page_size?: number;
+  include_content?: boolean;
 }
 
 export interface GitHubFile {
@@ -124,12 +128,26 @@ export interface GitHubCloneResponse {
   files: GitHubFile[];
   total_files: number;
   detected_language?: string;
+  repo_id?: string;
+  commit?: string;
+  page?: number;
+  total_pages?: number;
 }
 
 // WebSocket message types
 
 export interface WebSocketMessage {
-  type: 'iteration_start' | 'iteration_update' | 'iteration_complete' | 'output' | 'error';
+  type:
+    | 'iteration_start'
+    | 'iteration_update'
+    | 'iteration_complete'
+    | 'output'
+    | 'repair_complete'
+    | 'error'
+    | 'context'
+    | 'strategy'
+    | 'tier'
+    | 'quick_fix';
   data: unknown;
 }
 
@@ -159,3 +177,47 @@ export interface ErrorMessage extends WebSocketMessage {
     code?: string;
   };
 }
+
+export interface ContextMessage extends WebSocketMessage {
+  type: 'context';
+  data: {
+    iterationId: string;
+    budget: number;
+    tokens_used: number;
+    full: string[];        // Files sent in full
+    summarized: string[];  // Files sent as declarations only
+    omitted: string[];     // Files left out
+  };
+}
+
+export interface StrategyMessage extends WebSocketMessage {
+  type: 'strategy';
+  data: {
+    iterationId: string;
+    reason: string;  // Why the repair policy switched strategy
+    edit_mode: 'full' | 'patch';
+    candidates: number;
+    fresh_samples: boolean;
+  };
+}
+
+export interface TierMessage extends WebSocketMessage {
+  type: 'tier';
+  data: {
+    iterationId: string;
+    tier: string;
+    model?: string | null;    // null: the backend's default model
+    num_ctx?: number | null;
+  };
+}
+
+export interface QuickFixMessage extends WebSocketMessage {
+  type: 'quick_fix';
+  data: {
+    iterationId: string;
+    rule: string;
+    description: string;
+    exit_code: number;
+    run_seconds: number;
+  };
+}
@@ -0,0 +1,51 @@
+import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
+import java.io.InputStreamReader;
+import java.io.OutputStreamWriter;
+import java.io.Writer;
+import java.net.InetAddress;
+import java.net.ServerSocket;
+import java.net.Socket;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.List;
+import javax.tools.JavaCompiler;
+import javax.tools.ToolProvider;
+
+/**
+ * Keeps javac warm inside a java-runner session container.
+ *
+ * Protocol (loopback TCP): the client sends one javac argument per line and
+ * an empty line; the server answers with the exit code on the first line
+ * followed by the compiler diagnostics, then closes the connection.
+ */
+public class CompileServer {
+    public static void main(String[] argv) throws Exception {
+        int port = argv.length > 0 ? Integer.parseInt(argv[0]) : 7070;
+        JavaCompiler javac = ToolProvider.getSystemJavaCompiler();
+
+        try (ServerSocket server = new ServerSocket(port, 50, InetAddress.getLoopbackAddress())) {
+            while (true) {
+                try (Socket socket = server.accept()) {
+                    BufferedReader in = new BufferedReader(
+                        new InputStreamReader(socket.getInputStream(), StandardCharsets.UTF_8));
+                    List<String> args = new ArrayList<>();
+                    String line;
+                    while ((line = in.readLine()) != null && !line.isEmpty()) {
+                        args.add(line);
+                    }
+
+                    ByteArrayOutputStream diagnostics = new ByteArrayOutputStream();
+                    int rc = javac.run(null, diagnostics, diagnostics, args.toArray(new String[0]));
+
+                    Writer out = new OutputStreamWriter(socket.getOutputStream(), StandardCharsets.UTF_8);
+                    out.write(rc + "\n");
+                    out.write(diagnostics.toString(StandardCharsets.UTF_8));
+                    out.flush();
+                } catch (Exception e) {
+                    e.printStackTrace();
+                }
+            }
+        }
+    }
+}
@@ -0,0 +1,223 @@
+"""
+Fork server for python-runner.
+
+Started once per worker inside a long-lived python-runner container. It
+imports the commonly used stdlib modules up front, then reads one JSON
+request per line on stdin:
+
+    {"src": "/jobs/abc", "entry": "main.py", "remove": true,
+     "limits": {"cpu_seconds": 10, "memory_mb": 512, "max_output": 1000000, "timeout": 30}}
+
+and for each one forks a child that runs the entry file as __main__ in a
+private copy of src under resource limits. The reply is one JSON line:
+
+    {"returncode": 0, "stdout": "...", "stderr": "..."}
+
+After every run whatever the program started is killed: its process group,
+and - since the worker is a child subreaper - anything that left the group
+(setsid, double fork) and was reparented to the worker.
+"""
+import atexit
+import ctypes
+import json
+import os
+import resource
+import runpy
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+# Warm imports shared by every forked child (copy-on-write)
+PRELOAD = (
+    "collections", "copy", "dataclasses", "datetime", "functools", "heapq",
+    "itertools", "json", "math", "random", "re", "string", "typing",
+)
+for _name in PRELOAD:
+    __import__(_name)
+_PRELOADED = set(sys.modules)
+
+TIMEOUT_EXIT = 124  # same as coreutils timeout
+PR_SET_CHILD_SUBREAPER = 36
+
+
+def _become_subreaper():
+    """Have orphaned descendants reparented to this process instead of PID 1."""
+    try:
+        ctypes.CDLL(None, use_errno=True).prctl(PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0)
+    except (OSError, AttributeError):
+        pass  # not Linux: only the process group is cleaned up
+
+
+def _children():
+    pids = []
+    me = str(os.getpid())
+    for entry in os.listdir("/proc") if os.path.isdir("/proc") else []:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # pid (comm) state ppid ...; comm may contain spaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if fields[1] == me:
+            pids.append(int(entry))
+    return pids
+
+
+def _kill_leftovers(pgid):
+    """Kill and reap every process the finished child left behind."""
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    for _ in range(100):
+        for pid in _children():
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        try:
+            while os.waitpid(-1, os.WNOHANG)[0]:
+                pass
+        except ChildProcessError:
+            return  # nothing left
+        time.sleep(0.005)
+
+
+def _read_capped(path, limit):
+    with open(path, "rb") as f:
+        data = f.read(limit + 1)
+    text = data[:limit].decode("utf-8", errors="replace")
+    if len(data) > limit:
+        text += "\n[output truncated]\n"
+    return text
+
+
+def _forget_shadowed_modules(directory):
+    """Drop preloaded modules that files in directory (the entry's, first on sys.path) shadow."""
+    for name in os.listdir(directory):
+        module = name[:-3] if name.endswith(".py") else name
+        for loaded in [m for m in _PRELOADED if m == module or m.startswith(module + ".")]:
+            sys.modules.pop(loaded, None)
+
+
+def _child(workdir, entry, limits, out_path, err_path):
+    os.setsid()
+    cpu = int(limits.get("cpu_seconds", 10))
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    memory = int(limits.get("memory_mb", 512)) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    # Bounds what the program can write to disk, stdout/stderr files included;
+    # the reply itself is cut at max_output when the files are read back
+    size = max(int(limits.get("max_output", 1_000_000)) * 4, 16 * 1024 * 1024)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (size, size))
+
+    os.chdir(workdir)
+    stdin = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(stdin, 0)
+    os.dup2(os.open(out_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC), 1)
+    os.dup2(os.open(err_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC), 2)
+
+    entry_path = os.path.abspath(entry)
+    # sys.path[0] is the entry's directory, as with `python sub/main.py`
+    _forget_shadowed_modules(os.path.dirname(entry_path))
+    sys.argv = [entry]
+    sys.path[0] = os.path.dirname(entry_path)
+    sys.dont_write_bytecode = True
+
+    code = 0
+    try:
+        runpy.run_path(entry_path, run_name="__main__")
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException as e:
+        # Hide the runpy/worker frames so the traceback reads like `python entry`
+        tb = e.__traceback__
+        while tb is not None and tb.tb_frame.f_code.co_filename != entry_path:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb)
+        code = 1
+    finally:
+        try:
+            # What the interpreter does on the way out: join non-daemon threads, then atexit hooks
+            threading._shutdown()
+            atexit._run_exitfuncs()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code & 0xFF)
+
+
+def handle(request):
+    limits = request.get("limits", {})
+    scratch = tempfile.mkdtemp(prefix="job_")
+    workdir = os.path.join(scratch, "work")
+    try:
+        shutil.copytree(request["src"], workdir)
+        out_path = os.path.join(scratch, "stdout")
+        err_path = os.path.join(scratch, "stderr")
+
+        sys.stdout.flush()
+        pid = os.fork()
+        if pid == 0:
+            _child(workdir, request["entry"], limits, out_path, err_path)
+
+        deadline = time.monotonic() + float(limits.get("timeout", 30))
+        timed_out = False
+        while True:
+            done, status = os.waitpid(pid, os.WNOHANG)
+            if done:
+                break
+            if time.monotonic() > deadline:
+                os.killpg(pid, signal.SIGKILL)
+                _, status = os.waitpid(pid, 0)
+                timed_out = True
+                break
+            time.sleep(0.002)
+        _kill_leftovers(pid)
+
+        if timed_out:
+            returncode = TIMEOUT_EXIT
+        elif os.WIFSIGNALED(status):
+            returncode = 128 + os.WTERMSIG(status)  # shell convention
+        else:
+            returncode = os.WEXITSTATUS(status)
+
+        max_output = int(limits.get("max_output", 1_000_000))
+        stdout = _read_capped(out_path, max_output) if os.path.exists(out_path) else ""
+        stderr = _read_capped(err_path, max_output) if os.path.exists(err_path) else ""
+        if timed_out:
+            stderr += f"\nTimed out after {limits.get('timeout', 30)}s\n"
+        return {"returncode": returncode, "stdout": stdout, "stderr": stderr}
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        if request.get("remove"):
+            shutil.rmtree(request["src"], ignore_errors=True)
+
+
+def main():
+    _become_subreaper()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        try:
+            reply = handle(json.loads(line))
+        except Exception as e:
+            reply = {"returncode": 125, "stdout": "", "stderr": f"fork worker error: {e}\n"}
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()